@@ -1,13 +1,213 @@
-from flask import Flask, render_template, request, jsonify, send_file, Response
+import time
+# Soğuk başlangıç süresi /metrics ve /api/stats'ta görünür (benchmarks/bench_startup.py)
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, g
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, tuple_
 from datetime import datetime
-import yt_dlp
-import io
+import os
+import copy
+import json
+import cProfile
+import select
+import socket
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from extract_cache import ExtractCache
+from extract_pool import ExtractPool, ExtractTimeout
+from singleflight import SingleFlight
+from download_jobs import DownloadJobEngine, QueueFull
+from fair_queue import ClientQuotaExceeded, HostThrottled, HostLimiter, ClientSlots, host_key, throttle_hint
+from segmented import SegmentedDownloader, direct_download_target, create_session
+from shared_session import YdlProfiles
+from merged_download import MergedDownloader, merge_available
+from progress_feed import ProgressFeed
+from bandwidth import BandwidthScheduler
+from metrics import Registry, THROUGHPUT_BUCKETS
+from download_cache import DownloadCache, cache_key
+from integrity import verify_file, IntegrityError, INTEGRITY_FAILED
+from history_store import HistoryStore, ProgressWriter, apply_pragmas, encode_cursor, decode_cursor, timestamp
+from format_selector import select_qualities, equivalent_formats
+from file_streaming import content_disposition, guess_mimetype, find_partial_file, stream_growing_file, written_prefix, SEGMENTED_SUFFIX
 
-app = Flask(__name__)
+# Veritabanı, dosyalar ve önbellek instance dizininde; kıyaslamalar geçici bir dizin verir
+app = Flask(__name__, instance_path=os.environ.get('YTDL_INSTANCE_PATH') or None)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///downloads.db'
+app.config['HISTORY_DB_PATH'] = os.path.join(app.instance_path, 'downloads.db')
+app.config['EXTRACT_CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+app.config['EXTRACT_CACHE_TTL'] = 1800
+app.config['EXTRACT_WAIT_TIMEOUT'] = 90
+# extract_info ayrı süreçlerde çalışır (0: istek iş parçacığında); her iş için kesin süre
+# sınırı, belirli sayıda işten sonra süreç bellek için yenilenir
+app.config['EXTRACT_WORKERS'] = 2
+app.config['EXTRACT_WORKER_MAX_JOBS'] = 200
+app.config['EXTRACT_TIMEOUT'] = 60
+# Görüntüyle aynı kapsayıcıda ses seç (mp4+m4a, webm+webm), birleştirmede yeniden kodlama olmasın
+app.config['FORMAT_AVOID_REENCODE'] = True
+app.config['FORMAT_PREFER_VCODECS'] = None
+app.config['DOWNLOAD_DIR'] = os.path.join(app.instance_path, 'files')
+app.config['DOWNLOAD_WORKERS'] = 2
+app.config['DOWNLOAD_MAX_QUEUE'] = 20
+# İlerleme veritabanına iş başına değil, bu aralıkla toplu yazılır (saniye)
+app.config['PROGRESS_COMMIT_INTERVAL'] = 1.0
+app.config['DOWNLOADS_PAGE_SIZE'] = 50
+app.config['DOWNLOAD_MAX_AGE'] = 3600
+# Tamamlanan dosyalar içerik özetine göre önbellekte tutulur; kota aşılınca en eskisi silinir
+app.config['DOWNLOAD_CACHE_DIR'] = os.path.join(app.instance_path, 'cache')
+app.config['DOWNLOAD_CACHE_MAX_BYTES'] = 20 * 1024 ** 3
+# Aynı dosyayı indiren başka bir işin bitmesi en fazla bu kadar beklenir (saniye)
+app.config['DOWNLOAD_WAIT_TIMEOUT'] = 6 * 3600
+app.config['SEGMENT_CONNECTIONS'] = 8
+# Bağlantı sayısı toplam hıza göre SEGMENT_CONNECTIONS ile bu değer arasında ayarlanır
+app.config['SEGMENT_MAX_CONNECTIONS'] = 16
+# Bu kadar saniye veri gelmeyen bağlantı kesilip eşdeğer bir kaynaktan sürdürülür
+app.config['SEGMENT_STALL_TIMEOUT'] = 10
+# DASH/HLS akışlarında iş başına aynı anda indirilen parça sayısı
+app.config['FRAGMENT_CONCURRENCY'] = 4
+# İlerleme olayları iş başına en fazla bu aralıkla yayınlanır (saniye)
+app.config['PROGRESS_EVENT_INTERVAL'] = 0.5
+app.config['SSE_HEARTBEAT'] = 15
+app.config['SSE_MAX_DURATION'] = 300
+# Toplu isteklerde aynı anda çözülen video sayısı ve istek başına üst sınır
+app.config['BATCH_CONCURRENCY'] = 6
+app.config['BATCH_MAX_ENTRIES'] = 1000
+# İstemci (IP) başına sınırlar: süren + bekleyen çıkarım, kuyruktaki + çalışan
+# indirme ve aynı anda açık toplu istek; aşılınca 429 ve CLIENT_RETRY_AFTER döner
+app.config['CLIENT_MAX_EXTRACTS'] = 4
+app.config['CLIENT_MAX_DOWNLOADS'] = 5
+app.config['CLIENT_MAX_BATCHES'] = 2
+app.config['CLIENT_RETRY_AFTER'] = 5
+# Çıkarım süreçleri ve indirme işçileri istemciler arasında sırayla, bu ağırlıklarla
+# paylaştırılır (ör. {'10.0.0.5': 2}); verilmeyen istemcinin ağırlığı 1
+app.config['CLIENT_WEIGHTS'] = {}
+# Vekil sunucu arkasında istemci IP'sinin okunacağı başlık (ör. 'X-Forwarded-For');
+# None ise bağlantı adresi kullanılır. Başlığı yalnızca vekil sunucu yazmalıdır
+app.config['CLIENT_IP_HEADER'] = None
+# Site başına (alan adı) eşzamanlı çıkarım ve indirme; 429 alınan site HOST_BACKOFF
+# saniyeden başlayıp art arda 429'larda ikiye katlanan süre boyunca iş almaz
+app.config['HOST_MAX_EXTRACTS'] = 2
+app.config['HOST_MAX_DOWNLOADS'] = 2
+app.config['HOST_BACKOFF'] = 30
+app.config['HOST_MAX_BACKOFF'] = 600
+# Bant genişliği (bayt/sn, None: sınırsız). Kurallar: [{'start': '09:00', 'end': '18:00', 'rate': ..., 'days': [0, 1, 2, 3, 4]}]
+app.config['BANDWIDTH_LIMIT'] = None
+app.config['BANDWIDTH_PER_DOWNLOAD'] = None
+app.config['BANDWIDTH_RULES'] = []
+# Açıkken ?profile=1 ile gelen tek bir istek cProfile ile ölçülüp PROFILE_DIR'e yazılır
+app.config['PROFILE_REQUESTS'] = False
+app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+# Apache/Passenger'da mod_xsendfile varsa dosyayı sunucu doğrudan gönderir
+app.config['USE_X_SENDFILE'] = False
+# asgi.py: veritabanı, dosya okuma ve Flask'a devredilen istekler için iş parçacığı sayısı
+app.config['ASGI_THREADS'] = 32
+# Ad çözümleri bu kadar saniye süreç içinde saklanır (0: kapalı)
+app.config['DNS_CACHE_TTL'] = 300
 db = SQLAlchemy(app)
 
+# Şema, dizinler ve WAL geçmiş deposunda tanımlıdır; masaüstü uygulaması da aynı dosyayı kullanır.
+# İçe aktarmada veritabanı açılmaz: şema ilk bağlantıda (ya da warm_up'ta) hazırlanır,
+# yazıcı iş parçacığı ilk ilerlemeyle başlar
+history = HistoryStore(app.config['HISTORY_DB_PATH'])
+progress_writer = ProgressWriter(history, flush_interval=app.config['PROGRESS_COMMIT_INTERVAL'])
+
+def prepare_connection(conn, _):
+    apply_pragmas(conn)
+    history.prepare(conn)
+
+with app.app_context():
+    event.listen(db.engine, 'connect', prepare_connection)
+
+# extract_info sonuçları; get-formats ve download aynı çıkarımı paylaşır
+extract_cache = ExtractCache(
+    max_bytes=app.config['EXTRACT_CACHE_MAX_BYTES'],
+    default_ttl=app.config['EXTRACT_CACHE_TTL']
+)
+# Aynı video için eşzamanlı istekler tek bir extract_info çağrısını bekler
+extract_flight = SingleFlight(timeout=app.config['EXTRACT_WAIT_TIMEOUT'])
+progress_feed = ProgressFeed(min_interval=app.config['PROGRESS_EVENT_INTERVAL'])
+
+download_cache = DownloadCache(app.config['DOWNLOAD_CACHE_DIR'], app.config['DOWNLOAD_CACHE_MAX_BYTES'])
+# Aynı video ve formatı aynı anda isteyen işler tek bir indirmeyi bekler
+fetch_flight = SingleFlight(timeout=app.config['DOWNLOAD_WAIT_TIMEOUT'])
+
+# Aşama süreleri (çıkarım, format seçimi, bağlantı/ilk bayt, aktarım, son işlem) ve /metrics
+metrics = Registry()
+downloads_total = metrics.counter('ytdl_downloads_total', 'Biten indirme işleri', ('status',))
+segment_events = metrics.counter('ytdl_segment_events_total',
+                                 'Parçalı indirmelerde takılan bağlantılar, kaynak değişimleri, yeniden çözmeler '
+                                 've yeniden indirilen bloklar', ('event',))
+integrity_checks = metrics.counter('ytdl_integrity_checks_total', 'İndirilen dosyaların bütünlük denetimleri',
+                                   ('result',))
+throughput = metrics.histogram(
+    'ytdl_throughput_bytes_per_second', 'İndirme hızı', ('host', 'extractor'), THROUGHPUT_BUCKETS)
+request_seconds = metrics.histogram('ytdl_request_seconds', 'HTTP isteklerinin süresi', ('endpoint',))
+responses_total = metrics.counter('ytdl_responses_total', 'HTTP yanıtları', ('endpoint', 'status'))
+limit_rejections = metrics.counter('ytdl_limit_rejections_total',
+                                   'İstemci kotası ya da site geri çekilmesi nedeniyle hemen reddedilen istekler',
+                                   ('reason',))
+bandwidth = BandwidthScheduler(
+    global_rate=app.config['BANDWIDTH_LIMIT'],
+    rules=app.config['BANDWIDTH_RULES'],
+    per_download_rate=app.config['BANDWIDTH_PER_DOWNLOAD']
+)
+
+EXTRACT_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'tr,en-US;q=0.7,en;q=0.3',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+    },
+    'nocheckcertificate': True,
+    'ignoreerrors': True,
+    'cookiefile': 'cookies.txt',
+    'extractor_retries': 3,
+    'socket_timeout': 30
+}
+# Oynatma listeleri yalnızca düz çıkarılır (her video için sayfa istenmez)
+EXTRACT_VARIANTS = {
+    'full': EXTRACT_OPTS,
+    'flat': dict(EXTRACT_OPTS, extract_flat='in_playlist'),
+}
+
+# Süreç içi YoutubeDL örnekleri bu profillerden kurulur: çıkarıcı listesi, çerezler
+# ve bağlantı havuzu profiller arasında paylaşılır (çıkarım süreçleri kendi kopyasını kurar)
+ydl_profiles = YdlProfiles(dict(
+    EXTRACT_VARIANTS,
+    select={
+        'quiet': True,
+        'no_warnings': True,
+        'http_headers': {
+            'User-Agent': EXTRACT_OPTS['http_headers']['User-Agent']
+        }
+    },
+    download=dict(
+        EXTRACT_OPTS,
+        concurrent_fragment_downloads=app.config['FRAGMENT_CONCURRENCY'],
+        noprogress=True,
+        ignoreerrors=False
+    ),
+), dns_ttl=app.config['DNS_CACHE_TTL'])
+
+extract_hosts = HostLimiter(app.config['HOST_MAX_EXTRACTS'], app.config['HOST_BACKOFF'], app.config['HOST_MAX_BACKOFF'])
+download_hosts = HostLimiter(app.config['HOST_MAX_DOWNLOADS'], app.config['HOST_BACKOFF'], app.config['HOST_MAX_BACKOFF'])
+batch_streams = ClientSlots(app.config['CLIENT_MAX_BATCHES'])
+
+extract_pool = ExtractPool(
+    EXTRACT_VARIANTS,
+    workers=app.config['EXTRACT_WORKERS'],
+    max_jobs=app.config['EXTRACT_WORKER_MAX_JOBS'],
+    timeout=app.config['EXTRACT_TIMEOUT'],
+    client_weights=app.config['CLIENT_WEIGHTS'],
+    hosts=extract_hosts
+)
+
 class Download(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(500), nullable=False)
@@ -17,6 +217,127 @@ class Download(db.Model):
     progress = db.Column(db.Float, default=0)
     file_size = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    source = db.Column(db.String(20), default='web')
+    content_hash = db.Column(db.String(64))
+    integrity = db.Column(db.String(20))
+    integrity_note = db.Column(db.String(500))
+    checksum = db.Column(db.String(64))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'filename': self.filename,
+            'format_id': self.format_id,
+            'status': self.status,
+            'progress': self.progress or 0,
+            'file_size': self.file_size,
+            'integrity': self.integrity,
+            'integrity_note': self.integrity_note,
+            'created_at': self.created_at.strftime('%d.%m.%Y %H:%M') if self.created_at else None
+        }
+
+STATUS_WAITING = 'Bekliyor'
+STATUS_DOWNLOADING = 'İndiriliyor'
+STATUS_COMPLETED = 'Tamamlandı'
+STATUS_ERROR = 'Hata'
+
+def extract_video_info(url, should_cancel=None, client=None, client_limit=None):
+    key = extract_cache.key_for(url)
+    info = extract_cache.get(key)
+    if info is not None:
+        return info
+
+    info = extract_flight.do(key, lambda: _extract_and_cache(url, key, should_cancel, client, client_limit))
+    # Sonuç bekleyen tüm isteklerle paylaşıldığı için herkes kendi kopyasını kullanır
+    return copy.deepcopy(info)
+
+def _extract_and_cache(url, key, should_cancel=None, client=None, client_limit=None):
+    cancel = None
+    if should_cancel:
+        # Aynı çıkarımı bekleyen başka istek varsa ilk istemci gitse de sürdürülür
+        cancel = lambda: should_cancel() and not extract_flight.waiting(key)
+    with metrics.span('extract') as span:
+        info = run_extract(url, should_cancel=cancel, client=client, client_limit=client_limit)
+        if not info:
+            return None
+        span['extractor'] = info.get('extractor_key', '')
+
+    extract_cache.put(key, info)
+    return info
+
+def run_extract(url, variant='full', should_cancel=None, client=None, client_limit=None):
+    # Seçime ait alanlar (requested_formats vb.) atılmış bilgi döner ki başka
+    # bir formatla process_ie_result'a yeniden verilebilsin
+    if app.config['EXTRACT_WORKERS'] > 0:
+        return extract_pool.extract(url, variant, should_cancel=should_cancel,
+                                    client=client, client_limit=client_limit)
+    with ydl_profiles.create(variant) as ydl:
+        info = ydl.extract_info(url, download=False)
+        return ydl.sanitize_info(info, remove_private_keys=True) if info else None
+
+def fresh_targets(url, fmt):
+    # İndirme sırasında tüm kaynaklar takıldıysa (ya da imzalı URL'lerin süresi
+    # dolduysa) önbellek atlanıp bilgi yeniden çıkarılır; aynı format ve eşdeğerleri döner
+    key = extract_cache.key_for(url)
+    extract_cache.invalidate(key)
+    info = extract_flight.do(key, lambda: _extract_and_cache(url, key))
+    formats = (info or {}).get('formats') or []
+    same = [f for f in formats if f.get('format_id') == fmt.get('format_id')]
+    return same + equivalent_formats(formats, fmt)
+
+def client_key(remote_addr, headers):
+    # Adil paylaşım ve kotalar için istemci kimliği (IP). Vekil başlığında
+    # listenin sonuncusu alınır: onu istemci değil vekil sunucu eklemiştir
+    header = app.config['CLIENT_IP_HEADER']
+    if header:
+        value = headers.get(header.lower())
+        if value:
+            return value.rsplit(',', 1)[-1].strip()
+    return remote_addr or ''
+
+def request_client():
+    return client_key(request.remote_addr, request.headers)
+
+def disconnect_check():
+    # Geliştirme sunucusu ve gunicorn istemci soketini environ'da verir; soket
+    # okunabilir olduğu hâlde veri yoksa istemci bağlantıyı kapatmıştır
+    sock = request.environ.get('werkzeug.socket') or request.environ.get('gunicorn.socket')
+    if sock is None:
+        return None
+
+    def gone():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return False
+    return gone
+
+def format_options(info, prefer_vcodecs=None, avoid_reencode=False):
+    with metrics.span('select', info.get('extractor_key', '')):
+        qualities = select_qualities(
+            info.get('formats') or [],
+            prefer_vcodecs=prefer_vcodecs,
+            avoid_reencode=avoid_reencode
+        )
+
+    formats_list = []
+    for data in qualities:
+        filesize_mb = data['filesize'] / 1024 / 1024
+        formats_list.append({
+            'quality': data['quality'],
+            'format_id': data['format_id'],
+            'ext': data['ext'],
+            'filesize': f"{filesize_mb:.1f} MB",
+            'vcodec': data['vcodec'],
+            'acodec': data['acodec'],
+            'fps': data['fps'],
+            'tbr': data['tbr'],
+            'height': data['height'],
+            'alternates': data['alternates']
+        })
+    return formats_list
 
 @app.route('/')
 def index():
@@ -29,89 +350,15 @@ def get_formats():
         if not url:
             return jsonify({'error': 'URL gerekli'}), 400
 
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'tr,en-US;q=0.7,en;q=0.3',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-            },
-            'nocheckcertificate': True,
-            'ignoreerrors': True,
-            'cookiefile': 'cookies.txt',
-            'extractor_retries': 3,
-            'socket_timeout': 30
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            if not info:
-                return jsonify({'error': 'Video bilgileri alınamadı'}), 400
-
-            formats = info.get('formats', [])
-            if not formats:
-                return jsonify({'error': 'Video formatları bulunamadı'}), 400
-
-            available_qualities = {}
-            video_formats = [f for f in formats if f.get('vcodec', 'none') != 'none' and 'height' in f]
-            audio_formats = [f for f in formats if f.get('acodec', 'none') != 'none' and f.get('vcodec', 'none') == 'none']
-
-            if audio_formats:
-                best_audio = max(audio_formats, key=lambda x: x.get('tbr', 0))
-                
-                for vf in video_formats:
-                    height = vf.get('height', 0)
-                    if height > 0:
-                        format_id = f"{vf['format_id']}+{best_audio['format_id']}"
-                        filesize = vf.get('filesize', 0) or vf.get('approximate_filesize', 0)
-                        
-                        quality_key = f"{height}p"
-                        if height == 1440:
-                            quality_key = "2K"
-                        elif height == 2160:
-                            quality_key = "4K"
-                        
-                        if quality_key not in available_qualities or filesize > available_qualities[quality_key]['filesize']:
-                            available_qualities[quality_key] = {
-                                'format_id': format_id,
-                                'filesize': filesize,
-                                'height': height,
-                                'vcodec': vf.get('vcodec', ''),
-                                'acodec': best_audio.get('acodec', ''),
-                                'ext': vf.get('ext', 'mp4'),
-                                'fps': vf.get('fps', 0),
-                                'tbr': vf.get('tbr', 0)
-                            }
-
-            sorted_qualities = sorted(
-                available_qualities.items(),
-                key=lambda x: x[1]['height'],
-                reverse=True
-            )
-
-            formats_list = []
-            for quality, data in sorted_qualities:
-                filesize_mb = data['filesize'] / 1024 / 1024
-                formats_list.append({
-                    'quality': quality,
-                    'format_id': data['format_id'],
-                    'ext': data['ext'],
-                    'filesize': f"{filesize_mb:.1f} MB",
-                    'vcodec': data['vcodec'],
-                    'acodec': data['acodec'],
-                    'fps': data['fps'],
-                    'tbr': data['tbr']
-                })
-
-            return jsonify({
-                'formats': formats_list,
-                'title': info.get('title', '')
-            })
+        info = extract_video_info(url, should_cancel=disconnect_check(), client=request_client(),
+                                  client_limit=app.config['CLIENT_MAX_EXTRACTS'])
+        payload, status = formats_result(info, request.json)
+        return jsonify(payload), status
 
+    except (ClientQuotaExceeded, HostThrottled) as e:
+        return json_result(*limit_result(e))
+    except ExtractTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -124,34 +371,783 @@ def download_video():
         if not url or not format_id:
             return jsonify({'error': 'URL ve format_id gerekli'}), 400
 
-        ydl_opts = {
-            'format': format_id,
-            'quiet': True,
-            'no_warnings': True,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
-            }
-        }
+        client = request_client()
+        result = download_precheck(url, format_id, client)
+        if result is None:
+            info = extract_video_info(url, should_cancel=disconnect_check(), client=client,
+                                      client_limit=app.config['CLIENT_MAX_EXTRACTS'])
+            result = download_result(url, format_id, info, client)
+        return json_result(*result)
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            if not info:
-                return jsonify({'error': 'Video bilgileri alınamadı'}), 400
+    except (ClientQuotaExceeded, HostThrottled) as e:
+        return json_result(*limit_result(e))
+    except ExtractTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Aşağıdaki yardımcılar (yük, durum kodu[, başlıklar]) döndürür; WSGI yolları ve
+# asgi.py aynı mantığı kullanır
+def formats_result(info, data):
+    if not info:
+        return {'error': 'Video bilgileri alınamadı'}, 400
+    if not info.get('formats'):
+        return {'error': 'Video formatları bulunamadı'}, 400
+
+    formats_list = format_options(
+        info,
+        prefer_vcodecs=data.get('prefer_vcodecs') or app.config['FORMAT_PREFER_VCODECS'],
+        avoid_reencode=data.get('avoid_reencode', app.config['FORMAT_AVOID_REENCODE'])
+    )
+    return {'formats': formats_list, 'title': info.get('title', '')}, 200
+
+def download_precheck(url, format_id, client=None):
+    # Çıkarımdan önce verilebilecek yanıt; None ise çıkarıma geçilir
+    # Aynı URL ve format zaten kuyruktaysa yeni iş açma
+    existing = find_active_download(url, format_id)
+    if existing:
+        return existing.to_dict(), 202, {}
+    if not download_engine.has_capacity():
+        return busy_result()
+    if not download_engine.client_has_capacity(client):
+        # İstemci kotasını doldurduysa çıkarım yapılmadan hemen reddedilir
+        return limit_result(ClientQuotaExceeded('Aynı anda çok fazla indirme isteği, lütfen biraz sonra tekrar deneyin'))
+    return None
+
+def download_result(url, format_id, info, client=None):
+    if not info:
+        return {'error': 'Video bilgileri alınamadı'}, 400, {}
+    try:
+        download = enqueue_download(url, format_id, info, client)
+    except ClientQuotaExceeded as e:
+        return limit_result(e)
+    except QueueFull:
+        return busy_result()
+    if not download:
+        return {'error': 'Video bilgileri alınamadı'}, 400, {}
+    return download.to_dict(), 202, {}
+
+def json_result(payload, status, headers=None):
+    response = jsonify(payload)
+    response.headers.update(headers or {})
+    return response, status
+
+def find_active_download(url, format_id):
+    existing = Download.query.filter(
+        Download.url == url,
+        Download.format_id == format_id,
+        Download.status.in_([STATUS_WAITING, STATUS_DOWNLOADING])
+    ).order_by(Download.id.desc()).first()
+    if existing and download_engine.is_tracked(existing.id):
+        return existing
+    return None
+
+def enqueue_download(url, format_id, info, client=None):
+    # yt-dlp ilk kullanımda yüklenir (ya da warm_up ile önceden)
+    with ydl_profiles.create('select', format=format_id) as ydl:
+        # Önbellekteki bilgi üzerinde yalnızca format seçimi yapılır, tekrar çıkarım yok
+        info = ydl.process_ie_result(info, download=False)
+        if not info:
+            return None
+    # İş, indirileceği sitenin sınırı ve geri çekilmesiyle kuyruktan alınır
+    host = host_key(download_host(info))
+
+    download = Download(
+        url=url,
+        format_id=format_id,
+        filename=f"{info.get('title', 'video')}.{info.get('ext', 'mp4')}",
+        status=STATUS_WAITING,
+        progress=0
+    )
+    db.session.add(download)
+    db.session.commit()
+
+    try:
+        download_engine.submit(download.id, client, host)
+    except (QueueFull, ClientQuotaExceeded):
+        db.session.delete(download)
+        db.session.commit()
+        raise
+
+    progress_feed.publish(download.id, **download.to_dict())
+    return download
+
+@app.route('/api/batch', methods=['POST'])
+def batch_formats():
+    data = request.json or {}
+    urls = data.get('urls') or []
+    if isinstance(urls, str):
+        urls = urls.split()
+    urls = [u.strip() for u in urls if isinstance(u, str) and u.strip()]
+    if not urls:
+        return jsonify({'error': 'En az bir URL gerekli'}), 400
+
+    options = {
+        'enqueue': bool(data.get('enqueue')),
+        'max_height': data.get('max_height'),
+        'prefer_vcodecs': data.get('prefer_vcodecs') or app.config['FORMAT_PREFER_VCODECS'],
+        'avoid_reencode': data.get('avoid_reencode', app.config['FORMAT_AVOID_REENCODE'])
+    }
+    client = request_client()
+    if not batch_streams.enter(client):
+        return json_result(*limit_result(ClientQuotaExceeded(
+            'Aynı anda çok fazla toplu istek, lütfen biraz sonra tekrar deneyin')))
+    options['client'] = client
+    # Her satır hazır olur olmaz gönderilir (NDJSON); kuyruğa ekleme istek bağlamında yapılır
+    response = Response(
+        stream_with_context(batch_stream(urls, options)),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Akış hiç okunmadan kapansa da sayaç bırakılır
+    response.call_on_close(lambda: batch_streams.leave(client))
+    return response
+
+def batch_stream(urls, options):
+    limit = app.config['BATCH_MAX_ENTRIES']
+    pool = ThreadPoolExecutor(max_workers=app.config['BATCH_CONCURRENCY'])
+    cancelled = threading.Event()
+    client = options['client']
+    listings = {pool.submit(expand_url, url, cancelled.is_set, client): url for url in urls}
+    pending = {}
+    index = 0
+    try:
+        while listings or pending:
+            done, _ = wait(list(listings) + list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in listings:
+                    source = listings.pop(future)
+                    try:
+                        entries = future.result()
+                    except Exception as e:
+                        yield ndjson_line({'type': 'error', 'url': source, 'error': str(e)})
+                        continue
+                    skipped = max(len(entries) - (limit - index), 0)
+                    entries = entries[:len(entries) - skipped]
+                    yield ndjson_line({'type': 'source', 'url': source, 'count': len(entries), 'skipped': skipped})
+                    # Listeden gelen girdiler sırayla havuza verilir; sonuçlar bittikçe akar
+                    for entry in entries:
+                        pending[pool.submit(resolve_entry, entry['url'], options, cancelled.is_set, client)] = (index, source, entry)
+                        index += 1
+                else:
+                    entry_index, source, entry = pending.pop(future)
+                    yield ndjson_line(batch_entry_result(future, entry_index, source, entry, options))
+        yield ndjson_line({'type': 'done', 'count': index})
+    finally:
+        # İstemci bağlantıyı kapatırsa başlamamış çıkarımlar atılır, sürenler durdurulur
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def ndjson_line(data):
+    return json.dumps(data, ensure_ascii=False) + '\n'
+
+def expand_url(url, should_cancel=None, client=None):
+    # Oynatma listesi/kanal yalnızca düz olarak çıkarılır (her video için sayfa
+    # istenmez); tek video ise tam bilgi zaten geldiği için önbelleğe yazılır.
+    # Toplu isteğin çıkarımları kotaya takılmaz, sıra beklerken diğer istemcilerle dönüşümlü ilerler
+    info = run_extract(url, 'flat', should_cancel=should_cancel, client=client)
+    if not info:
+        raise Exception('Video bilgileri alınamadı')
+
+    if info.get('_type') != 'playlist':
+        if info.get('formats'):
+            extract_cache.put(extract_cache.key_for(url), info)
+        return [{'url': url, 'title': info.get('title', '')}]
+
+    entries = []
+    for entry in info.get('entries') or []:
+        entry_url = entry and (entry.get('url') or entry.get('webpage_url'))
+        if entry_url:
+            entries.append({'url': entry_url, 'title': entry.get('title') or ''})
+    return entries
+
+def resolve_entry(url, options, should_cancel=None, client=None):
+    info = extract_video_info(url, should_cancel, client)
+    if not info:
+        raise Exception('Video bilgileri alınamadı')
+    if info.get('_type') == 'playlist':
+        raise Exception('İç içe oynatma listesi; ayrı bir istekle gönderin')
+    formats_list = format_options(info, options['prefer_vcodecs'], options['avoid_reencode'])
+    if not formats_list:
+        raise Exception('Video formatları bulunamadı')
+    return info, formats_list
+
+def batch_entry_result(future, index, source, entry, options):
+    result = {'type': 'entry', 'index': index, 'source': source, 'url': entry['url'], 'title': entry['title']}
+    try:
+        info, formats_list = future.result()
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+
+    result['title'] = info.get('title', entry['title'])
+    result['formats'] = formats_list
+    if options['enqueue']:
+        chosen = pick_format(formats_list, options['max_height'])
+        try:
+            download = find_active_download(entry['url'], chosen['format_id'])
+            if not download:
+                download = enqueue_download(entry['url'], chosen['format_id'], info, options['client'])
+            result['download'] = download.to_dict() if download else None
+            if not download:
+                result['error'] = 'Video bilgileri alınamadı'
+        except ClientQuotaExceeded as e:
+            result['error'] = str(e)
+        except QueueFull:
+            result['error'] = 'İndirme kuyruğu dolu, lütfen daha sonra tekrar deneyin'
+        except Exception as e:
+            db.session.rollback()
+            result['error'] = str(e)
+    return result
+
+def pick_format(formats_list, max_height=None):
+    # Liste yüksekten düşüğe sıralı; sınır verilmişse altındaki ilk seçenek
+    if max_height:
+        for data in formats_list:
+            if data['height'] <= int(max_height):
+                return data
+        return formats_list[-1]
+    return formats_list[0]
 
-            video_url = info['url']
-            filename = f"{info['title']}.{info['ext']}"
+@app.route('/api/downloads')
+def list_downloads():
+    try:
+        # Olay numarası listeden önce alınır; istemci olay akışına buradan bağlanır
+        last_event_id = progress_feed.last_event_id
+        limit = min(max(request.args.get('limit', app.config['DOWNLOADS_PAGE_SIZE'], type=int), 1), 500)
+
+        query = Download.query.filter(Download.source == request.args.get('source', 'web'))
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Download.status == status)
+        # Anahtar kümesiyle sayfalama: bir sonraki sayfa son satırın (created_at, id) değerinden başlar
+        cursor = request.args.get('cursor')
+        position = decode_cursor(cursor) if cursor else None
+        if cursor and position is None:
+            return jsonify({'error': 'Geçersiz sayfa imleci'}), 400
+        if position:
+            query = query.filter(tuple_(Download.created_at, Download.id) < position)
+        downloads = query.order_by(Download.created_at.desc(), Download.id.desc()).limit(limit).all()
 
-            # Video URL'sini ve dosya adını doğrudan kullanıcıya gönder
-            return jsonify({
-                'download_url': video_url,
-                'filename': filename
-            })
+        response = jsonify([d.to_dict() for d in downloads])
+        response.headers['X-Last-Event-ID'] = str(last_event_id)
+        if len(downloads) == limit:
+            last = downloads[-1]
+            response.headers['X-Next-Cursor'] = encode_cursor(timestamp(last.created_at), last.id)
+        return response
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-with app.app_context():
-    db.create_all()
+@app.route('/api/downloads/events')
+def download_events():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    # EventSource desteklemeyen istemciler için uzun sorgulama
+    if request.args.get('poll'):
+        timeout = min(request.args.get('timeout', 25, type=float), 60)
+        if last_event_id is None:
+            last_event_id = progress_feed.last_event_id
+        events, reset = progress_feed.wait(last_event_id, timeout)
+        return jsonify(poll_payload(events, reset, last_event_id))
+
+    return Response(
+        sse_stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def sse_stream(last_event_id):
+    if last_event_id is None:
+        last_event_id = progress_feed.last_event_id
+    # Bağlantı bir süre sonra kapatılır; tarayıcı Last-Event-ID ile yeniden bağlanır
+    deadline = time.monotonic() + app.config['SSE_MAX_DURATION']
+    yield SSE_RETRY
+    while time.monotonic() < deadline:
+        events, reset = progress_feed.wait(last_event_id, app.config['SSE_HEARTBEAT'])
+        chunk, last_event_id = sse_chunk(events, reset, last_event_id)
+        yield chunk
+
+SSE_RETRY = 'retry: 3000\n\n'
+
+def sse_chunk(events, reset, last_event_id):
+    # Dönüş: (gönderilecek metin, yeni son olay numarası)
+    if reset:
+        last_event_id = progress_feed.last_event_id
+        return f"id: {last_event_id}\nevent: reset\ndata: {{}}\n\n", last_event_id
+    if not events:
+        return ': ping\n\n', last_event_id
+    return ''.join(
+        f"id: {seq}\nevent: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n" for seq, event in events
+    ), events[-1][0]
+
+def poll_payload(events, reset, last_event_id):
+    return {
+        'events': [event for _, event in events],
+        'last_event_id': events[-1][0] if events else last_event_id,
+        'reset': reset
+    }
+
+@app.route('/download/<int:download_id>')
+def serve_download(download_id):
+    download = db.session.get(Download, download_id)
+    if not download:
+        return jsonify({'error': 'İndirme bulunamadı'}), 404
+
+    if download.status in (STATUS_WAITING, STATUS_DOWNLOADING):
+        return serve_partial_download(download)
+    if download.status != STATUS_COMPLETED:
+        return jsonify({'error': 'İndirme henüz tamamlanmadı'}), 409
+
+    path = download_path(download)
+    if not path or not os.path.exists(path):
+        if download.content_hash:
+            return jsonify({'error': 'Dosya önbellekten silindi, lütfen yeniden indirin'}), 410
+        return jsonify({'error': 'Dosya bulunamadı'}), 404
+
+    # conditional: Range/206, ETag ve Last-Modified; tam dosyada wsgi.file_wrapper
+    # (ya da USE_X_SENDFILE ile sunucunun kendisi) kullanılır
+    response = send_file(
+        path,
+        as_attachment=True,
+        download_name=download.filename,
+        mimetype=guess_mimetype(download.filename),
+        conditional=True,
+        etag=download.content_hash or True,
+        max_age=app.config['DOWNLOAD_MAX_AGE']
+    )
+    if download.content_hash:
+        # LRU için son kullanım; aktarım sürerken nesne silinse de açık dosyadan okunmaya
+        # devam edilir (Windows'ta silme başarısız olur ve sonraki temizliğe kalır)
+        download_cache.touch(download.content_hash)
+    return response
+
+def serve_partial_download(download):
+    partial = find_partial_file(job_directory(download.id))
+    if not partial:
+        return jsonify({'error': 'İndirme henüz tamamlanmadı'}), 409
+
+    readable = None
+    if partial.endswith(SEGMENTED_SUFFIX):
+        # Parçalı indirmede yalnızca baştan kesintisiz yazılmış kısım gönderilir;
+        # günlük yoksa (ilk kayıttan önce ya da sunucu aralık desteklemiyorsa) beklenir
+        if written_prefix(partial) is None:
+            return jsonify({'error': 'İndirme henüz tamamlanmadı'}), 409, {'Retry-After': '5'}
+        readable = lambda: written_prefix(partial)
+
+    download_id = download.id
+    filename = download.filename or os.path.splitext(os.path.basename(partial))[0]
+    # Boyut bilinmediği için Range desteklenmez, veri yazıldıkça aktarılır
+    return Response(
+        stream_growing_file(partial, lambda: download_engine.is_tracked(download_id), readable=readable),
+        mimetype=guess_mimetype(filename),
+        headers={
+            'Content-Disposition': content_disposition(filename),
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        },
+        direct_passthrough=True
+    )
+
+def busy_result():
+    return {'error': 'İndirme kuyruğu dolu, lütfen daha sonra tekrar deneyin'}, 503, {'Retry-After': '30'}
+
+def limit_result(error):
+    # İstemci kotası: 429, istemci biraz sonra tekrar dener. Site 429 verdiyse
+    # sorun istemcide değil; geri çekilme süresiyle 503 döner
+    if isinstance(error, HostThrottled):
+        limit_rejections.inc(reason='host')
+        return {'error': str(error)}, 503, {'Retry-After': str(int(error.retry_after) + 1)}
+    limit_rejections.inc(reason='client')
+    return {'error': str(error)}, 429, {'Retry-After': str(app.config['CLIENT_RETRY_AFTER'])}
+
+def job_directory(download_id):
+    return os.path.join(app.config['DOWNLOAD_DIR'], str(download_id))
+
+def download_path(download):
+    if download.content_hash:
+        return download_cache.path_for(download.content_hash)
+    if not download.filename:
+        return None
+    return os.path.join(job_directory(download.id), download.filename)
+
+def expected_size(selected):
+    formats = selected.get('requested_formats') or [selected]
+    return sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def run_download_job(download_id):
+    with app.app_context():
+        download = db.session.get(Download, download_id)
+        if not download:
+            return
+
+        download.status = STATUS_DOWNLOADING
+        db.session.commit()
+        progress_feed.publish(download_id, status=STATUS_DOWNLOADING)
+
+        job_dir = job_directory(download_id)
+        os.makedirs(job_dir, exist_ok=True)
+        transfer = bandwidth.register(download_id)
+        timing = {'start': None, 'first_byte': None, 'end': None, 'postprocess': {}}
+        extractor = ''
+        host = ''
+        pinned = None
+
+        def progress_hook(d):
+            if d['status'] == 'finished':
+                timing['end'] = time.perf_counter()
+            if d['status'] != 'downloading':
+                return
+            if timing['first_byte'] is None and timing['start'] and d.get('downloaded_bytes'):
+                timing['first_byte'] = time.perf_counter() - timing['start']
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            downloaded = d.get('downloaded_bytes', 0)
+            if total > 0:
+                progress = min(downloaded / total * 100, 100)
+                progress_feed.publish(
+                    download_id,
+                    progress=progress,
+                    speed=d.get('speed') or 0,
+                    file_size=format_size(total)
+                )
+                # Veritabanına her parçada değil, tüm işler için toplu yazılır
+                progress_writer.update(download_id, progress, format_size(total))
+
+        def postprocessor_hook(d):
+            # Birleştirme (ffmpeg) ve diğer son işlemler ayrı aşama olarak ölçülür
+            name = d.get('postprocessor')
+            if d['status'] == 'started':
+                timing['postprocess'][name] = time.perf_counter()
+            elif d['status'] == 'finished' and name in timing['postprocess']:
+                metrics.record_span('postprocess', time.perf_counter() - timing['postprocess'].pop(name),
+                                    extractor, job=download_id, postprocessor=name)
+
+        try:
+            info = extract_video_info(download.url)
+            if not info:
+                raise Exception('Video bilgileri alınamadı')
+            extractor = info.get('extractor_key', '')
+
+            ydl_opts = ydl_profiles.options(
+                'download',
+                format=download.format_id,
+                outtmpl=os.path.join(job_dir, '%(title)s.%(ext)s'),
+                progress_hooks=[progress_hook, transfer.progress_hook],
+                postprocessor_hooks=[postprocessor_hook]
+            )
+            # Parçalı indirici yt-dlp ile aynı çerez kavanozunu kullanır
+            cookies = ydl_profiles.cookie_jar('download')
+            if cookies is not None:
+                segment_session.cookies = cookies
+
+            with ydl_profiles.create('download', **ydl_opts) as ydl:
+                with metrics.span('select', extractor, job=download_id):
+                    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+                host = download_host(selected)
+
+                def fetch():
+                    # Dosyayı indirip önbelleğe taşır; dönüş: (özet, dosya adı, boyut)
+                    download_cache.reserve(download_id, expected_size(selected))
+                    try:
+                        timing['start'] = time.perf_counter()
+                        direct = direct_download_target(selected)
+                        if direct:
+                            # Tek dosyalık formatlar çok bağlantılı parçalı indiriciyle alınır
+                            filepath = ydl.prepare_filename(direct)
+                            downloader = SegmentedDownloader(
+                                direct['url'],
+                                filepath,
+                                connections=app.config['SEGMENT_CONNECTIONS'],
+                                max_connections=app.config['SEGMENT_MAX_CONNECTIONS'],
+                                headers=direct.get('http_headers'),
+                                session=segment_session,
+                                progress_hook=progress_hook,
+                                throttle=transfer.throttle,
+                                alternates=equivalent_formats(info.get('formats'), direct),
+                                resolve=lambda: fresh_targets(download.url, direct),
+                                stall_timeout=app.config['SEGMENT_STALL_TIMEOUT']
+                            )
+                            try:
+                                downloader.download()
+                            finally:
+                                record_segment_events(downloader.stats)
+                            # Özet yazılırken blok blok hesaplandı; dosya yeniden okunmaz
+                            content_hash = downloader.digest
+                            integrity = verify_file(filepath, downloader.total, content_hash)
+                            if 'connect' in downloader.timings:
+                                metrics.record_span('connect', downloader.timings['connect'], extractor, job=download_id, host=host)
+                            timing['first_byte'] = downloader.timings.get('first_byte', timing['first_byte'])
+                        elif selected.get('requested_formats') and merge_available(ydl):
+                            # Görüntü ve ses aynı anda indirilir, ikisi bitince kopyalanarak birleştirilir
+                            downloader = MergedDownloader(
+                                ydl_opts,
+                                selected,
+                                ydl.prepare_filename(selected),
+                                ydl_factory=lambda opts: ydl_profiles.create('download', **opts),
+                                connections=app.config['SEGMENT_CONNECTIONS'],
+                                session=segment_session,
+                                progress_hook=progress_hook,
+                                fragment_hooks=[transfer.progress_hook],
+                                throttle=transfer.throttle,
+                                formats=info.get('formats'),
+                                resolve=lambda fmt: fresh_targets(download.url, fmt),
+                                max_connections=app.config['SEGMENT_MAX_CONNECTIONS'],
+                                stall_timeout=app.config['SEGMENT_STALL_TIMEOUT']
+                            )
+                            try:
+                                filepath = downloader.download()
+                            finally:
+                                record_segment_events(downloader.stats)
+                            timing['first_byte'] = downloader.timings.get('first_byte', timing['first_byte'])
+                            if 'merge' in downloader.timings:
+                                metrics.record_span('postprocess', downloader.timings['merge'], extractor,
+                                                    job=download_id, postprocessor='Merger')
+                        else:
+                            result = ydl.process_ie_result(info, download=True)
+                            requested = (result.get('requested_downloads') or [{}])[0]
+                            filepath = requested.get('filepath') or result.get('filepath')
+
+                        if not filepath or not os.path.exists(filepath):
+                            raise Exception('İndirilen dosya bulunamadı')
+                        if not direct:
+                            # yt-dlp/ffmpeg çıktısı: kapsayıcı denetlenir, özeti önbelleğe alırken hesaplanır
+                            content_hash = None
+                            integrity = verify_file(filepath)
+                        integrity_checks.inc(result=integrity['status'])
+                        if integrity['status'] == INTEGRITY_FAILED:
+                            # Bozuk dosya önbelleğe girmez
+                            try:
+                                os.remove(filepath)
+                            except OSError:
+                                pass
+                            raise IntegrityError(integrity)
+
+                        if timing['first_byte'] is not None:
+                            metrics.record_span('first_byte', timing['first_byte'], extractor, job=download_id, host=host)
+                        # Aktarım süresine birleştirme dahil değildir; o 'postprocess' aşamasında
+                        elapsed = (timing['end'] or time.perf_counter()) - timing['start']
+                        metrics.record_span('transfer', elapsed, extractor, job=download_id, host=host)
+                        if elapsed > 0:
+                            throughput.observe(os.path.getsize(filepath) / elapsed, host=host, extractor=extractor)
+
+                        name = os.path.basename(filepath)
+                        content_hash, size = download_cache.store(key, filepath, name, content_hash, integrity, pin=True)
+                        fetched.append(content_hash)
+                        return content_hash, name, size, integrity['status'], integrity['note']
+                    finally:
+                        download_cache.release(download_id)
+
+                # Aynı video ve format daha önce indirildiyse diskteki kopya kullanılır;
+                # şu an indiriliyorsa o indirme beklenir. Nesne lookup/store içinde işe
+                # bağlanır (pin): satır kaydedilene kadar kota temizliğinde silinmez
+                key = cache_key(info, selected)
+                fetched = []
+                cached = download_cache.lookup(key, pin=True) if key else None
+                if cached is None:
+                    cached = fetch_flight.do(key, fetch) if key else fetch()
+                    if not fetched:
+                        # Başka işin indirmesi beklendi; onun bağı bu işe geçmez, nesne yeniden
+                        # aranıp bağlanır (arada silindiyse bu iş kendisi indirir)
+                        cached = download_cache.lookup(key, pin=True) or fetch()
+                pinned = cached[0]
+
+            content_hash, filename, size, integrity, integrity_note = cached
+            download.filename = filename
+            download.content_hash = content_hash
+            download.checksum = content_hash
+            download.integrity = integrity
+            download.integrity_note = integrity_note
+            download.file_size = format_size(size)
+            download.progress = 100
+            download.status = STATUS_COMPLETED
+            try:
+                os.rmdir(job_dir)
+            except OSError:
+                pass
+
+        except Exception as e:
+            print(f"İndirme hatası ({download_id}): {e}")
+            download.status = STATUS_ERROR
+            throttled, retry_after = throttle_hint(e)
+            if throttled and host:
+                # Sitenin kuyruktaki diğer işleri geri çekilme bitene kadar bekler
+                delay = download_hosts.throttled(host_key(host), retry_after)
+                print(f"{host_key(host)} 429 döndürdü, {delay:.0f} sn beklenecek")
+            if isinstance(e, IntegrityError):
+                download.integrity = e.result['status']
+                download.integrity_note = e.result['note']
+        finally:
+            transfer.close()
+            progress_writer.discard(download_id)
+
+        db.session.commit()
+        if pinned:
+            download_cache.unpin(pinned)
+        downloads_total.inc(status=download.status)
+        progress_feed.publish(
+            download_id,
+            status=download.status,
+            progress=download.progress,
+            filename=download.filename,
+            file_size=download.file_size,
+            integrity=download.integrity,
+            integrity_note=download.integrity_note,
+            speed=0
+        )
+
+def record_segment_events(stats):
+    for name in ('stalls', 'failovers', 'resolves', 'repaired_blocks'):
+        if stats.get(name):
+            segment_events.inc(stats[name], event=name)
+
+def download_host(info):
+    url = info.get('url') or next(
+        (f.get('url') for f in info.get('requested_formats') or () if f.get('url')), '')
+    return urlparse(url).hostname or ''
+
+segment_session = create_session(app.config['SEGMENT_MAX_CONNECTIONS'] * app.config['DOWNLOAD_WORKERS'])
+
+download_engine = DownloadJobEngine(
+    run_download_job,
+    workers=app.config['DOWNLOAD_WORKERS'],
+    max_queue=app.config['DOWNLOAD_MAX_QUEUE'],
+    client_max_jobs=app.config['CLIENT_MAX_DOWNLOADS'],
+    client_weights=app.config['CLIENT_WEIGHTS'],
+    hosts=download_hosts
+)
+
+metrics.gauge('ytdl_queue_depth', 'Kuyrukta bekleyen indirme işleri',
+              lambda: download_engine.stats()['queued'])
+metrics.gauge('ytdl_active_jobs', 'Çalışan indirme işleri',
+              lambda: download_engine.stats()['active'])
+metrics.gauge('ytdl_extract_cache_requests_total', 'Çıkarım önbelleği istekleri',
+              lambda: [({'result': 'hit'}, extract_cache.stats()['hits']),
+                       ({'result': 'miss'}, extract_cache.stats()['misses'])],
+              ('result',), metric_type='counter')
+metrics.gauge('ytdl_extract_cache_hit_ratio', 'Çıkarım önbelleği isabet oranı',
+              lambda: extract_cache.stats()['hit_rate'])
+metrics.gauge('ytdl_extract_cache_bytes', 'Çıkarım önbelleğinin boyutu',
+              lambda: extract_cache.stats()['bytes'])
+metrics.gauge('ytdl_extract_in_flight', 'Süren çıkarımlar',
+              lambda: extract_flight.stats()['in_flight'])
+metrics.gauge('ytdl_extract_workers', 'Çıkarım süreçleri',
+              lambda: [({'state': 'busy'}, extract_pool.stats()['busy']),
+                       ({'state': 'idle'}, extract_pool.stats()['idle'])],
+              ('state',))
+metrics.gauge('ytdl_extract_worker_events_total', 'Süresi dolan, iptal edilen, yenilenen ve çöken çıkarım süreçleri',
+              lambda: [({'event': name}, extract_pool.stats()[name])
+                       for name in ('timeouts', 'cancelled', 'recycled', 'crashed')],
+              ('event',), metric_type='counter')
+metrics.gauge('ytdl_extract_waiting', 'Boş çıkarım süreci bekleyen istekler',
+              lambda: extract_pool.stats()['waiting'])
+metrics.gauge('ytdl_host_throttles_total', "Sitelerden gelen 429'lar (geri çekilmeler)",
+              lambda: [({'path': 'extract'}, extract_hosts.stats()['throttles']),
+                       ({'path': 'download'}, download_hosts.stats()['throttles'])],
+              ('path',), metric_type='counter')
+metrics.gauge('ytdl_extract_coalesced_total', 'Süren bir çıkarımı bekleyerek karşılanan istekler',
+              lambda: extract_flight.stats()['coalesced'], metric_type='counter')
+metrics.gauge('ytdl_download_cache_requests_total', 'İndirme önbelleği istekleri',
+              lambda: [({'result': 'hit'}, download_cache.stats()['hits']),
+                       ({'result': 'miss'}, download_cache.stats()['misses'])],
+              ('result',), metric_type='counter')
+metrics.gauge('ytdl_download_cache_bytes', 'İndirme önbelleğindeki dosyaların boyutu',
+              lambda: download_cache.stats()['bytes'])
+metrics.gauge('ytdl_bandwidth_active_transfers', 'Hız zamanlayıcısındaki aktarımlar',
+              lambda: bandwidth.stats()['active'])
+metrics.gauge('ytdl_progress_pending_writes', 'Veritabanına yazılmayı bekleyen ilerlemeler',
+              lambda: progress_writer.stats()['pending'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if app.config['PROFILE_REQUESTS'] and (request.args.get('profile') or request.headers.get('X-Profile')):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_timing(response):
+    endpoint = request.endpoint or 'bilinmiyor'
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        name = f"{endpoint}-{int(time.time() * 1000)}.prof"
+        profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+        response.headers['X-Profile-File'] = name
+    started = g.pop('request_started', None)
+    if started is not None:
+        request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+    responses_total.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/stats')
+def stats():
+    return jsonify({
+        'extract_cache': extract_cache.stats(),
+        'extract_flight': extract_flight.stats(),
+        'extract_pool': extract_pool.stats(),
+        'downloads': download_engine.stats(),
+        'hosts': {'extract': extract_hosts.stats(), 'download': download_hosts.stats()},
+        'batches': batch_streams.stats(),
+        'progress_feed': progress_feed.stats(),
+        'bandwidth': bandwidth.stats(),
+        'download_cache': download_cache.stats(),
+        'history': progress_writer.stats(),
+        'ydl': ydl_profiles.stats(),
+        'startup': dict(startup),
+        'spans': list(metrics.recent_spans)[-50:]
+    })
+
+def warm_up():
+    # İlk isteklerin ödeyeceği yüklemeler önceden yapılır: yt-dlp (format seçimi
+    # ve indirme için), veritabanı bağlantısı ve çıkarım süreçleri
+    started = time.perf_counter()
+    try:
+        ydl_profiles.warm_up()
+        history.prepare()
+        with app.app_context():
+            db.session.execute(db.text('SELECT 1'))
+            db.session.remove()
+        if app.config['EXTRACT_WORKERS'] > 0:
+            extract_pool.start()
+    except Exception as e:
+        print(f"Ön yükleme hatası: {e}")
+    startup['warmup_seconds'] = time.perf_counter() - started
+    metrics.record_span('warmup', startup['warmup_seconds'])
+
+def warm_up_on_first_request(wsgi_app):
+    # Ön yükleme içe aktarmada değil ilk istekte başlar: Passenger uygulamayı
+    # yükledikten sonra süreci fork ile çoğaltabilir, iş parçacıkları fork'a taşınmaz
+    lock = threading.Lock()
+    started = []
+
+    def application(environ, start_response):
+        if not started:
+            with lock:
+                if not started:
+                    started.append(True)
+                    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+        return wsgi_app(environ, start_response)
+    return application
+
+# Tablo, sütun eklemeleri ve dizinler HistoryStore (ensure_schema) ile ilk bağlantıda
+# oluşturulur; ayrıca db.create_all() çalıştırılmaz
+startup = {'import_seconds': time.perf_counter() - IMPORT_STARTED, 'warmup_seconds': None}
+metrics.gauge('ytdl_startup_seconds', 'app.py içe aktarma ve ön yükleme süresi',
+              lambda: [({'phase': phase}, startup[f"{phase}_seconds"]) for phase in ('import', 'warmup')],
+              ('phase',))
 
 if __name__ == '__main__':
     app.run(debug=True)
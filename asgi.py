@@ -0,0 +1,343 @@
+import asyncio
+import contextvars
+import copy
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from werkzeug.wsgi import FileWrapper
+import app as web
+from extract_pool import ExtractTimeout
+from fair_queue import ClientQuotaExceeded, HostThrottled
+
+# ASGI sunucusuyla çalıştırma: uvicorn asgi:application
+# Yavaş istekler (çıkarım, ilerleme akışı) iş parçacığı tutmadan olay döngüsünde
+# bekler; diğer yollar aynı Flask uygulamasına iş parçacığı havuzunda devredilir.
+# Passenger gibi yalnızca WSGI destekleyen sunucular passenger_wsgi.py'yi kullanır.
+
+FILE_CHUNK = 256 * 1024
+_DONE = object()
+
+
+class ClientGone(Exception):
+    pass
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.args = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.disconnected = asyncio.Event()
+        self.client = web.client_key((scope.get('client') or ('', 0))[0], self.headers)
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b'null')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+class Reply:
+    def __init__(self, status, body=b'', content_type='application/json', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = [(b'content-type', content_type.encode('latin-1'))]
+        for name, value in (headers or {}).items():
+            self.headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+        if isinstance(body, bytes):
+            self.headers.append((b'content-length', str(len(body)).encode('latin-1')))
+
+    @classmethod
+    def json(cls, payload, status=200, headers=None):
+        return cls(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), headers=headers)
+
+    async def send(self, send, disconnected):
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        if isinstance(self.body, bytes):
+            await send({'type': 'http.response.body', 'body': self.body})
+            return
+        try:
+            async for chunk in self.body:
+                if disconnected.is_set():
+                    return
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        finally:
+            await self.body.aclose()
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def read_body(receive, request_gone):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            request_gone.set()
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def watch_disconnect(receive, event):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            event.set()
+            return
+
+
+class WsgiBridge:
+    # Flask uygulamasını ASGI altında çalıştırır. Uygulama çağrısı ve yanıtın her
+    # parçası havuzda, aynı contextvars bağlamında çalışır (stream_with_context
+    # bağlamı parçalar arasında taşır).
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        gone = asyncio.Event()
+        body = await read_body(receive, gone)
+        watcher = asyncio.ensure_future(watch_disconnect(receive, gone)) if not gone.is_set() else None
+        environ = self.environ(scope, body)
+        context = contextvars.copy_context()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: started.setdefault('written', []).append(data)
+
+        result = await loop.run_in_executor(self.executor, context.run, self.wsgi_app, environ, start_response)
+        iterator = iter(result)
+        try:
+            # Başlıklar ilk parça üretildikten sonra kesinleşir (üreteçli yanıtlar)
+            chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, _DONE)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            for data in started.get('written', ()):
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            while chunk is not _DONE and not gone.is_set():
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, _DONE)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if watcher:
+                watcher.cancel()
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, context.run, result.close)
+
+    def environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            # Dosyalar büyük parçalarla okunur; her parça havuza bir gidiş-dönüş
+            'wsgi.file_wrapper': lambda f, size=FILE_CHUNK: FileWrapper(f, max(size, FILE_CHUNK)),
+            'asgi.scope': scope,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+class AsgiApp:
+    def __init__(self, flask_app, threads=32):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        self.wsgi = WsgiBridge(flask_app.wsgi_app, self.executor)
+        self.routes = {
+            ('POST', '/api/get-formats'): (self.get_formats, 'get_formats'),
+            ('POST', '/api/download'): (self.download_video, 'download_video'),
+            ('GET', '/api/downloads/events'): (self.download_events, 'download_events'),
+        }
+        # Aynı video için süren çıkarım: anahtar -> {'task', 'waiters'}
+        self._extractions = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        route = self.routes.get((scope['method'], scope['path']))
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        handler, endpoint = route
+        started = time.perf_counter()
+        gone = asyncio.Event()
+        request = Request(scope, await read_body(receive, gone))
+        if gone.is_set():
+            return
+        request.disconnected = gone
+        watcher = asyncio.ensure_future(watch_disconnect(receive, gone))
+        status = 499
+        try:
+            reply = await handler(request)
+            status = reply.status
+            web.request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+            await reply.send(send, gone)
+        except ClientGone:
+            pass
+        finally:
+            watcher.cancel()
+            web.responses_total.inc(endpoint=endpoint, status=status)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+                # İstek kabul edilmeye başladıktan sonra arka planda ön yükleme
+                if os.environ.get('YTDL_WARMUP', '1') != '0':
+                    asyncio.get_running_loop().run_in_executor(self.executor, web.warm_up)
+            elif message['type'] == 'lifespan.shutdown':
+                web.extract_pool.close()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run(self, fn, *args):
+        # Veritabanı kullanan kısa işler havuzda, uygulama bağlamıyla çalışır
+        def call():
+            with web.app.app_context():
+                return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def extract(self, url, disconnected, client=None):
+        # extract_video_info'nun async karşılığı: önbellek, aynı video için tek
+        # çıkarım; bekleyen son istemci de giderse çıkarım iptal edilir
+        key = web.extract_cache.key_for(url)
+        info = web.extract_cache.get(key)
+        if info is not None:
+            return info
+
+        entry = self._extractions.get(key)
+        if entry is None:
+            entry = {'task': asyncio.ensure_future(self._extract_and_cache(url, key, client)), 'waiters': 0}
+            self._extractions[key] = entry
+            entry['task'].add_done_callback(lambda _: self._extractions.pop(key, None))
+        entry['waiters'] += 1
+        gone = asyncio.ensure_future(disconnected.wait())
+        try:
+            done, _ = await asyncio.wait({entry['task'], gone}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            done = ()
+            raise
+        finally:
+            gone.cancel()
+            entry['waiters'] -= 1
+            if entry['task'] not in done and entry['waiters'] == 0:
+                entry['task'].cancel()
+        if entry['task'] not in done:
+            raise ClientGone()
+        return copy.deepcopy(entry['task'].result())
+
+    async def _extract_and_cache(self, url, key, client=None):
+        with web.metrics.span('extract') as span:
+            if web.app.config['EXTRACT_WORKERS'] > 0:
+                info = await web.extract_pool.extract_async(
+                    url, client=client, client_limit=web.app.config['CLIENT_MAX_EXTRACTS'])
+            else:
+                info = await asyncio.get_running_loop().run_in_executor(self.executor, web.run_extract, url)
+            if not info:
+                return None
+            span['extractor'] = info.get('extractor_key', '')
+        web.extract_cache.put(key, info)
+        return info
+
+    async def get_formats(self, request):
+        data = request.json()
+        url = data.get('url')
+        if not url:
+            return Reply.json({'error': 'URL gerekli'}, 400)
+        try:
+            info = await self.extract(url, request.disconnected, request.client)
+            return Reply.json(*await self.run(web.formats_result, info, data))
+        except (ClientQuotaExceeded, HostThrottled) as e:
+            return Reply.json(*web.limit_result(e))
+        except ExtractTimeout as e:
+            return Reply.json({'error': str(e)}, 504)
+        except ClientGone:
+            raise
+        except Exception as e:
+            return Reply.json({'error': str(e)}, 500)
+
+    async def download_video(self, request):
+        data = request.json()
+        url = data.get('url')
+        format_id = data.get('format_id')
+        if not url or not format_id:
+            return Reply.json({'error': 'URL ve format_id gerekli'}, 400)
+        try:
+            result = await self.run(web.download_precheck, url, format_id, request.client)
+            if result is None:
+                info = await self.extract(url, request.disconnected, request.client)
+                result = await self.run(web.download_result, url, format_id, info, request.client)
+            return Reply.json(*result)
+        except (ClientQuotaExceeded, HostThrottled) as e:
+            return Reply.json(*web.limit_result(e))
+        except ExtractTimeout as e:
+            return Reply.json({'error': str(e)}, 504)
+        except ClientGone:
+            raise
+        except Exception as e:
+            return Reply.json({'error': str(e)}, 500)
+
+    async def download_events(self, request):
+        last_event_id = request.headers.get('last-event-id') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+        if request.args.get('poll'):
+            try:
+                timeout = min(float(request.args.get('timeout', 25)), 60)
+            except ValueError:
+                timeout = 25
+            if last_event_id is None:
+                last_event_id = web.progress_feed.last_event_id
+            events, reset = await web.progress_feed.wait_async(last_event_id, timeout)
+            return Reply.json(web.poll_payload(events, reset, last_event_id))
+
+        return Reply(
+            200,
+            self.sse_stream(last_event_id),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    async def sse_stream(self, last_event_id):
+        if last_event_id is None:
+            last_event_id = web.progress_feed.last_event_id
+        deadline = time.monotonic() + web.app.config['SSE_MAX_DURATION']
+        yield web.SSE_RETRY
+        while time.monotonic() < deadline:
+            events, reset = await web.progress_feed.wait_async(last_event_id, web.app.config['SSE_HEARTBEAT'])
+            chunk, last_event_id = web.sse_chunk(events, reset, last_event_id)
+            yield chunk
+
+
+application = AsgiApp(web.app, threads=web.app.config['ASGI_THREADS'])
@@ -0,0 +1,288 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_CATEGORY = 'Genel'
+# Payı dolduran aktarım daha fazlasını isteyebilir sayılır
+HUNGRY_RATIO = 0.9
+# Payının altında kalan aktarıma ölçülen hızdan biraz fazlası bırakılır ki hızlanabilsin
+HEADROOM = 1.25
+MIN_RATE = 16 * 1024
+
+
+class TokenBucket:
+    # rate bayt/sn (None: sınırsız). En fazla bir saniyelik (ya da burst kadar)
+    # jeton birikir; büyük parçalar borç olarak alınır ve borç kadar beklenir.
+    def __init__(self, rate=None, burst=None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.burst = burst
+            capacity = self._capacity()
+            if capacity is not None:
+                self._tokens = min(self._tokens, capacity)
+
+    def _capacity(self):
+        if not self.rate:
+            return None
+        return self.burst or self.rate
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self._tokens + (now - self._stamp) * self.rate, self._capacity())
+        self._stamp = now
+
+    def reserve(self, amount):
+        # amount bayt için beklenmesi gereken süreyi döndürür
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self.rate:
+                return 0.0
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def consume(self, amount, should_stop=None):
+        delay = self.reserve(amount)
+        deadline = time.monotonic() + delay
+        # Duraklatma beklemeyi kesebilsin diye kısa dilimlerle uyunur
+        while delay > 0:
+            if should_stop and should_stop():
+                return
+            time.sleep(min(delay, 0.25))
+            delay = deadline - time.monotonic()
+
+
+class TimeWindow:
+    # Günün belirli saatlerinde geçerli genel hız sınırı; gece yarısını aşabilir
+    # (ör. 22:00-07:00), başlangıç ve bitiş aynıysa (ör. 00:00-00:00) tüm gün
+    # geçerlidir. days: 0=Pazartesi ... 6=Pazar, None: her gün.
+    def __init__(self, start, end, rate, days=None):
+        self.start = _minutes(start)
+        self.end = _minutes(end)
+        self.rate = rate
+        self.days = set(days) if days is not None else None
+
+    def contains(self, when):
+        minute = when.hour * 60 + when.minute
+        if self.start == self.end:
+            inside = True
+            day = when.weekday()
+        elif self.start < self.end:
+            inside = self.start <= minute < self.end
+            day = when.weekday()
+        else:
+            inside = minute >= self.start or minute < self.end
+            # Gece yarısını aşan pencere başladığı güne sayılır
+            day = when.weekday() if minute >= self.start else (when.weekday() - 1) % 7
+        return inside and (self.days is None or day in self.days)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['start'], data['end'], data.get('rate'), data.get('days'))
+
+
+def _minutes(value):
+    hour, _, minute = str(value).partition(':')
+    return int(hour) * 60 + int(minute or 0)
+
+
+class Transfer:
+    # Zamanlayıcıya kayıtlı tek bir indirme; veri yolundaki her parça için
+    # throttle çağrılır, yt-dlp indirmelerinde progress_hook aynı işi görür.
+    def __init__(self, scheduler, job_id, category, rate_limit, should_stop):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.category = category or DEFAULT_CATEGORY
+        self.rate_limit = rate_limit
+        self.should_stop = should_stop
+        self.bucket = TokenBucket()
+        self.used = 0
+        self.hungry = True
+        self.demand = rate_limit
+        self._last_bytes = {}
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def throttle(self, amount):
+        self.scheduler._account(self, amount)
+        self.bucket.consume(amount, self.should_stop)
+
+    def progress_hook(self, d):
+        if d.get('status') != 'downloading':
+            return
+        # Ses ve görüntü ayrı dosyalara iner; sayaç dosya başına tutulur
+        name = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        delta = downloaded - self._last_bytes.get(name, 0)
+        self._last_bytes[name] = downloaded
+        if delta > 0:
+            self.throttle(delta)
+
+    def close(self):
+        self.scheduler.unregister(self)
+
+
+class BandwidthScheduler:
+    # Tüm aktif indirmelerin ortak hız bütçesi. Genel sınır (ya da o an geçerli
+    # zaman penceresinin sınırı) kategori ağırlıklarına göre paylaştırılır;
+    # payını kullanmayan aktarımın artanı diğerlerine dağıtılır. Paylar
+    # rebalance_interval'da bir, indirme parçaları işlenirken yeniden hesaplanır.
+    def __init__(self, global_rate=None, rules=(), category_weights=None,
+                 per_download_rate=None, rebalance_interval=1.0):
+        self._lock = threading.Lock()
+        self._transfers = []
+        self._last_measure = time.monotonic()
+        self.rebalance_interval = rebalance_interval
+        self.configure(global_rate, rules, category_weights, per_download_rate)
+
+    def configure(self, global_rate=None, rules=(), category_weights=None, per_download_rate=None):
+        with self._lock:
+            self.global_rate = global_rate
+            self.rules = [r if isinstance(r, TimeWindow) else TimeWindow.from_dict(r) for r in rules or ()]
+            self.category_weights = dict(category_weights or {})
+            self.per_download_rate = per_download_rate
+            self._rebalance()
+
+    def current_limit(self, when=None):
+        when = when or datetime.now()
+        for rule in self.rules:
+            if rule.contains(when):
+                return rule.rate
+        return self.global_rate
+
+    def weight(self, category):
+        return max(self.category_weights.get(category, 1), 0.01)
+
+    def register(self, job_id, category=None, rate_limit=None, should_stop=None):
+        transfer = Transfer(self, job_id, category, rate_limit, should_stop)
+        with self._lock:
+            transfer.demand = rate_limit or self.per_download_rate
+            self._transfers.append(transfer)
+            self._rebalance()
+        return transfer
+
+    def unregister(self, transfer):
+        with self._lock:
+            if transfer in self._transfers:
+                self._transfers.remove(transfer)
+                self._rebalance()
+
+    def _account(self, transfer, amount):
+        now = time.monotonic()
+        with self._lock:
+            transfer.used += amount
+            if now - self._last_measure >= self.rebalance_interval:
+                self._measure(now)
+                self._rebalance()
+
+    def _measure(self, now):
+        # Her aktarımın son aralıktaki hızı payıyla karşılaştırılır
+        elapsed = now - self._last_measure
+        self._last_measure = now
+        for transfer in self._transfers:
+            observed = transfer.used / elapsed if elapsed > 0 else 0
+            transfer.used = 0
+            cap = transfer.rate_limit or self.per_download_rate
+            transfer.hungry = not transfer.rate or observed >= transfer.rate * HUNGRY_RATIO
+            transfer.demand = cap
+            if not transfer.hungry:
+                transfer.demand = max(observed * HEADROOM, MIN_RATE)
+                if cap:
+                    transfer.demand = min(transfer.demand, cap)
+
+    def _rebalance(self):
+        limit = self.current_limit()
+        if limit:
+            demands = [(t, self.weight(t.category), t.demand) for t in self._transfers]
+            rates = _water_fill(limit, demands)
+        else:
+            rates = {t: t.rate_limit or self.per_download_rate for t in self._transfers}
+        for transfer, rate in rates.items():
+            transfer.bucket.set_rate(rate)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.current_limit(),
+                'active': len(self._transfers),
+                'transfers': [
+                    {'id': t.job_id, 'category': t.category, 'rate': t.rate, 'hungry': t.hungry}
+                    for t in self._transfers
+                ],
+            }
+
+
+def _water_fill(limit, demands):
+    # Ağırlıklı max-min paylaştırma: talebi payından az olanlar talepleri kadar
+    # alır, artan bütçe kalanlara ağırlıklarıyla yeniden bölünür
+    rates = {}
+    remaining = float(limit)
+    active = list(demands)
+    while active:
+        unit = remaining / sum(weight for _, weight, _ in active)
+        satisfied = [item for item in active if item[2] is not None and item[2] <= item[1] * unit]
+        if not satisfied:
+            for transfer, weight, _ in active:
+                rates[transfer] = weight * unit
+            break
+        for transfer, _, demand in satisfied:
+            rates[transfer] = demand
+            remaining -= demand
+        active = [item for item in active if item not in satisfied]
+    return rates
+
+
+class DeferredStartQueue:
+    # Zamanlanmış indirmeler; bekleyen her iş için ayrı iş parçacığı yerine
+    # çağıran yalnızca en yakın zaman için tek bir zamanlayıcı kurar.
+    def __init__(self):
+        self._heap = []
+        self._jobs = {}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, job_id):
+        return job_id in self._jobs
+
+    def schedule(self, job_id, start_at):
+        self._jobs[job_id] = start_at
+        heapq.heappush(self._heap, (start_at, job_id))
+
+    def cancel(self, job_id):
+        # Yığından silinmez; pop sırasında güncel olmayan kayıt atlanır
+        return self._jobs.pop(job_id, None) is not None
+
+    def _prune(self):
+        while self._heap and self._jobs.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now=None):
+        now = time.time() if now is None else now
+        due = []
+        self._prune()
+        while self._heap and self._heap[0][0] <= now:
+            _, job_id = heapq.heappop(self._heap)
+            del self._jobs[job_id]
+            due.append(job_id)
+            self._prune()
+        return due
+
+    def next_delay(self, now=None):
+        now = time.time() if now is None else now
+        self._prune()
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - now, 0)
@@ -0,0 +1,156 @@
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from format_selector import select_qualities  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_select(formats):
+    # app.py/VideoQualityDialog'daki eski çok geçişli seçim (karşılaştırma için);
+    # eskisi gibi her aday için tam sözlük, sonra yanıt sözlükleri kurulur.
+    # Tek fark: yt-dlp'nin gerçek anahtarı olan 'filesize_approx' okunur.
+    available_qualities = {}
+    video_formats = [f for f in formats if f.get('vcodec', 'none') != 'none' and 'height' in f]
+    audio_formats = [f for f in formats if f.get('acodec', 'none') != 'none' and f.get('vcodec', 'none') == 'none']
+
+    def add(quality_key, data):
+        if quality_key not in available_qualities or data['filesize'] > available_qualities[quality_key]['filesize']:
+            available_qualities[quality_key] = data
+
+    def describe(f, format_id, acodec):
+        return {
+            'format_id': format_id,
+            'filesize': f.get('filesize') or f.get('filesize_approx') or 0,
+            'height': f.get('height') or 0,
+            'vcodec': f.get('vcodec', ''),
+            'acodec': acodec,
+            'ext': f.get('ext', 'mp4'),
+            'fps': f.get('fps', 0),
+            'tbr': f.get('tbr', 0),
+        }
+
+    def label(height):
+        if height == 1440:
+            return "2K"
+        if height == 2160:
+            return "4K"
+        return f"{height}p"
+
+    if audio_formats:
+        best_audio = max(audio_formats, key=lambda x: x.get('tbr') or 0)
+        for vf in video_formats:
+            height = vf.get('height') or 0
+            if height > 0:
+                add(label(height), describe(vf, f"{vf['format_id']}+{best_audio['format_id']}",
+                                            best_audio.get('acodec', '')))
+
+    if not available_qualities:
+        for f in formats:
+            if f.get('acodec', 'none') != 'none' and f.get('vcodec', 'none') != 'none' and 'height' in f:
+                height = f.get('height') or 0
+                if height > 0:
+                    add(label(height), describe(f, f.get('format_id'), f.get('acodec', '')))
+
+    ranked = sorted(available_qualities.items(), key=lambda x: x[1]['height'], reverse=True)
+    formats_list = [{
+        'quality': quality,
+        'format_id': data['format_id'],
+        'ext': data['ext'],
+        'filesize': f"{data['filesize'] / 1024 / 1024:.1f} MB",
+        'vcodec': data['vcodec'],
+        'acodec': data['acodec'],
+        'fps': data['fps'],
+        'tbr': data['tbr'],
+    } for quality, data in ranked]
+    return [(data['quality'], data['format_id']) for data in formats_list]
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return fixtures
+
+
+def synthetic_livestream(base, count, seed=1):
+    # Uzun canlı yayın kayıtlarındaki binlerce formatlı listeleri taklit eder
+    rng = random.Random(seed)
+    formats = []
+    while len(formats) < count:
+        for f in base['formats']:
+            clone = dict(f)
+            clone['format_id'] = f"{f['format_id']}-{len(formats)}"
+            if clone.get('tbr'):
+                clone['tbr'] = round(f['tbr'] * rng.uniform(0.8, 1.2), 1)
+            if clone.get('filesize'):
+                clone['filesize'] = int(f['filesize'] * rng.uniform(0.8, 1.2))
+            formats.append(clone)
+            if len(formats) >= count:
+                break
+    return {'id': f"synthetic-{count}", 'formats': formats}
+
+
+def check_regressions(fixtures):
+    failures = []
+    for name, info in fixtures.items():
+        expected = legacy_select(info['formats'])
+        actual = [(q['quality'], q['format_id']) for q in select_qualities(info['formats'])]
+        if expected != actual:
+            failures.append((name, expected, actual))
+    return failures
+
+
+def measure(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Format seçici kıyaslama ve regresyon testi")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--large', type=int, default=5000, help="sentetik listedeki format sayısı")
+    parser.add_argument('--json', help="sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures()
+    fixtures[f"synthetic_livestream_{args.large}"] = synthetic_livestream(fixtures['youtube_regular'], args.large)
+
+    failures = check_regressions(fixtures)
+    for name, expected, actual in failures:
+        print(f"REGRESYON {name}:\n  beklenen: {expected}\n  gelen:    {actual}")
+
+    results = []
+    for name, info in fixtures.items():
+        formats = info['formats']
+        iterations = max(1, args.iterations // max(1, len(formats) // 100))
+        legacy_ms = measure(lambda: legacy_select(formats), iterations)
+        new_ms = measure(lambda: select_qualities(formats), iterations)
+        results.append({
+            'fixture': name,
+            'formats': len(formats),
+            'legacy_ms': round(legacy_ms, 4),
+            'selector_ms': round(new_ms, 4),
+            'speedup': round(legacy_ms / new_ms, 2) if new_ms else None,
+        })
+        print(f"{name:32} {len(formats):6} format  eski {legacy_ms:8.3f} ms  yeni {new_ms:8.3f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'regressions': len(failures)}, f, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
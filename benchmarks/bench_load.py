@@ -0,0 +1,560 @@
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from media_server import MediaServer  # noqa: E402
+
+# Sunucu ayrı süreçte çalışır; benchmarks/ PYTHONPATH'te olduğundan çıkarım süreçleri
+# yt_dlp_plugins'teki sahte çıkarıcıyı yükler
+SERVERS = {
+    'wsgi': """
+import sys
+import app as web
+from werkzeug.serving import make_server
+web.app.config['CLIENT_IP_HEADER'] = 'X-Forwarded-For'
+web.warm_up()
+server = make_server('127.0.0.1', int(sys.argv[1]), web.app, threaded=True)
+print('ready', flush=True)
+server.serve_forever()
+""",
+    'asgi': """
+import sys
+import uvicorn
+import app as web
+web.app.config['CLIENT_IP_HEADER'] = 'X-Forwarded-For'
+uvicorn.run('asgi:application', host='127.0.0.1', port=int(sys.argv[1]), log_level='warning')
+""",
+}
+
+SCENARIOS = ('get-formats', 'download', 'fairness', 'desktop', 'headless')
+
+STATUS_COMPLETED = 'Tamamlandı'
+STATUS_ERROR = 'Hata'
+
+_local = threading.local()
+
+
+def session():
+    # Her yük iş parçacığı kendi bağlantı havuzunu kullanır
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+        _local.session.trust_env = False
+    return _local.session
+
+
+def client_headers(client):
+    # Sunucu istemciyi bu başlıktan tanır; yük iş parçacıkları ayrı istemciler gibi davranır
+    return {'X-Forwarded-For': f"10.0.{client // 256}.{client % 256}"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def child_env(instance_dir=None):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BENCH_DIR, ROOT, env.get('PYTHONPATH')]))
+    env['NO_PROXY'] = env['no_proxy'] = '127.0.0.1,localhost'
+    env['QT_QPA_PLATFORM'] = env.get('QT_QPA_PLATFORM', 'offscreen')
+    if instance_dir:
+        env['YTDL_INSTANCE_PATH'] = instance_dir
+    return env
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    return {
+        'p50': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p90': round(percentile(latencies, 90) * 1000, 2) if latencies else None,
+        'p99': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'max': round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def peak_rss_mb(pid):
+    # Linux'ta sürecin en yüksek RSS'i (VmHWM); ölçülemiyorsa None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    pids = []
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # comm parantez içinde ve boşluk içerebilir; ppid ondan sonraki ikinci alan
+                    fields = f.read().rsplit(')', 1)[1].split()
+                if int(fields[1]) == pid:
+                    pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        pass
+    return pids
+
+
+class AppServer:
+    # Uygulamayı geçici bir instance dizininde, ayrı bir süreçte başlatır
+    def __init__(self, mode='wsgi'):
+        self.mode = mode
+        self.port = free_port()
+        self.instance_dir = tempfile.mkdtemp(prefix='ytdl-bench-')
+        self.log_path = os.path.join(self.instance_dir, 'server.log')
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout=60):
+        self._log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', SERVERS[self.mode], str(self.port)],
+            cwd=ROOT, env=child_env(self.instance_dir), stdout=self._log, stderr=subprocess.STDOUT
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                # Isınma (yt-dlp, çıkarım süreçleri) bitmeden ölçüm başlamaz
+                resp = session().get(self.base_url + '/api/stats', timeout=2)
+                if resp.status_code == 200 and resp.json().get('startup', {}).get('warmup_seconds') is not None:
+                    return self
+            except (requests.RequestException, ValueError):
+                pass
+            time.sleep(0.2)
+        self.stop()
+        with open(self.log_path, errors='replace') as f:
+            raise RuntimeError(f"Sunucu başlatılamadı ({self.mode}):\n{f.read()[-2000:]}")
+
+    def peak_rss(self):
+        workers = [peak_rss_mb(pid) for pid in child_pids(self.process.pid)]
+        return {
+            'server_mb': peak_rss_mb(self.process.pid),
+            'extract_workers_mb': round(sum(w for w in workers if w), 1) if any(workers) else None,
+        }
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+
+
+def run_load(call, total, concurrency):
+    # call(i) yanıtı döndürür; her çağrının süresi ölçülür, her hata türünden bir örnek saklanır
+    latencies = []
+    statuses = Counter()
+    errors = {}
+    lock = threading.Lock()
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            resp = call(i)
+            status, error = str(resp.status_code), None if resp.ok else resp.text[:300]
+        except requests.RequestException as e:
+            status, error = type(e).__name__, str(e)[:300]
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+            if error:
+                errors.setdefault(status, error)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return latencies, statuses, errors, time.perf_counter() - started
+
+
+def bench_get_formats(server, media, args):
+    def call(i):
+        video_id = 'cached' if args.cached else f"gf{i}"
+        resp = session().post(server.base_url + '/api/get-formats',
+                              json={'url': media.watch_url(args.fixture, video_id)},
+                              headers=client_headers(i % args.clients), timeout=120)
+        return resp
+
+    if args.cached:
+        call(0)
+    latencies, statuses, errors, wall = run_load(call, args.requests, args.concurrency)
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'statuses': dict(statuses),
+        'errors': errors,
+        'requests_per_sec': round(args.requests / wall, 2),
+        'latency_ms': latency_summary(latencies),
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def bench_download(server, media, args):
+    format_id = f"bench-{args.format}"
+    submitted = {}
+
+    def call(i):
+        resp = session().post(server.base_url + '/api/download', json={
+            'url': media.watch_url(args.fixture, f"dl{i}"),
+            'format_id': format_id,
+        }, headers=client_headers(i % args.clients), timeout=120)
+        if resp.status_code == 202:
+            submitted[resp.json()['id']] = time.perf_counter()
+        return resp
+
+    sent_before = media.stats()['bytes_sent']
+    latencies, statuses, errors, _ = run_load(call, args.downloads, args.concurrency)
+    started = min(submitted.values()) if submitted else time.perf_counter()
+
+    # İşler arka planda sürer; bitişleri liste uç noktasından izlenir
+    finished = {}
+    deadline = time.monotonic() + args.timeout
+    while len(finished) < len(submitted) and time.monotonic() < deadline:
+        rows = session().get(server.base_url + '/api/downloads', params={'limit': 500}, timeout=30).json()
+        now = time.perf_counter()
+        for row in rows:
+            if row['id'] in submitted and row['id'] not in finished and row['status'] in (STATUS_COMPLETED, STATUS_ERROR):
+                finished[row['id']] = (row['status'], now)
+        time.sleep(args.poll_interval)
+
+    completed = [job for job, (status, _) in finished.items() if status == STATUS_COMPLETED]
+    durations = [finished[job][1] - submitted[job] for job in completed]
+    wall = max((at for _, at in finished.values()), default=time.perf_counter()) - started
+    transferred = media.stats()['bytes_sent'] - sent_before
+    return {
+        'downloads': args.downloads,
+        'concurrency': args.concurrency,
+        'format': format_id,
+        'statuses': dict(statuses),
+        'errors': errors,
+        'completed': len(completed),
+        'failed': len(finished) - len(completed),
+        'unfinished': len(submitted) - len(finished),
+        'submit_latency_ms': latency_summary(latencies),
+        'completion_latency_ms': latency_summary(durations),
+        'bytes': transferred,
+        'bytes_per_sec': round(transferred / wall) if wall > 0 else None,
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def bench_fairness(server, media, args):
+    # Bir istemci get-formats'a --concurrency ile yüklenirken başka bir istemcinin
+    # sıralı istekleri ölçülür; kotayı aşan yoğun istekler hemen 429 almalı
+    def heavy(i):
+        return session().post(server.base_url + '/api/get-formats',
+                              json={'url': media.watch_url(args.fixture, f"heavy{i}")},
+                              headers=client_headers(1), timeout=120)
+
+    loaded = {}
+    thread = threading.Thread(target=lambda: loaded.update(
+        zip(('latencies', 'statuses', 'errors', 'wall'), run_load(heavy, args.requests, args.concurrency))))
+    thread.start()
+    # Yoğun istemcinin istekleri kuyruğa girsin
+    time.sleep(0.2)
+    latencies = []
+    statuses = Counter()
+    errors = {}
+    for i in range(args.light_requests):
+        start = time.perf_counter()
+        try:
+            resp = session().post(server.base_url + '/api/get-formats',
+                                  json={'url': media.watch_url(args.fixture, f"light{i}")},
+                                  headers=client_headers(2), timeout=120)
+            status, error = str(resp.status_code), None if resp.ok else resp.text[:300]
+        except requests.RequestException as e:
+            status, error = type(e).__name__, str(e)[:300]
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+        if error:
+            errors.setdefault(status, error)
+    thread.join()
+    return {
+        'requests': args.light_requests,
+        'statuses': dict(statuses),
+        'errors': errors,
+        'latency_ms': latency_summary(latencies),
+        'heavy_requests': args.requests,
+        'heavy_concurrency': args.concurrency,
+        'heavy_statuses': dict(loaded['statuses']),
+        'heavy_latency_ms': latency_summary(loaded['latencies']),
+    }
+
+
+def bench_desktop(media, args):
+    # Masaüstü DownloadThread'leri ayrı süreçte (kendi çalışma dizini ve RSS ölçümüyle)
+    workdir = tempfile.mkdtemp(prefix='ytdl-bench-desktop-')
+    params = {
+        'urls': [media.watch_url(args.fixture, f"desk{i}") for i in range(args.downloads)],
+        'format_id': f"bench-{args.format}",
+        'concurrency': args.concurrency,
+        'connections': args.connections,
+        'timeout': args.timeout,
+    }
+    sent_before = media.stats()['bytes_sent']
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--desktop-worker', json.dumps(params)],
+                          cwd=workdir, env=child_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Masaüstü ölçümü başarısız:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    transferred = media.stats()['bytes_sent'] - sent_before
+    wall = result.pop('wall_seconds')
+    return dict(
+        result,
+        downloads=args.downloads,
+        concurrency=args.concurrency,
+        format=params['format_id'],
+        completion_latency_ms=latency_summary(result.pop('durations')),
+        bytes=transferred,
+        bytes_per_sec=round(transferred / wall) if wall > 0 else None,
+        wall_seconds=round(wall, 3),
+    )
+
+
+def bench_headless(media, args):
+    # download_manager.py batch: JSONL stdin'den, olaylar stdout'tan okunur
+    workdir = tempfile.mkdtemp(prefix='ytdl-bench-headless-')
+    lines = [json.dumps({'url': media.watch_url(args.fixture, f"head{i}"), 'format_id': f"bench-{args.format}"})
+             for i in range(args.downloads)]
+    command = [sys.executable, os.path.join(ROOT, 'download_manager.py'), 'batch',
+               '--jobs', str(args.concurrency), '--connections', str(args.connections),
+               '--db', os.path.join(workdir, 'history.db'), '--output-dir', workdir]
+    sent_before = media.stats()['bytes_sent']
+    started = time.perf_counter()
+    proc = subprocess.run(command, input='\n'.join(lines) + '\n', cwd=workdir, env=child_env(),
+                          capture_output=True, text=True, timeout=args.timeout)
+    wall = time.perf_counter() - started
+    events = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith('{')]
+    summary = next((e for e in events if e['event'] == 'summary'), None)
+    if summary is None:
+        raise RuntimeError(f"Başsız ölçüm başarısız:\n{proc.stderr[-2000:]}")
+    begun = {e['id']: e['time'] for e in events if e['event'] == 'started'}
+    durations = [e['time'] - begun[e['id']] for e in events if e['event'] == 'finished' and e['id'] in begun]
+    transferred = media.stats()['bytes_sent'] - sent_before
+    return {
+        'completed': summary['completed'],
+        'failed': summary['failed'] + summary['paused'],
+        'unfinished': args.downloads - summary['completed'] - summary['failed'] - summary['paused'] - summary['skipped'],
+        'downloads': args.downloads,
+        'concurrency': args.concurrency,
+        'format': f"bench-{args.format}",
+        'completion_latency_ms': latency_summary(durations),
+        'bytes': transferred,
+        'bytes_per_sec': round(transferred / wall) if wall > 0 else None,
+        'wall_seconds': round(wall, 3),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def desktop_worker(params):
+    from PyQt5.QtCore import QCoreApplication
+    from download_manager import DownloadThread
+
+    qt = QCoreApplication([])
+    pending = list(enumerate(params['urls']))
+    running = {}
+    durations = []
+    outcome = Counter()
+
+    def done(status):
+        def slot(job_id, *_):
+            _, begun = running.pop(job_id)
+            outcome[status] += 1
+            if status == 'finished':
+                durations.append(time.perf_counter() - begun)
+        return slot
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + params['timeout']
+    threads = []
+    while (pending or running) and time.monotonic() < deadline:
+        while pending and len(running) < params['concurrency']:
+            index, url = pending.pop(0)
+            thread = DownloadThread(str(index), url, params['format_id'], connections=params['connections'])
+            thread.download_finished.connect(done('finished'))
+            thread.download_error.connect(done('error'))
+            thread.download_paused.connect(done('paused'))
+            running[str(index)] = (thread, time.perf_counter())
+            threads.append(thread)
+            thread.start()
+        qt.processEvents()
+        time.sleep(0.01)
+    wall = time.perf_counter() - started
+    for thread, _ in running.values():
+        thread.pause()
+    for thread in threads:
+        thread.wait()
+
+    print(json.dumps({
+        'completed': outcome['finished'],
+        'failed': outcome['error'] + outcome['paused'],
+        'unfinished': len(pending) + len(running),
+        'durations': durations,
+        'wall_seconds': wall,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def compare(baseline, report, tolerance):
+    # Önceki sonuçla karşılaştırır; 'tolerance' oranından kötü olan ölçümleri döndürür
+    regressions = []
+    checks = (('requests_per_sec', 1), ('bytes_per_sec', 1), ('latency_ms.p99', -1), ('completion_latency_ms.p99', -1))
+    for name, result in report.items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        for key, direction in checks:
+            before, after = old, result
+            for part in key.split('.'):
+                before = (before or {}).get(part)
+                after = (after or {}).get(part)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            print(f"  {name}.{key}: {before} -> {after} ({change:+.1%})")
+            if change * direction < -tolerance:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--desktop-worker']:
+        return desktop_worker(json.loads(argv[1]))
+
+    parser = argparse.ArgumentParser(description="Çevrimdışı yük ve indirme hızı kıyaslaması")
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help=', '.join(SCENARIOS))
+    parser.add_argument('--server', choices=sorted(SERVERS), default='wsgi')
+    parser.add_argument('--fixture', default='youtube_regular', help="benchmarks/fixtures altındaki kayıt")
+    parser.add_argument('--requests', type=int, default=200, help="get-formats istek sayısı")
+    parser.add_argument('--downloads', type=int, default=8, help="indirme sayısı")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=8, help="isteklerin dağıtıldığı istemci (IP) sayısı")
+    parser.add_argument('--light-requests', type=int, default=20,
+                        help="fairness: yük altındaki ikinci istemcinin sıralı istek sayısı")
+    parser.add_argument('--cached', action='store_true', help="get-formats hep aynı URL'yi ister (önbellek yolu)")
+    parser.add_argument('--format', choices=['direct', 'dash'], default='direct',
+                        help="tek dosya (Range) ya da DASH parçaları")
+    parser.add_argument('--media-size', type=int, default=8 * 1024 * 1024, help="indirilen dosya boyutu (bayt)")
+    parser.add_argument('--fragments', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0, help="medya yanıtı gecikmesi (sn)")
+    parser.add_argument('--extract-latency', type=float, default=0.0, help="bilgi sayfası gecikmesi (sn)")
+    parser.add_argument('--bandwidth', type=int, help="bağlantı başına bayt/sn sınırı")
+    parser.add_argument('--stall-every', type=int, default=0, help="her N'inci medya yanıtı takılır")
+    parser.add_argument('--connections', type=int, default=8, help="masaüstü indirme başına bağlantı")
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    parser.add_argument('--json', help="sonuçları bu dosyaya JSON olarak yaz")
+    parser.add_argument('--baseline', help="karşılaştırılacak önceki JSON sonucu")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="gerileme sayılacak oran")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"bilinmeyen senaryo: {', '.join(sorted(unknown))}")
+
+    media = MediaServer(args.media_size, args.fragments, args.latency, args.extract_latency, args.bandwidth,
+                        stall_every=args.stall_every).start()
+    report = {}
+    try:
+        web_scenarios = [name for name in args.scenarios if name not in ('desktop', 'headless')]
+        if web_scenarios:
+            server = AppServer(args.server).start()
+            try:
+                for name in web_scenarios:
+                    fn = {'get-formats': bench_get_formats, 'fairness': bench_fairness}.get(name, bench_download)
+                    report[name] = fn(server, media, args)
+                rss = server.peak_rss()
+                for name in web_scenarios:
+                    report[name]['peak_rss_mb'] = rss
+            finally:
+                server.stop()
+        if 'desktop' in args.scenarios:
+            report['desktop'] = bench_desktop(media, args)
+        if 'headless' in args.scenarios:
+            report['headless'] = bench_headless(media, args)
+    finally:
+        media.close()
+
+    for name, result in report.items():
+        latency = result.get('latency_ms') or result.get('completion_latency_ms') or {}
+        line = f"{name:12}"
+        if 'requests_per_sec' in result:
+            line += f" {result['requests_per_sec']:8.1f} istek/sn"
+        if result.get('bytes_per_sec'):
+            line += f" {result['bytes_per_sec'] / 1024 / 1024:8.1f} MB/sn"
+        line += f"  p50 {latency.get('p50')} ms  p99 {latency.get('p99')} ms  RSS {result.get('peak_rss_mb')}"
+        print(line)
+        failed = {k: v for k, v in result.get('statuses', {}).items() if k not in ('200', '202')}
+        if failed or result.get('failed') or result.get('unfinished'):
+            print(f"  başarısız: {failed or ''} {result.get('failed', 0)} hata, {result.get('unfinished', 0)} bitmedi")
+            for status, error in result.get('errors', {}).items():
+                print(f"    {status}: {error}")
+
+    settings = {k: v for k, v in vars(args).items() if k not in ('json', 'baseline')}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        changed = sorted(k for k, v in baseline.get('settings', {}).items() if settings.get(k) != v)
+        if changed:
+            print(f"  uyarı: ayarlar önceki sonuçtan farklı ({', '.join(changed)})")
+        regressions = compare(baseline, report, args.tolerance)
+        for name in regressions:
+            print(f"  GERİLEME {name}")
+
+    if args.json:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'commit': commit or None,
+                'python': sys.version.split()[0],
+                'settings': settings,
+                'results': report,
+                'regressions': regressions,
+            }, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Her hedef ayrı ve yeni bir süreçte ölçülür; kod stdout'a {aşama: saniye} yazar
+TARGETS = {
+    'app': """
+import time
+t = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/api/downloads?limit=1')
+print(json.dumps({'import': imported - t, 'first_request': time.perf_counter() - t,
+                  'yt_dlp_loaded': 'yt_dlp' in sys.modules}))
+""",
+    'asgi': """
+import time
+t = time.perf_counter()
+import asgi
+print(json.dumps({'import': time.perf_counter() - t, 'yt_dlp_loaded': 'yt_dlp' in sys.modules}))
+""",
+    'download_manager': """
+import time
+t = time.perf_counter()
+import download_manager
+imported = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+qt = QApplication([])
+window = download_manager.DownloadManager()
+window.show()
+qt.processEvents()
+print(json.dumps({'import': imported - t, 'window': time.perf_counter() - t,
+                  'yt_dlp_loaded': 'yt_dlp' in sys.modules}))
+""",
+}
+
+# Sürümler arasında izlenen bütçe (ms); aşılırsa çıkış kodu 1
+BUDGETS_MS = {
+    'app': {'import': 900, 'first_request': 1000},
+    'asgi': {'import': 950},
+    'download_manager': {'import': 250, 'window': 500},
+}
+
+
+def run_target(name, importtime=False):
+    # -X importtime süreleri şişirir; süreler ayrı çalıştırmalarda, paket raporu ayrıca alınır
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    code = 'import json, sys\nsys.path.insert(0, %r)\n' % ROOT + TARGETS[name]
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} başlatılamadı:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, parse_importtime(proc.stderr) if importtime else {}
+
+
+def parse_importtime(stderr):
+    # -X importtime çıktısından üst düzey paket başına toplam (kendi) süre, ms
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        top = name.split('.')[0]
+        packages[top] = packages.get(top, 0) + int(self_us) / 1000
+    return packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soğuk başlangıç ölçümü ve içe aktarma raporu")
+    parser.add_argument('targets', nargs='*', default=list(TARGETS), help="ölçülecek hedefler")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="raporda gösterilecek paket sayısı")
+    parser.add_argument('--json', help="sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args(argv)
+
+    report = {}
+    over_budget = []
+    for name in args.targets:
+        runs = [run_target(name)[0] for _ in range(args.runs)]
+        _, packages = run_target(name, importtime=True)
+        phases = {}
+        for phase in runs[0]:
+            if isinstance(runs[0][phase], float):
+                phases[phase] = round(statistics.median(run[phase] for run in runs) * 1000, 1)
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report[name] = {
+            'median_ms': phases,
+            'budget_ms': BUDGETS_MS.get(name, {}),
+            'yt_dlp_loaded': runs[-1].get('yt_dlp_loaded'),
+            'top_packages_ms': {package: round(ms, 1) for package, ms in top},
+        }
+
+        print(f"{name}: " + '  '.join(f"{phase} {ms:.1f} ms" for phase, ms in phases.items())
+              + f"  (yt_dlp yüklü: {'evet' if runs[-1].get('yt_dlp_loaded') else 'hayır'})")
+        for package, ms in top:
+            print(f"    {package:28} {ms:8.1f} ms")
+        for phase, budget in BUDGETS_MS.get(name, {}).items():
+            if phases.get(phase, 0) > budget:
+                over_budget.append(f"{name}.{phase}")
+                print(f"  BÜTÇE AŞILDI {phase}: {phases[phase]:.1f} ms > {budget} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': report, 'over_budget': over_budget}, f, indent=2)
+
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
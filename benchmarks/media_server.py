@@ -0,0 +1,288 @@
+import glob
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Üretilen baytlar bu desenin tekrarıdır; her aralık isteği aynı içeriği verir
+PATTERN = bytes(range(256)) * 256
+CHUNK_SIZE = 64 * 1024
+# Dosyalar geçerli bir MP4 kutu yapısıyla başlar (ftyp, boş moov, dosyanın kalanını
+# kaplayan mdat); indirme sonrası kapsayıcı denetiminden geçer
+FTYP_BOX = struct.pack('>I4s4sI8s', 24, b'ftyp', b'isom', 0x200, b'isomiso2')
+MOOV_BOX = struct.pack('>I4s', 8, b'moov')
+
+
+def media_header(size):
+    header = FTYP_BOX + MOOV_BOX
+    return header + struct.pack('>I4sQ', 1, b'mdat', size - len(header))
+
+
+def media_bytes(size, position, length):
+    # Sanal dosyanın position'dan başlayan en fazla length baytı
+    header = media_header(size)
+    if position < len(header):
+        return header[position:position + length]
+    offset = position % len(PATTERN)
+    return PATTERN[offset:offset + min(length, len(PATTERN) - offset)]
+
+MEDIA_RE = re.compile(r'^/(?P<kind>media|mirror)/(?P<size>\d+)/(?P<name>[^/]+)$')
+FRAGMENT_RE = re.compile(r'^/fragments/(?P<size>\d+)/(?P<name>[^/]+)/(?P<index>\d+)\.m4s$')
+INFO_RE = re.compile(r'^/info/(?P<fixture>[\w-]+)/(?P<id>[\w-]+)\.json$')
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # İstemcinin kestiği (takılma sonrası ya da bölünen aralık) bağlantılar olağan
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return fixtures
+
+
+class MediaServer:
+    # Çevrimdışı kıyaslamalar için yerel sahte kaynak:
+    #   /watch/<fixture>/<id>        yt_dlp_plugins'teki BenchFixtureIE'nin URL'si
+    #   /info/<fixture>/<id>.json    kayıtlı bilgi sözlüğü; format URL'leri bu sunucuya çevrilir
+    #   /media/<boyut>/<ad>          Range destekli tek dosya
+    #   /mirror/<boyut>/<ad>         aynı dosyanın eşdeğer kopyası (takılma olmaz)
+    #   /fragments/<boyut>/<ad>/<n>.m4s  DASH tarzı parçalar
+    # Her yanıt 'latency' kadar gecikir; her bağlantı 'bandwidth' bayt/sn ile sınırlanır.
+    # stall_every verilirse /media yanıtlarının her N'incisi 256 KB'tan sonra takılır.
+    def __init__(self, media_size=8 * 1024 * 1024, fragments=16, latency=0.0, extract_latency=0.0,
+                 bandwidth=None, host='127.0.0.1', port=0, stall_every=0):
+        self.media_size = media_size
+        self.fragments = max(1, fragments)
+        self.latency = latency
+        self.extract_latency = extract_latency
+        self.bandwidth = bandwidth
+        self.stall_every = stall_every
+        self.fixtures = load_fixtures()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.media_responses = 0
+        self.stalled = 0
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self.httpd = _HTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def watch_url(self, fixture, video_id):
+        return f"{self.base_url}/watch/{fixture}/{video_id}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='bench-media', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'bytes_sent': self.bytes_sent, 'stalled': self.stalled}
+
+    def info_dict(self, fixture, video_id):
+        info = json.loads(json.dumps(self.fixtures[fixture]))
+        info['id'] = video_id
+        info['title'] = f"{fixture}-{video_id}"
+        info['webpage_url'] = self.watch_url(fixture, video_id)
+        for fmt in info.get('formats', []):
+            size = fmt.get('filesize') or fmt.get('filesize_approx') or self.media_size
+            fmt['url'] = f"{self.base_url}/media/{size}/{video_id}-{fmt['format_id']}.{fmt.get('ext', 'mp4')}"
+            if fmt.get('protocol') not in ('http', 'https'):
+                fmt['protocol'] = 'https'
+
+        # Kayıtlı formatların içeriği birleştirilemeyeceği için (ffmpeg gerçek medya ister)
+        # indirme kıyaslamaları tek dosyalık iki sentetik formatı kullanır
+        name = f"{video_id}-bench"
+        fragment_size = max(1, self.media_size // self.fragments)
+        common = {
+            'ext': 'mp4',
+            'vcodec': 'avc1.4d401e',
+            'acodec': 'mp4a.40.2',
+            'width': 640,
+            'height': 360,
+            'filesize': self.media_size,
+            'format_note': 'bench',
+        }
+        info['formats'].append(dict(
+            common,
+            format_id='bench-direct',
+            protocol='https',
+            url=f"{self.base_url}/media/{self.media_size}/{name}.mp4",
+        ))
+        # Aynı içeriğin başka bir "CDN"deki kopyası; takılan bağlantılar buna geçebilir
+        info['formats'].append(dict(
+            common,
+            format_id='bench-direct-mirror',
+            protocol='https',
+            url=f"{self.base_url}/mirror/{self.media_size}/{name}.mp4",
+        ))
+        info['formats'].append(dict(
+            common,
+            format_id='bench-dash',
+            protocol='http_dash_segments',
+            url=f"{self.base_url}/fragments/{fragment_size}/{name}/manifest.mpd",
+            fragment_base_url=f"{self.base_url}/fragments/{fragment_size}/{name}/",
+            fragments=[{'path': f"{i}.m4s", 'duration': 2.0} for i in range(self.fragments)],
+            filesize=fragment_size * self.fragments,
+        ))
+        return info
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.handle_request(send_body=False)
+
+            def do_GET(self):
+                self.handle_request(send_body=True)
+
+            def handle_request(self, send_body):
+                with server._lock:
+                    server.requests += 1
+                path = self.path.split('?', 1)[0]
+                match = INFO_RE.match(path)
+                if match:
+                    if server.extract_latency:
+                        time.sleep(server.extract_latency)
+                    if match['fixture'] not in server.fixtures:
+                        return self.send_error(404)
+                    body = json.dumps(server.info_dict(match['fixture'], match['id'])).encode('utf-8')
+                    return self.send_bytes(body, 'application/json', send_body)
+                if path.startswith('/watch/'):
+                    return self.send_bytes(b'<html><body>bench</body></html>', 'text/html', send_body)
+
+                match = MEDIA_RE.match(path) or FRAGMENT_RE.match(path)
+                if not match:
+                    return self.send_error(404)
+                if server.latency:
+                    time.sleep(server.latency)
+                if match.re is FRAGMENT_RE:
+                    # Parçalar tek bir sanal dosyanın ardışık dilimleri; birleşince geçerli MP4 olur
+                    size = int(match['size'])
+                    return self.send_media(size, send_body, base=int(match['index']) * size,
+                                           file_size=size * server.fragments)
+                stall = False
+                if match['kind'] == 'media' and send_body:
+                    with server._lock:
+                        server.media_responses += 1
+                        stall = bool(server.stall_every) and server.media_responses % server.stall_every == 0
+                self.send_media(int(match['size']), send_body, stall)
+
+            def send_bytes(self, body, content_type, send_body):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def send_media(self, size, send_body, stall=False, base=0, file_size=None):
+                start, end = 0, size - 1
+                range_header = self.headers.get('Range')
+                match = re.match(r'bytes=(\d*)-(\d*)$', range_header or '')
+                if match and (match[1] or match[2]):
+                    if match[1]:
+                        start = int(match[1])
+                        end = min(int(match[2]), size - 1) if match[2] else size - 1
+                    else:
+                        start = max(0, size - int(match[2]))
+                    if start >= size or start > end:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{size}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                if send_body:
+                    self.write_range(base + start, base + end, file_size or size, stall)
+
+            def write_range(self, start, end, file_size, stall=False):
+                position = start
+                began = time.monotonic()
+                sent = 0
+                try:
+                    while position <= end:
+                        data = media_bytes(file_size, position, min(CHUNK_SIZE, end - position + 1))
+                        self.wfile.write(data)
+                        position += len(data)
+                        sent += len(data)
+                        if stall and sent >= 256 * 1024:
+                            # Bağlantı açık kalır ama veri gelmez (istemci kesene kadar)
+                            with server._lock:
+                                server.stalled += 1
+                            server._closed.wait(120)
+                            return
+                        if server.bandwidth:
+                            # Bağlantı başına hız sınırı: gönderilen bayta yetişene kadar beklenir
+                            ahead = sent / server.bandwidth - (time.monotonic() - began)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server._lock:
+                        server.bytes_sent += sent
+
+        return Handler
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Kıyaslamalar için yerel sahte medya sunucusu")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--media-size', type=int, default=8 * 1024 * 1024)
+    parser.add_argument('--fragments', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0, help="medya yanıtı gecikmesi (sn)")
+    parser.add_argument('--extract-latency', type=float, default=0.0, help="bilgi sayfası gecikmesi (sn)")
+    parser.add_argument('--bandwidth', type=int, help="bağlantı başına bayt/sn")
+    parser.add_argument('--stall-every', type=int, default=0, help="her N'inci medya yanıtı takılır")
+    args = parser.parse_args(argv)
+
+    server = MediaServer(args.media_size, args.fragments, args.latency, args.extract_latency,
+                         args.bandwidth, port=args.port, stall_every=args.stall_every)
+    print(f"{server.base_url} (örnek: {server.watch_url('youtube_regular', 'demo')})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
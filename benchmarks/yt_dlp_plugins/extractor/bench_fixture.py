@@ -0,0 +1,15 @@
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchFixtureIE(InfoExtractor):
+    # Yalnızca kıyaslamalarda yüklenir (benchmarks/ PYTHONPATH'teyken): yerel sahte
+    # sunucudaki kayıtlı bilgi sözlüğünü döndürür, ağa çıkmaz
+    IE_NAME = 'bench:fixture'
+    _VALID_URL = r'https?://(?:127\.0\.0\.1|localhost):(?P<port>\d+)/watch/(?P<fixture>[\w-]+)/(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        port, fixture, video_id = self._match_valid_url(url).group('port', 'fixture', 'id')
+        info = self._download_json(
+            f"http://127.0.0.1:{port}/info/{fixture}/{video_id}.json", video_id)
+        info['extractor_key'] = info.get('extractor_key') or self.ie_key()
+        return info
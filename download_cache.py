@@ -0,0 +1,206 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from integrity import file_digest
+
+
+def cache_key(info, selected):
+    # Aynı video + aynı çözümlenmiş format aynı dosyayı üretir
+    extractor = info.get('extractor_key') or info.get('extractor') or ''
+    video_id = info.get('id')
+    format_id = selected.get('format_id')
+    if not video_id or not format_id:
+        return None
+    return f"{extractor}:{video_id}:{format_id}"
+
+
+class DownloadCache:
+    # Tamamlanan indirmeler içerik özetine (integrity.file_digest) göre objects/ab/<özet>
+    # altında, bütünlük denetiminin sonucuyla birlikte tutulur; extractor:id:format
+    # anahtarları özetlere bağlanır, aynı içerik bir kez saklanır. Disk kotası aşılınca en uzun süredir
+    # kullanılmayan nesneler silinir. İşe bağlanmakta olan nesneler (pin) silinmez,
+    # süren indirmeler için ayrılan yer (reserve) kota hesabına katılır.
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pins = {}
+        self._reserved = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                     'created_at REAL NOT NULL, last_access REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_blobs_last_access ON blobs (last_access)')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(blobs)')}
+        for name in ('integrity', 'integrity_note'):
+            if name not in columns:
+                conn.execute(f'ALTER TABLE blobs ADD COLUMN {name} TEXT')
+        conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, hash TEXT NOT NULL, '
+                     'filename TEXT, created_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_hash ON entries (hash)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=15)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def path_for(self, content_hash):
+        return os.path.join(self.root, 'objects', content_hash[:2], content_hash)
+
+    def lookup(self, key, pin=False):
+        # Dönüş: (özet, dosya adı, boyut, bütünlük, not) ya da None; isabet LRU zamanını günceller.
+        # pin=True ile nesne varlığı denetlenirken aynı kilit altında işe bağlanır (çağıran unpin eder)
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT e.hash, e.filename, b.size, b.integrity, b.integrity_note FROM entries e JOIN blobs b ON b.hash = e.hash WHERE e.key = ?',
+            (key,)
+        ).fetchone()
+        with self._lock:
+            found = bool(row) and os.path.exists(self.path_for(row[0]))
+            if found:
+                self.hits += 1
+                if pin:
+                    self._pins[row[0]] = self._pins.get(row[0], 0) + 1
+            else:
+                self.misses += 1
+        if found:
+            self.touch(row[0])
+            return row
+        if row:
+            # Nesne dışarıdan silinmiş; kayıt da temizlenir
+            self._forget(conn, row[0])
+        return None
+
+    def touch(self, content_hash):
+        conn = self._conn()
+        with conn:
+            conn.execute('UPDATE blobs SET last_access = ? WHERE hash = ?', (time.time(), content_hash))
+
+    def store(self, key, path, filename, content_hash=None, integrity=None, pin=False):
+        # İndirilen dosya nesne deposuna taşınır (aynı dosya sisteminde kopyasız);
+        # özet yazma sırasında hesaplanmadıysa burada dosya okunarak hesaplanır.
+        # pin=True ile nesne taşınmadan önce işe bağlanır (çağıran unpin eder)
+        content_hash = content_hash or file_digest(path)
+        if pin:
+            self.pin(content_hash)
+        try:
+            size = self._place(key, path, filename, content_hash, integrity or {})
+        except BaseException:
+            if pin:
+                self.unpin(content_hash)
+            raise
+        self.evict(keep=content_hash)
+        return content_hash, size
+
+    def _place(self, key, path, filename, content_hash, integrity):
+        target = self.path_for(content_hash)
+        size = os.path.getsize(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(path)
+        else:
+            try:
+                os.replace(path, target)
+            except OSError:
+                shutil.move(path, target)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT INTO blobs (hash, size, created_at, last_access, integrity, integrity_note) '
+                         'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(hash) DO UPDATE SET last_access = excluded.last_access, '
+                         'integrity = COALESCE(excluded.integrity, integrity), '
+                         'integrity_note = CASE WHEN excluded.integrity IS NULL THEN integrity_note ELSE excluded.integrity_note END',
+                         (content_hash, size, now, now, integrity.get('status'), integrity.get('note')))
+            if key:
+                conn.execute('INSERT OR REPLACE INTO entries (key, hash, filename, created_at) VALUES (?, ?, ?, ?)',
+                             (key, content_hash, filename, now))
+        return size
+
+    def pin(self, content_hash):
+        with self._lock:
+            self._pins[content_hash] = self._pins.get(content_hash, 0) + 1
+
+    def unpin(self, content_hash):
+        with self._lock:
+            count = self._pins.get(content_hash, 0) - 1
+            if count > 0:
+                self._pins[content_hash] = count
+            else:
+                self._pins.pop(content_hash, None)
+
+    def reserve(self, job_id, nbytes):
+        # Süren indirme için yer açılır; kota hesabına dahil edilir
+        with self._lock:
+            self._reserved[job_id] = max(int(nbytes or 0), 0)
+        self.evict()
+
+    def release(self, job_id):
+        with self._lock:
+            self._reserved.pop(job_id, None)
+
+    def used_bytes(self):
+        row = self._conn().execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        return row[0]
+
+    def evict(self, keep=None):
+        # Silme kararı ve silme kilit altında yapılır: lookup/store/pin ile aynı anda
+        # işe bağlanan bir nesne silinmez
+        conn = self._conn()
+        with self._lock:
+            reserved = sum(self._reserved.values())
+            used = self.used_bytes()
+            if used + reserved <= self.max_bytes:
+                return 0
+            evicted = 0
+            for content_hash, size in conn.execute('SELECT hash, size FROM blobs ORDER BY last_access').fetchall():
+                if used + reserved <= self.max_bytes:
+                    break
+                if content_hash == keep or content_hash in self._pins:
+                    continue
+                try:
+                    os.remove(self.path_for(content_hash))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Windows'ta açık dosya silinemez; sonraki turda tekrar denenir
+                    continue
+                self._forget(conn, content_hash)
+                used -= size
+                evicted += 1
+            self.evictions += evicted
+        return evicted
+
+    def _forget(self, conn, content_hash):
+        with conn:
+            conn.execute('DELETE FROM entries WHERE hash = ?', (content_hash,))
+            conn.execute('DELETE FROM blobs WHERE hash = ?', (content_hash,))
+
+    def stats(self):
+        conn = self._conn()
+        blobs, used = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        entries = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'objects': blobs,
+                'entries': entries,
+                'bytes': used,
+                'max_bytes': self.max_bytes,
+                'reserved': sum(self._reserved.values()),
+                'pinned': len(self._pins),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+            }
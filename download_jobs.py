@@ -0,0 +1,127 @@
+import threading
+import traceback
+from fair_queue import FairQueue, ClientQuotaExceeded
+
+# Sunucusu dolu ya da geri çekilmedeki işler varken işçiler bu aralıkla yeniden bakar (saniye)
+HOST_POLL_INTERVAL = 1.0
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DownloadJobEngine:
+    # Sınırlı sayıda işçi iş parçacığı ve sınırlı bir bekleme kuyruğu;
+    # kuyruk doluysa yeni iş kabul edilmez. Bekleyen işler istemci başına
+    # ayrı tutulur ve sırayla (ağırlıklı) verilir; client_max_jobs verilirse
+    # bir istemcinin bekleyen + çalışan işleri bununla sınırlanır. hosts
+    # (HostLimiter) verilirse sunucusu dolu ya da geri çekilmedeki iş, sırası
+    # gelse de bekler; işçi o sırada başka sunucunun işini alır.
+    def __init__(self, run_job, workers=2, max_queue=20, client_max_jobs=None, client_weights=None, hosts=None):
+        self.run_job = run_job
+        self.workers = workers
+        self.max_queue = max_queue
+        self.client_max_jobs = client_max_jobs
+        self.hosts = hosts
+        self._queue = FairQueue(client_weights)
+        self._threads = []
+        self._active = set()
+        self._pending = set()
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._started = False
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.client_rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"download-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job_id, client=None, host=None):
+        self.start()
+        with self._lock:
+            if job_id in self._pending or job_id in self._active:
+                return False
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull("İndirme kuyruğu dolu, lütfen daha sonra tekrar deneyin")
+            if not self._client_has_capacity(client):
+                self.client_rejected += 1
+                raise ClientQuotaExceeded("Aynı anda çok fazla indirme isteği, lütfen biraz sonra tekrar deneyin")
+            self._queue.push(client, (job_id, client, host))
+            self._pending.add(job_id)
+            self._clients[client] = self._clients.get(client, 0) + 1
+            self._cond.notify()
+        return True
+
+    def has_capacity(self):
+        with self._lock:
+            return len(self._queue) < self.max_queue
+
+    def client_has_capacity(self, client):
+        with self._lock:
+            return self._client_has_capacity(client)
+
+    def _client_has_capacity(self, client):
+        return not self.client_max_jobs or self._clients.get(client, 0) < self.client_max_jobs
+
+    def is_tracked(self, job_id):
+        with self._lock:
+            return job_id in self._pending or job_id in self._active
+
+    def _host_ready(self, entry):
+        host = entry[2]
+        return self.hosts is None or not host or self.hosts.try_acquire(host)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                entry = self._queue.pop(self._host_ready)
+                while entry is None:
+                    # Bekleyen iş varsa sunucu sınırı/geri çekilme bitişi için ara ara bakılır
+                    self._cond.wait(HOST_POLL_INTERVAL if len(self._queue) else None)
+                    entry = self._queue.pop(self._host_ready)
+                job_id, client, host = entry
+                self._pending.discard(job_id)
+                self._active.add(job_id)
+            try:
+                self.run_job(job_id)
+                with self._lock:
+                    self.completed += 1
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                traceback.print_exc()
+            finally:
+                if self.hosts is not None and host:
+                    self.hosts.release(host)
+                with self._cond:
+                    self._active.discard(job_id)
+                    self._clients[client] -= 1
+                    if not self._clients[client]:
+                        del self._clients[client]
+                    # Boşalan sunucu hakkını bekleyen başka işçi olabilir
+                    self._cond.notify()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': len(self._pending),
+                'active': len(self._active),
+                'clients': len(self._clients),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'client_rejected': self.client_rejected,
+            }
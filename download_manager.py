@@ -1,26 +1,109 @@
 import os
 import sys
-import json
 import time
-import requests
-from datetime import datetime
-from tqdm import tqdm
-import yt_dlp
+import re
+import copy
+import importlib
+import uuid
+import threading
+from format_selector import select_qualities
+from extract_cache import ExtractCache
+from bandwidth import BandwidthScheduler, DeferredStartQueue, DEFAULT_CATEGORY
+from history_store import HistoryStore, DEFAULT_DB_PATH
+from download_task import (DownloadTask, ydl_profiles, segment_session, load_bandwidth_settings, format_size,
+                           CATEGORY_WEIGHTS, STATUS_DOWNLOADING, STATUS_PAUSED, STATUS_COMPLETED,
+                           STATUS_ERROR, STATUS_SCHEDULED)
+
+if __name__ == '__main__' and sys.argv[1:2] in (['batch'], ['daemon']):
+    # Başsız kip: pencere açılmaz, PyQt hiç yüklenmez (bkz. headless.py)
+    from headless import main
+    sys.exit(main(sys.argv[1:]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QPushButton, QLineEdit, QLabel, 
-                           QProgressBar, QFileDialog, QTableWidget, 
-                           QTableWidgetItem, QComboBox, QTabWidget,
+                           QProgressBar, QComboBox,
                            QDateTimeEdit, QMessageBox, QDialog, QDialogButtonBox,
-                           QStatusBar, QHeaderView)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDateTime, QTimer
-from PyQt5.QtGui import QIcon
+                           QStatusBar, QHeaderView, QTableView, QAbstractItemView,
+                           QCheckBox)
+from PyQt5.QtCore import (Qt, QThread, QObject, pyqtSignal, QDateTime, QTimer,
+                          QAbstractTableModel, QModelIndex)
+
+URL_RE = re.compile(r'^https?://\S+$')
+
+class FormatProbeThread(QThread):
+    probe_finished = pyqtSignal(str, object)  # önbellek anahtarı, bilgi sözlüğü
+    probe_failed = pyqtSignal(str, str)
+    
+    def __init__(self, key, url, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.url = url
+        
+    def run(self):
+        # Sinyaller YoutubeDL kapatıldıktan sonra gönderilir
+        try:
+            with ydl_profiles.create('probe') as ydl:
+                info = ydl.extract_info(self.url, download=False)
+                if not info:
+                    raise Exception("Video bilgileri alınamadı")
+                info = ydl.sanitize_info(info, remove_private_keys=True)
+        except Exception as e:
+            self.probe_failed.emit(self.key, str(e))
+            return
+        self.probe_finished.emit(self.key, info)
+
+class FormatProber(QObject):
+    # extract_info arka planda çalışır; sonuçlar önbelleğe alınır ve aynı URL için
+    # ikinci bir çıkarım başlatılmaz (pano/yapıştırma ön getirmesi de buradan geçer)
+    probe_finished = pyqtSignal(str, object)
+    probe_failed = pyqtSignal(str, str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = ExtractCache(max_bytes=32 * 1024 * 1024)
+        self._threads = {}
+        
+    def key_for(self, url):
+        return self.cache.key_for(url)
+        
+    def cached(self, url):
+        return self.cache.get(self.key_for(url))
+        
+    def probe(self, url):
+        key = self.key_for(url)
+        if key in self._threads or self.cache.get(key) is not None:
+            return key
+        # İş parçacığının sahibi prober'dır; sonuç gelince _threads'ten çıksa da
+        # run() bitene kadar yaşar ve kendi finished sinyaliyle silinir
+        thread = FormatProbeThread(key, url, self)
+        thread.probe_finished.connect(self._on_finished)
+        thread.probe_failed.connect(self._on_failed)
+        thread.finished.connect(thread.deleteLater)
+        self._threads[key] = thread
+        thread.start()
+        return key
+        
+    def _on_finished(self, key, info):
+        self._threads.pop(key, None)
+        self.cache.put(key, info)
+        self.probe_finished.emit(key, info)
+        
+    def _on_failed(self, key, error):
+        self._threads.pop(key, None)
+        self.probe_failed.emit(key, error)
+        
+    def wait_all(self, msecs):
+        for thread in self.findChildren(FormatProbeThread):
+            thread.wait(msecs)
 
 class VideoQualityDialog(QDialog):
-    def __init__(self, url, parent=None):
+    def __init__(self, url, parent=None, prober=None):
         super().__init__(parent)
         self.url = url
         self.selected_format = None
         self.formats = []
+        self.info = None
+        self.prober = prober or FormatProber(self)
         self.initUI()
         self.load_formats()
         
@@ -35,6 +118,12 @@ class VideoQualityDialog(QDialog):
         layout.addWidget(QLabel("Kalite Seçin:"))
         layout.addWidget(self.quality_combo)
         
+        # Formatlar arka planda yüklenirken gösterilen belirsiz ilerleme çubuğu
+        self.spinner = QProgressBar()
+        self.spinner.setRange(0, 0)
+        self.spinner.setTextVisible(False)
+        layout.addWidget(self.spinner)
+        
         # Bilgi etiketi
         self.info_label = QLabel()
         self.info_label.setWordWrap(True)
@@ -47,158 +136,81 @@ class VideoQualityDialog(QDialog):
         buttons.accepted.connect(self.accept)
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
+        self.ok_button = buttons.button(QDialogButtonBox.Ok)
         
     def load_formats(self):
-        try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True
-            }
+        self.key = self.prober.key_for(self.url)
+        info = self.prober.cached(self.url)
+        if info is not None:
+            self.show_formats(info)
+            return
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                if not info:
-                    raise Exception("Video bilgileri alınamadı")
-                    
-                formats = info.get('formats', [])
-                if not formats:
-                    raise Exception("Video formatları bulunamadı")
-                    
-                print("\nTüm formatlar:")
-                available_qualities = {}
-                
-                # Önce video formatlarını kontrol et
-                video_formats = [f for f in formats if f.get('vcodec', 'none') != 'none' and 'height' in f]
-                audio_formats = [f for f in formats if f.get('acodec', 'none') != 'none' and f.get('vcodec', 'none') == 'none']
-                
-                if audio_formats:  # En iyi ses formatını seç
-                    best_audio = max(audio_formats, key=lambda x: x.get('tbr', 0))
-                    
-                    for vf in video_formats:
-                        try:
-                            height = vf.get('height', 0)
-                            if height > 0:
-                                format_id = f"{vf['format_id']}+{best_audio['format_id']}"
-                                filesize = vf.get('filesize', 0) or vf.get('approximate_filesize', 0)
-                                
-                                # Kalite anahtarını belirle
-                                quality_key = f"{height}p"
-                                if height == 1440:
-                                    quality_key = "2K"
-                                elif height == 2160:
-                                    quality_key = "4K"
-                                
-                                # Format bilgilerini yazdır
-                                print(f"Format ID: {format_id}, Çözünürlük: {height}p, "
-                                      f"Video Codec: {vf.get('vcodec', 'N/A')}, "
-                                      f"Ses Codec: {best_audio.get('acodec', 'N/A')}, "
-                                      f"Boyut: {filesize/1024/1024:.1f}MB")
-                                
-                                if quality_key not in available_qualities or filesize > available_qualities[quality_key]['filesize']:
-                                    available_qualities[quality_key] = {
-                                        'format_id': format_id,
-                                        'filesize': filesize,
-                                        'height': height,
-                                        'vcodec': vf.get('vcodec', ''),
-                                        'acodec': best_audio.get('acodec', ''),
-                                        'ext': vf.get('ext', 'mp4'),
-                                        'fps': vf.get('fps', 0),
-                                        'tbr': vf.get('tbr', 0)
-                                    }
-                        except Exception as format_error:
-                            print(f"Format işleme hatası: {format_error}")
-                            continue
-                
-                if not available_qualities:
-                    # Birleşik formatları kontrol et
-                    for f in formats:
-                        try:
-                            if (f.get('acodec', 'none') != 'none' and 
-                                f.get('vcodec', 'none') != 'none' and 
-                                'height' in f):
-                                
-                                height = f.get('height', 0)
-                                if height > 0:
-                                    format_id = f.get('format_id')
-                                    filesize = f.get('filesize', 0) or f.get('approximate_filesize', 0)
-                                    
-                                    quality_key = f"{height}p"
-                                    if height == 1440:
-                                        quality_key = "2K"
-                                    elif height == 2160:
-                                        quality_key = "4K"
-                                    
-                                    if quality_key not in available_qualities or filesize > available_qualities[quality_key]['filesize']:
-                                        available_qualities[quality_key] = {
-                                            'format_id': format_id,
-                                            'filesize': filesize,
-                                            'height': height,
-                                            'vcodec': f.get('vcodec', ''),
-                                            'acodec': f.get('acodec', ''),
-                                            'ext': f.get('ext', 'mp4'),
-                                            'fps': f.get('fps', 0),
-                                            'tbr': f.get('tbr', 0)
-                                        }
-                        except Exception as format_error:
-                            print(f"Format işleme hatası: {format_error}")
-                            continue
-                
-                if not available_qualities:
-                    raise Exception("Uygun video formatı bulunamadı")
-                
-                print("\nSeçilen formatlar:")
-                # Kaliteleri yüksekten düşüğe sırala
-                quality_order = {
-                    "4K": 2160,
-                    "2K": 1440,
-                    "1080p": 1080,
-                    "720p": 720,
-                    "480p": 480,
-                    "360p": 360,
-                    "240p": 240,
-                    "144p": 144
-                }
-                
-                sorted_qualities = sorted(
-                    available_qualities.items(),
-                    key=lambda x: quality_order.get(x[0], x[1]['height']),
-                    reverse=True
-                )
+        # İptal edilirse çıkarım arka planda biter ve sonucu önbellekte kalır
+        self.ok_button.setEnabled(False)
+        self.quality_combo.setEnabled(False)
+        self.info_label.setText("Formatlar yükleniyor...")
+        self.prober.probe_finished.connect(self.on_probe_finished)
+        self.prober.probe_failed.connect(self.on_probe_failed)
+        self.prober.probe(self.url)
+        
+    def on_probe_finished(self, key, info):
+        if key == self.key:
+            self.show_formats(copy.deepcopy(info))
+            
+    def on_probe_failed(self, key, error):
+        if key == self.key:
+            self.show_error(error)
+            
+    def done(self, result):
+        try:
+            self.prober.probe_finished.disconnect(self.on_probe_finished)
+            self.prober.probe_failed.disconnect(self.on_probe_failed)
+        except TypeError:
+            pass
+        super().done(result)
+        
+    def show_formats(self, info):
+        try:
+            formats = info.get('formats', [])
+            if not formats:
+                raise Exception("Video formatları bulunamadı")
                 
-                # Combo box'ı temizle
-                self.quality_combo.clear()
+            # Kaliteler yüksekten düşüğe sıralı gelir; ayrı ses yoksa birleşik formatlar kullanılır
+            qualities = select_qualities(formats, avoid_reencode=True)
+            if not qualities:
+                raise Exception("Uygun video formatı bulunamadı")
                 
-                # Format listesini güncelle
-                self.formats = []
+            self.info = info
+            self.spinner.hide()
+            self.ok_button.setEnabled(True)
+            self.quality_combo.setEnabled(True)
+            
+            # Combo box'ı temizle
+            self.quality_combo.clear()
+            
+            # Format listesini güncelle
+            self.formats = qualities
+            for data in qualities:
+                filesize_mb = data['filesize'] / 1024 / 1024
+                format_text = f"{data['quality']} ({data['ext']}) - {filesize_mb:.1f} MB"
+                self.quality_combo.addItem(format_text, data['format_id'])
                 
-                for quality, data in sorted_qualities:
-                    try:
-                        filesize_mb = data['filesize'] / 1024 / 1024
-                        format_text = f"{quality} ({data['ext']}) - {filesize_mb:.1f} MB"
-                        
-                        # Format bilgilerini listeye ekle
-                        self.formats.append(data)
-                        self.quality_combo.addItem(format_text, data['format_id'])
-                        
-                        print(f"Eklenen format: {format_text} - Format ID: {data['format_id']} - "
-                              f"Video: {data['vcodec']}, Ses: {data['acodec']}")
-                              
-                    except Exception as add_error:
-                        print(f"Format ekleme hatası: {add_error}")
-                        continue
+            # İlk kaliteyi seç ve bilgileri güncelle
+            if self.quality_combo.count() > 0:
+                self.quality_combo.setCurrentIndex(0)
+                self.update_info(0)
                 
-                # İlk kaliteyi seç ve bilgileri güncelle
-                if self.quality_combo.count() > 0:
-                    self.quality_combo.setCurrentIndex(0)
-                    self.update_info(0)
-                    
-                self.quality_combo.currentIndexChanged.connect(self.update_info)
+            self.quality_combo.currentIndexChanged.connect(self.update_info)
                 
         except Exception as e:
-            error_msg = str(e)
-            print(f"Format yükleme hatası: {error_msg}")
-            self.info_label.setText(f"Hata: {error_msg}")
-            self.quality_combo.setEnabled(False)
+            self.show_error(str(e))
+            
+    def show_error(self, error_msg):
+        print(f"Format yükleme hatası: {error_msg}")
+        self.spinner.hide()
+        self.info_label.setText(f"Hata: {error_msg}")
+        self.quality_combo.setEnabled(False)
+        self.ok_button.setEnabled(False)
             
     def update_info(self, index):
         try:
@@ -213,6 +225,8 @@ class VideoQualityDialog(QDialog):
                     info.append(f"FPS: {data['fps']}")
                 if data['tbr']:
                     info.append(f"Bit Hızı: {data['tbr']:.1f}kbps")
+                if data.get('alternates'):
+                    info.append(f"Yedek kaynak: {len(data['alternates'])}")
                     
                 self.info_label.setText("\n".join(info))
                 
@@ -236,79 +250,175 @@ class VideoQualityDialog(QDialog):
             print(f"Format seçim hatası: {str(e)}")
             return None
 
+# Geçmiş web uygulamasıyla ortak SQLite deposunda tutulur; eski JSON geçmişi
+# ilk açılışta bir kez aktarılır
+HISTORY_DB = DEFAULT_DB_PATH
+HISTORY_FILE = 'downloads.json'
+HISTORY_LIMIT = 1000
+
+class ProgressAggregator(QObject):
+    # İndirme iş parçacıkları her parçada sinyal yaymak yerine son değeri buraya
+    # bırakır; GUI iş parçacığı zamanlayıcı ile tek bir toplu sinyal alır
+    progress_batch = pyqtSignal(dict)  # iş id -> (ilerleme, hız)
+    
+    def __init__(self, interval_ms=100, parent=None):
+        super().__init__(parent)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(interval_ms)
+        
+    def report(self, job_id, progress, speed):
+        with self._lock:
+            self._pending[job_id] = (progress, speed)
+            
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+        self.progress_batch.emit(batch)
+
+class DownloadTableModel(QAbstractTableModel):
+    COLUMNS = ["Dosya Adı", "Boyut", "İlerleme", "Hız", "Durum"]
+    COL_PROGRESS = 2
+    COL_SPEED = 3
+    COL_STATUS = 4
+    
+    def __init__(self, entries, parent=None):
+        super().__init__(parent)
+        self.entries = entries
+        self._rows = {entry['id']: row for row, entry in enumerate(entries)}
+        self._dirty = set()  # depoya henüz yazılmamış satırların iş id'leri
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        column = index.column()
+        if role == Qt.ToolTipRole and column == self.COL_STATUS:
+            # Bütünlük denetiminin ayrıntısı ve dosya özeti
+            lines = [entry.get('integrity_note'), entry.get('checksum') and f"Özet: {entry['checksum']}"]
+            return "\n".join(line for line in lines if line) or None
+        if role != Qt.DisplayRole:
+            return None
+        if column == 0:
+            return entry.get('file_name') or "Hazırlanıyor..."
+        if column == 1:
+            return entry.get('file_size') or "-"
+        if column == self.COL_PROGRESS:
+            return f"%{entry.get('progress') or 0:.1f}"
+        if column == self.COL_SPEED:
+            return entry.get('speed') or "-"
+        if entry.get('status') == STATUS_COMPLETED and entry.get('integrity'):
+            return f"{STATUS_COMPLETED} ({entry['integrity']})"
+        return entry.get('status', '')
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+        
+    def add_entry(self, entry):
+        row = len(self.entries)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.append(entry)
+        self._rows[entry['id']] = row
+        self._dirty.add(entry['id'])
+        self.endInsertRows()
+        
+    def entry(self, job_id):
+        row = self._rows.get(job_id)
+        return None if row is None else self.entries[row]
+        
+    def job_id_at(self, row):
+        if 0 <= row < len(self.entries):
+            return self.entries[row]['id']
+        return None
+        
+    def update_entry(self, job_id, **fields):
+        row = self._rows.get(job_id)
+        if row is None:
+            return
+        self.entries[row].update(fields)
+        self._dirty.add(job_id)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+        
+    def apply_progress(self, batch):
+        # Değişen satırlar tek bir dataChanged aralığı ile bildirilir
+        rows = []
+        for job_id, (progress, speed) in batch.items():
+            row = self._rows.get(job_id)
+            if row is None:
+                continue
+            entry = self.entries[row]
+            entry['progress'] = progress
+            entry['speed'] = f"{format_size(speed)}/s" if speed else "-"
+            self._dirty.add(job_id)
+            rows.append(row)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), self.COL_PROGRESS),
+                                  self.index(max(rows), self.COL_SPEED))
+                                  
+    def mark_dirty(self, job_id):
+        self._dirty.add(job_id)
+        
+    def take_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        return [self.entries[self._rows[job_id]] for job_id in dirty if job_id in self._rows]
+
 class DownloadThread(QThread):
-    progress_updated = pyqtSignal(float)
-    download_finished = pyqtSignal()
-    download_error = pyqtSignal(str)
-    info_updated = pyqtSignal(str, str)  # dosya adı, boyut
+    download_finished = pyqtSignal(str)
+    download_paused = pyqtSignal(str)
+    download_error = pyqtSignal(str, str)
+    info_updated = pyqtSignal(str, str, str)  # iş id, dosya adı, boyut
     
-    def __init__(self, url, format_id=None):
+    def __init__(self, job_id, url, format_id=None, connections=8, progress_sink=None, info=None,
+                 scheduler=None, category=None):
         super().__init__()
-        self.url = url
-        self.format_id = format_id
-        self._is_running = True
+        self.job_id = job_id
+        # İndirmenin kendisi Qt'den bağımsızdır (başsız kip de aynı işi kullanır)
+        self.task = DownloadTask(job_id, url, format_id, connections=connections,
+                                 progress_sink=progress_sink, info=info, scheduler=scheduler,
+                                 category=category, info_sink=self.info_updated.emit)
+        
+    @property
+    def save_path(self):
+        return self.task.save_path
+        
+    @property
+    def integrity(self):
+        return self.task.integrity
         
     def run(self):
         try:
-            ydl_opts = {
-                'format': self.format_id if self.format_id else 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'progress_hooks': [self._progress_hook],
-                'quiet': True,
-                'no_warnings': True,
-                'outtmpl': '%(title)s.%(ext)s'  # Dosya adı şablonu
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Önce video bilgilerini al
-                info = ydl.extract_info(self.url, download=False)
-                if info:
-                    # Dosya adını ve boyutunu hazırla
-                    filename = f"{info.get('title', 'video')}.{info.get('ext', 'mp4')}"
-                    filesize = info.get('filesize', 0) or info.get('filesize_approx', 0)
-                    if filesize:
-                        size_str = self.format_size(filesize)
-                    else:
-                        size_str = "Bilinmiyor"
-                        
-                    # Bilgileri gönder
-                    self.info_updated.emit(filename, size_str)
-                    
-                    # İndirmeyi başlat
-                    ydl.download([self.url])
-                    
-                if self._is_running:
-                    self.download_finished.emit()
-                    
+            finished = self.task.run()
         except Exception as e:
-            if self._is_running:
-                self.download_error.emit(str(e))
-                
-    def _progress_hook(self, d):
-        if not self._is_running:
-            raise Exception("İndirme iptal edildi")
-            
-        if d['status'] == 'downloading':
-            try:
-                total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                downloaded = d.get('downloaded_bytes', 0)
-                
-                if total > 0:
-                    progress = (downloaded / total) * 100
-                    self.progress_updated.emit(progress)
-                    
-            except Exception as e:
-                print(f"İlerleme hesaplama hatası: {str(e)}")
-                
-    def format_size(self, size):
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
+            if self.task.running:
+                self.download_error.emit(self.job_id, str(e))
+            else:
+                self.download_paused.emit(self.job_id)
+            return
+        if finished:
+            self.download_finished.emit(self.job_id)
+        else:
+            self.download_paused.emit(self.job_id)
                 
-    def terminate(self):
-        self._is_running = False
-        super().terminate()
+    def pause(self):
+        # İş parçacığı öldürülmez; indirici bir sonraki parçada durup günlüğü yazar
+        self.task.running = False
+
+    def resume(self):
+        if not self.isRunning():
+            self.task.running = True
+            self.start()
 
 class DownloadManager(QMainWindow):
     def __init__(self):
@@ -328,16 +438,69 @@ class DownloadManager(QMainWindow):
             self.url_input.setPlaceholderText("Video URL'sini yapıştırın")
             self.url_layout.addWidget(self.url_input)
             
+            # Yapıştırılan ya da panoya kopyalanan bağlantının formatları arka planda önceden alınır
+            self.prober = FormatProber(self)
+            self.prefetch_timer = QTimer(self)
+            self.prefetch_timer.setSingleShot(True)
+            self.prefetch_timer.timeout.connect(lambda: self.prefetch(self.url_input.text()))
+            self.url_input.textChanged.connect(lambda: self.prefetch_timer.start(500))
+            
+            self.clipboard_prefetch = QCheckBox("Panodan ön yükle")
+            self.clipboard_prefetch.setChecked(True)
+            QApplication.clipboard().dataChanged.connect(self.clipboard_changed)
+            self.url_layout.addWidget(self.clipboard_prefetch)
+            
             self.download_button = QPushButton("İndir")
             self.download_button.clicked.connect(self.start_download)
             self.url_layout.addWidget(self.download_button)
             
+            self.pause_button = QPushButton("Duraklat")
+            self.pause_button.clicked.connect(self.pause_selected)
+            self.url_layout.addWidget(self.pause_button)
+            
+            self.resume_button = QPushButton("Devam Et")
+            self.resume_button.clicked.connect(self.resume_selected)
+            self.url_layout.addWidget(self.resume_button)
+            
             self.layout.addLayout(self.url_layout)
             
-            # İndirme listesi
-            self.download_list = QTableWidget()
-            self.download_list.setColumnCount(4)
-            self.download_list.setHorizontalHeaderLabels(["Dosya Adı", "Boyut", "İlerleme", "Durum"])
+            # Kategori ve zamanlanmış başlangıç
+            self.schedule_layout = QHBoxLayout()
+            self.schedule_layout.addWidget(QLabel("Kategori:"))
+            self.category_combo = QComboBox()
+            self.category_combo.addItems(list(CATEGORY_WEIGHTS))
+            self.category_combo.setCurrentText(DEFAULT_CATEGORY)
+            self.schedule_layout.addWidget(self.category_combo)
+            
+            self.schedule_layout.addWidget(QLabel("Başlangıç:"))
+            self.start_time_edit = QDateTimeEdit(QDateTime.currentDateTime().addSecs(3600))
+            self.start_time_edit.setDisplayFormat("dd.MM.yyyy HH:mm")
+            self.start_time_edit.setCalendarPopup(True)
+            self.schedule_layout.addWidget(self.start_time_edit)
+            
+            self.schedule_button = QPushButton("Zamanla")
+            self.schedule_button.clicked.connect(self.schedule_download)
+            self.schedule_layout.addWidget(self.schedule_button)
+            self.schedule_layout.addStretch()
+            self.layout.addLayout(self.schedule_layout)
+            
+            # Ortak hız bütçesi; zamanlanmış işler için yalnızca en yakını bekleyen tek zamanlayıcı
+            self.bandwidth = BandwidthScheduler(**load_bandwidth_settings())
+            self.deferred = DeferredStartQueue()
+            self.schedule_timer = QTimer(self)
+            self.schedule_timer.setSingleShot(True)
+            self.schedule_timer.timeout.connect(self.start_due_downloads)
+            
+            # İndirme listesi; satırlar geçmiş kayıtlarıdır ve iş id'si ile bulunur
+            self.downloads = {}  # iş id -> DownloadThread
+            self.history = self.load_history()
+            self.model = DownloadTableModel(self.history, self)
+            
+            self.download_list = QTableView()
+            self.download_list.setModel(self.model)
+            self.download_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+            self.download_list.setSelectionMode(QAbstractItemView.SingleSelection)
+            self.download_list.verticalHeader().setDefaultSectionSize(24)
             self.download_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
             self.layout.addWidget(self.download_list)
             
@@ -345,7 +508,12 @@ class DownloadManager(QMainWindow):
             self.status_bar = QStatusBar()
             self.setStatusBar(self.status_bar)
             
-            self.downloads = []
+            # İlerleme saniyede en fazla 10 kez, tüm indirmeler için tek seferde işlenir
+            self.progress_aggregator = ProgressAggregator(100, self)
+            self.progress_aggregator.progress_batch.connect(self.model.apply_progress)
+            
+            self.restore_unfinished()
+            
             self.timer = QTimer()
             self.timer.timeout.connect(self.update_progress)
             self.timer.start(1000)
@@ -353,33 +521,102 @@ class DownloadManager(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Hata", f"Program başlatılırken hata oluştu: {str(e)}")
             
-    def start_download(self):
+    def load_history(self):
+        self.store = HistoryStore(HISTORY_DB)
+        if os.path.exists(HISTORY_FILE):
+            try:
+                count = self.store.import_json(HISTORY_FILE)
+                os.replace(HISTORY_FILE, HISTORY_FILE + '.imported')
+                print(f"{count} geçmiş kaydı veritabanına aktarıldı")
+            except Exception as e:
+                print(f"Geçmiş aktarılırken hata: {str(e)}")
+        try:
+            # Tablo yalnızca son kayıtları gösterir; yarım kalanlar her zaman yüklenir
+            return self.store.load_entries(
+                limit=HISTORY_LIMIT,
+                keep_statuses=(STATUS_DOWNLOADING, STATUS_PAUSED, STATUS_SCHEDULED)
+            )
+        except Exception as e:
+            print(f"Geçmiş yüklenirken hata: {str(e)}")
+            return []
+            
+    def save_history(self):
+        # Yalnızca son kayıttan beri değişen satırlar tek işlemde yazılır
+        try:
+            self.store.save_entries(self.model.take_dirty())
+        except Exception as e:
+            print(f"Geçmiş kaydedilirken hata: {str(e)}")
+            
+    def prefetch(self, text):
+        url = text.strip()
+        if URL_RE.match(url):
+            self.prober.probe(url)
+            
+    def clipboard_changed(self):
+        if not self.clipboard_prefetch.isChecked():
+            return
+        url = QApplication.clipboard().text().strip()
+        if URL_RE.match(url):
+            self.prober.probe(url)
+            if not self.url_input.text().strip():
+                self.url_input.setText(url)
+            
+    def restore_unfinished(self):
+        # Kapanışta ya da çökmede yarım kalan indirmeler duraklatılmış olarak listelenir
+        for entry in self.history:
+            if entry.get('status') in (STATUS_DOWNLOADING, STATUS_PAUSED) and entry.get('url'):
+                entry['status'] = STATUS_PAUSED
+                entry['speed'] = '-'
+                self.model.mark_dirty(entry['id'])
+                self.create_thread(entry)
+            elif entry.get('status') == STATUS_SCHEDULED and entry.get('url'):
+                # Zamanı kapalıyken geçmiş olanlar hemen başlar
+                self.create_thread(entry)
+                self.deferred.schedule(entry['id'], entry.get('start_at') or 0)
+        self.save_history()
+        self.arm_schedule_timer()
+            
+    def schedule_download(self):
+        start_at = self.start_time_edit.dateTime().toSecsSinceEpoch()
+        if start_at <= time.time():
+            QMessageBox.warning(self, "Uyarı", "Başlangıç zamanı gelecekte olmalı")
+            return
+        self.start_download(start_at)
+            
+    def start_download(self, start_at=None):
         try:
             url = self.url_input.text().strip()
             if not url:
                 QMessageBox.warning(self, "Uyarı", "Lütfen bir URL girin")
                 return
                 
-            dialog = VideoQualityDialog(url, self)
+            dialog = VideoQualityDialog(url, self, self.prober)
             if dialog.exec_() == QDialog.Accepted:
                 selected_format = dialog.get_selected_format()
                 if selected_format:
-                    row = self.download_list.rowCount()
-                    self.download_list.insertRow(row)
-                    
-                    # Başlangıç durumunu ayarla
-                    self.download_list.setItem(row, 0, QTableWidgetItem("Hazırlanıyor..."))
-                    self.download_list.setItem(row, 1, QTableWidgetItem("-"))
-                    self.download_list.setItem(row, 2, QTableWidgetItem("0%"))
-                    self.download_list.setItem(row, 3, QTableWidgetItem("Başlatılıyor"))
-                    
-                    thread = DownloadThread(url, selected_format)
-                    thread.progress_updated.connect(lambda p, r=row: self.update_download_progress(r, p))
-                    thread.download_finished.connect(lambda r=row: self.download_finished(r))
-                    thread.download_error.connect(lambda e, r=row: self.download_error(r, e))
-                    thread.info_updated.connect(lambda name, size, r=row: self.update_download_info(r, name, size))
-                    
-                    self.downloads.append(thread)
+                    entry = {
+                        'id': uuid.uuid4().hex,
+                        'file_name': "Hazırlanıyor...",
+                        'url': url,
+                        'format_id': selected_format,
+                        'save_path': None,
+                        'progress': 0,
+                        'status': "Başlatılıyor",
+                        'category': self.category_combo.currentText() or DEFAULT_CATEGORY,
+                        'speed': "-"
+                    }
+                    self.model.add_entry(entry)
+                    thread = self.create_thread(entry, dialog.info)
+                    if start_at:
+                        entry['status'] = STATUS_SCHEDULED
+                        entry['start_at'] = start_at
+                        self.save_history()
+                        self.deferred.schedule(entry['id'], start_at)
+                        self.arm_schedule_timer()
+                        self.status_bar.showMessage(f"İndirme zamanlandı: {url}")
+                        return
+                    entry['status'] = STATUS_DOWNLOADING
+                    self.save_history()
                     thread.start()
                     
                     self.status_bar.showMessage(f"İndirme başlatıldı: {url}")
@@ -389,58 +626,122 @@ class DownloadManager(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Hata", f"İndirme başlatılırken hata oluştu: {str(e)}")
             
-    def update_download_info(self, row, filename, filesize):
+    def create_thread(self, entry, info=None):
+        thread = DownloadThread(entry['id'], entry['url'], entry.get('format_id'),
+                                progress_sink=self.progress_aggregator.report, info=info,
+                                scheduler=self.bandwidth,
+                                category=entry.get('category', DEFAULT_CATEGORY))
+        thread.download_finished.connect(self.download_finished)
+        thread.download_paused.connect(self.download_paused)
+        thread.download_error.connect(self.download_error)
+        thread.info_updated.connect(self.update_download_info)
+        self.downloads[entry['id']] = thread
+        return thread
+        
+    def arm_schedule_timer(self):
+        delay = self.deferred.next_delay()
+        if delay is None:
+            self.schedule_timer.stop()
+            return
+        # Uyku/saat değişikliğine karşı en fazla bir saat sonra yeniden bakılır
+        self.schedule_timer.start(int(min(delay, 3600) * 1000))
+        
+    def start_due_downloads(self):
+        for job_id in self.deferred.pop_due():
+            thread = self.downloads.get(job_id)
+            entry = self.model.entry(job_id)
+            if not thread or not entry or entry.get('status') != STATUS_SCHEDULED:
+                continue
+            self.model.update_entry(job_id, status=STATUS_DOWNLOADING)
+            thread.resume()
+        self.save_history()
+        self.arm_schedule_timer()
+        
+    def selected_job_id(self):
+        indexes = self.download_list.selectionModel().selectedRows()
+        if not indexes:
+            return None
+        return self.model.job_id_at(indexes[0].row())
+            
+    def pause_selected(self):
+        job_id = self.selected_job_id()
+        thread = self.downloads.get(job_id)
+        if self.deferred.cancel(job_id):
+            # Henüz başlamamış zamanlanmış iş duraklatılmış olarak bekler
+            self.model.update_entry(job_id, status=STATUS_PAUSED)
+            self.save_history()
+            self.arm_schedule_timer()
+            return
+        if thread and thread.isRunning():
+            thread.pause()
+            self.model.update_entry(thread.job_id, status="Duraklatılıyor...")
+            
+    def resume_selected(self):
+        job_id = self.selected_job_id()
+        thread = self.downloads.get(job_id)
+        if thread and not thread.isRunning():
+            if self.model.entry(job_id).get('status') == STATUS_COMPLETED:
+                return
+            # Zamanlanmış iş beklemeden başlatılır
+            if self.deferred.cancel(job_id):
+                self.arm_schedule_timer()
+            self.model.update_entry(job_id, status=STATUS_DOWNLOADING)
+            self.save_history()
+            thread.resume()
+            
+    def download_paused(self, job_id):
         try:
-            if 0 <= row < self.download_list.rowCount():
-                self.download_list.setItem(row, 0, QTableWidgetItem(filename))
-                self.download_list.setItem(row, 1, QTableWidgetItem(filesize))
-                
+            thread = self.downloads.get(job_id)
+            entry = self.model.entry(job_id)
+            save_path = thread.save_path if thread and thread.save_path else entry.get('save_path')
+            self.model.update_entry(job_id, status=STATUS_PAUSED, save_path=save_path, speed='-')
+            self.save_history()
+            
         except Exception as e:
-            print(f"Bilgi güncelleme hatası: {str(e)}")
+            print(f"Duraklatma işlenirken hata: {str(e)}")
             
-    def update_download_progress(self, row, progress):
+    def update_download_info(self, job_id, filename, filesize):
         try:
-            if 0 <= row < self.download_list.rowCount():
-                progress_item = self.download_list.item(row, 2)
-                if not progress_item:
-                    progress_item = QTableWidgetItem()
-                    self.download_list.setItem(row, 2, progress_item)
-                progress_item.setText(f"%{progress:.1f}")
+            thread = self.downloads.get(job_id)
+            self.model.update_entry(job_id, file_name=filename, file_size=filesize,
+                                    save_path=thread.save_path if thread else None)
+            self.save_history()
                 
         except Exception as e:
-            print(f"İlerleme güncellenirken hata: {str(e)}")
+            print(f"Bilgi güncelleme hatası: {str(e)}")
             
-    def download_finished(self, row):
+    def download_finished(self, job_id):
         try:
-            if 0 <= row < self.download_list.rowCount():
-                status_item = self.download_list.item(row, 3)
-                if not status_item:
-                    status_item = QTableWidgetItem()
-                    self.download_list.setItem(row, 3, status_item)
-                status_item.setText("Tamamlandı")
-                
-                self.status_bar.showMessage("İndirme tamamlandı", 5000)
+            # Zamanlayıcıda bekleyen son ilerleme değeri tamamlanma durumunu ezmesin
+            self.progress_aggregator.flush()
+            self.model.update_entry(job_id, status=STATUS_COMPLETED, progress=100, speed='-',
+                                    **self.integrity_fields(job_id))
+            self.save_history()
+            
+            self.status_bar.showMessage("İndirme tamamlandı", 5000)
                 
         except Exception as e:
             print(f"İndirme tamamlanırken hata: {str(e)}")
             
-    def download_error(self, row, error):
+    def download_error(self, job_id, error):
         try:
-            if 0 <= row < self.download_list.rowCount():
-                status_item = self.download_list.item(row, 3)
-                if not status_item:
-                    status_item = QTableWidgetItem()
-                    self.download_list.setItem(row, 3, status_item)
-                status_item.setText(f"Hata: {str(error)}")
-                
-                self.status_bar.showMessage(f"İndirme hatası: {str(error)}", 5000)
+            self.progress_aggregator.flush()
+            self.model.update_entry(job_id, status=f"{STATUS_ERROR}: {str(error)}", speed='-',
+                                    **self.integrity_fields(job_id))
+            self.save_history()
+            
+            self.status_bar.showMessage(f"İndirme hatası: {str(error)}", 5000)
                 
         except Exception as e:
             print(f"Hata işlenirken hata: {str(e)}")
             
+    def integrity_fields(self, job_id):
+        thread = self.downloads.get(job_id)
+        return thread.task.integrity_fields() if thread else {}
+            
     def update_progress(self):
         try:
-            active_downloads = [d for d in self.downloads if d.isRunning()]
+            active_downloads = [d for d in self.downloads.values() if d.isRunning()]
             if active_downloads:
                 self.status_bar.showMessage(f"Aktif indirme sayısı: {len(active_downloads)}")
             else:
@@ -451,7 +752,7 @@ class DownloadManager(QMainWindow):
             
     def closeEvent(self, event):
         try:
-            active_downloads = [d for d in self.downloads if d.isRunning()]
+            active_downloads = [d for d in self.downloads.values() if d.isRunning()]
             if active_downloads:
                 reply = QMessageBox.question(
                     self,
@@ -462,20 +763,38 @@ class DownloadManager(QMainWindow):
                 )
                 
                 if reply == QMessageBox.Yes:
+                    # Zorla sonlandırmak yerine duraklat; günlük yazılınca sonraki açılışta devam edilir
                     for download in active_downloads:
-                        download.terminate()
+                        download.pause()
+                    for download in active_downloads:
+                        download.wait(10000)
+                    self.save_history()
+                    self.prober.wait_all(5000)
                     event.accept()
                 else:
                     event.ignore()
             else:
+                self.prober.wait_all(5000)
                 event.accept()
                 
         except Exception as e:
             print(f"Program kapatılırken hata: {str(e)}")
             event.accept()
 
+def preload_modules():
+    # Pencere açıldıktan sonra yt-dlp ve indiriciler arka planda yüklenir;
+    # ilk format sorgusu/indirme bu süreyi beklemez
+    try:
+        for name in ('segmented', 'merged_download'):
+            importlib.import_module(name)
+        ydl_profiles.warm_up()
+        segment_session()
+    except Exception as e:
+        print(f"Ön yükleme hatası: {e}")
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = DownloadManager()
     window.show()
+    threading.Thread(target=preload_modules, name='preload', daemon=True).start()
     sys.exit(app.exec_()) 
\ No newline at end of file
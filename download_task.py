@@ -0,0 +1,252 @@
+import copy
+import json
+import os
+import threading
+import time
+from format_selector import equivalent_formats
+from extract_cache import signed_url_expiry
+from bandwidth import DEFAULT_CATEGORY
+from shared_session import YdlProfiles
+
+# Masaüstü penceresi (download_manager.py) ve başsız kip (headless.py) aynı
+# indirme işini kullanır; bu modül Qt içe aktarmaz.
+
+STATUS_DOWNLOADING = 'İndiriliyor'
+STATUS_PAUSED = 'Duraklatıldı'
+STATUS_COMPLETED = 'Tamamlandı'
+STATUS_ERROR = 'Hata'
+STATUS_SCHEDULED = 'Zamanlandı'
+# DASH/HLS akışlarında iş başına aynı anda indirilen parça sayısı
+FRAGMENT_CONCURRENCY = 4
+# Parçalı indirmelerin ortak bağlantı havuzu (tüm işler aynı oturumu kullanır)
+SEGMENT_POOL_SIZE = 32
+DEFAULT_FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+OUTPUT_TEMPLATE = '%(title)s.%(ext)s'  # Dosya adı şablonu
+
+# Sorgu ve indirme iş parçacıkları YoutubeDL'i bu profillerden kurar; çıkarıcı
+# listesi bir kez yüklenir, bağlantı havuzu işler arasında paylaşılır
+ydl_profiles = YdlProfiles({
+    'probe': {
+        'quiet': True,
+        'no_warnings': True
+    },
+    'download': {
+        'format': DEFAULT_FORMAT,
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY,
+        'outtmpl': OUTPUT_TEMPLATE
+    },
+}, dns_ttl=300)
+_segment_session = None
+_segment_session_lock = threading.Lock()
+
+
+def segment_session():
+    global _segment_session
+    with _segment_session_lock:
+        if _segment_session is None:
+            from segmented import create_session
+            _segment_session = create_session(SEGMENT_POOL_SIZE)
+        return _segment_session
+
+
+# Hız sınırları bandwidth.json'dan okunur (bayt/sn, null: sınırsız), ör.:
+# {"global_rate": null, "per_download_rate": null,
+#  "rules": [{"start": "09:00", "end": "18:00", "rate": 1048576, "days": [0, 1, 2, 3, 4]}],
+#  "category_weights": {"Öncelikli": 4}}
+BANDWIDTH_FILE = 'bandwidth.json'
+# Kategori ağırlıkları: ortak hız bütçesinden alınan pay bu oranlarla bölünür
+CATEGORY_WEIGHTS = {
+    'Öncelikli': 4,
+    'Video': 2,
+    DEFAULT_CATEGORY: 1,
+    'Arka Plan': 0.25,
+}
+
+
+def load_bandwidth_settings():
+    try:
+        with open(BANDWIDTH_FILE, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        settings = {}
+    weights = dict(CATEGORY_WEIGHTS)
+    weights.update(settings.get('category_weights') or {})
+    return {
+        'global_rate': settings.get('global_rate'),
+        'per_download_rate': settings.get('per_download_rate'),
+        'rules': settings.get('rules') or [],
+        'category_weights': weights,
+    }
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class DownloadTask:
+    # Tek bir indirme: bilgi (verilmediyse ya da imzalı URL'lerin süresi dolduysa)
+    # çıkarılır, format seçilir, tek dosyalık formatlar parçalı indiriciyle, ayrı
+    # görüntü/ses MergedDownloader ile, kalanlar yt-dlp ile indirilir ve kapsayıcı
+    # denetlenir. run() bitince True, duraklatılınca False döner; hata yükseltir.
+    # info_sink(iş id, dosya adı, boyut) ve progress_sink(iş id, yüzde, hız)
+    # çağıran iş parçacığında çağrılır.
+    def __init__(self, job_id, url, format_id=None, connections=8, progress_sink=None, info=None,
+                 scheduler=None, category=None, info_sink=None, output_dir=None):
+        self.job_id = job_id
+        self.url = url
+        self.format_id = format_id
+        self.info = info
+        self.connections = connections
+        self.progress_sink = progress_sink
+        self.info_sink = info_sink
+        self.scheduler = scheduler
+        self.category = category
+        self.output_dir = output_dir
+        self.save_path = None
+        self.integrity = None
+        self.running = True
+
+    def run(self):
+        # Tüm indirmeler ortak hız bütçesinden kategorisine göre pay alır
+        transfer = None
+        self.integrity = None
+        if self.scheduler:
+            transfer = self.scheduler.register(self.job_id, self.category,
+                                               should_stop=lambda: not self.running)
+        try:
+            self._download(transfer)
+        finally:
+            if transfer:
+                transfer.close()
+        return self.running
+
+    def _download(self, transfer):
+        from segmented import SegmentedDownloader, direct_download_target
+        from merged_download import MergedDownloader, merge_available
+        from integrity import verify_file, IntegrityError, INTEGRITY_FAILED
+        overrides = {
+            'progress_hooks': [self._progress_hook] + ([transfer.progress_hook] if transfer else [])
+        }
+        if self.format_id:
+            overrides['format'] = self.format_id
+        if self.output_dir:
+            overrides['outtmpl'] = os.path.join(self.output_dir, OUTPUT_TEMPLATE)
+        ydl_opts = ydl_profiles.options('download', **overrides)
+
+        with ydl_profiles.create('download', **overrides) as ydl:
+            # Diyalogda zaten alınmış bilgi varsa yeniden çıkarım yapılmaz;
+            # yoksa (ya da imzalı URL'lerin süresi dolmuşsa) bir kez çıkarılır
+            info = self.info if self._info_usable() else None
+            if info is None:
+                info = ydl.extract_info(self.url, download=False)
+                info = ydl.sanitize_info(info, remove_private_keys=True) if info else None
+                self.info = info
+            if not info:
+                return
+            selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+
+            # Dosya adını ve boyutunu hazırla
+            filename = f"{selected.get('title', 'video')}.{selected.get('ext', 'mp4')}"
+            filesize = selected.get('filesize', 0) or selected.get('filesize_approx', 0)
+            if filesize:
+                size_str = format_size(filesize)
+            else:
+                size_str = "Bilinmiyor"
+
+            # Duraklatılan indirme aynı yola yeniden başlatıldığında günlükten devam eder
+            self.save_path = os.path.abspath(ydl.prepare_filename(selected))
+
+            # Bilgileri gönder
+            if self.info_sink:
+                self.info_sink(self.job_id, filename, size_str)
+
+            # İndirmeyi başlat; tek dosyalık formatlar parçalı ve çok bağlantılı
+            direct = direct_download_target(selected)
+            filepath = self.save_path
+            if direct:
+                # Takılan bağlantı aynı içeriği veren diğer format URL'lerinden sürdürülür;
+                # bloklar yazılırken özetlendiği için doğrulama dosyayı yeniden okumaz
+                downloader = SegmentedDownloader(
+                    direct['url'],
+                    self.save_path,
+                    connections=self.connections,
+                    headers=direct.get('http_headers'),
+                    session=segment_session(),
+                    progress_hook=self._progress_hook,
+                    should_stop=lambda: not self.running,
+                    throttle=transfer.throttle if transfer else None,
+                    alternates=equivalent_formats(info.get('formats'), direct),
+                    resolve=lambda: self._fresh_targets(ydl, direct)
+                )
+                downloader.download()
+                self.integrity = verify_file(filepath, downloader.total, downloader.digest)
+            elif selected.get('requested_formats') and merge_available(ydl):
+                # Görüntü ve ses aynı anda iner; tamamlanan bileşen devam ederken yeniden indirilmez
+                filepath = MergedDownloader(
+                    ydl_opts,
+                    selected,
+                    self.save_path,
+                    connections=self.connections,
+                    session=segment_session(),
+                    progress_hook=self._progress_hook,
+                    fragment_hooks=[transfer.progress_hook] if transfer else (),
+                    throttle=transfer.throttle if transfer else None,
+                    should_stop=lambda: not self.running,
+                    formats=info.get('formats'),
+                    resolve=lambda fmt: self._fresh_targets(ydl, fmt),
+                    ydl_factory=lambda opts: ydl_profiles.create('download', **opts)
+                ).download()
+            else:
+                # Çıkarılmış bilgi üzerinden indirilir; yt-dlp .part dosyalarından kendisi devam eder
+                result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                requested = (result.get('requested_downloads') or [{}])[0]
+                filepath = requested.get('filepath') or filepath
+            if self.running and not direct and filepath and os.path.exists(filepath):
+                # Kapsayıcı başlıkları denetlenir (özet için dosya okunmaz)
+                self.integrity = verify_file(filepath)
+            if self.integrity and self.integrity['status'] == INTEGRITY_FAILED:
+                raise IntegrityError(self.integrity)
+
+    def _progress_hook(self, d):
+        if not self.running:
+            raise Exception("İndirme iptal edildi")
+
+        if d['status'] == 'downloading' and self.progress_sink:
+            try:
+                total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
+                downloaded = d.get('downloaded_bytes', 0)
+
+                if total > 0:
+                    self.progress_sink(self.job_id, (downloaded / total) * 100, d.get('speed') or 0)
+
+            except Exception as e:
+                print(f"İlerleme hesaplama hatası: {str(e)}")
+
+    def _fresh_targets(self, ydl, fmt):
+        # Tüm kaynaklar takıldıysa bilgi yeniden çıkarılır (imzalı URL'ler yenilenir)
+        info = ydl.extract_info(self.url, download=False)
+        if not info:
+            return []
+        self.info = ydl.sanitize_info(info, remove_private_keys=True)
+        formats = self.info.get('formats') or []
+        same = [f for f in formats if f.get('format_id') == fmt.get('format_id')]
+        return same + equivalent_formats(formats, fmt)
+
+    def _info_usable(self):
+        if not self.info:
+            return False
+        expiry = signed_url_expiry(self.info)
+        return expiry is None or expiry - time.time() > 60
+
+    def integrity_fields(self):
+        result = self.integrity
+        if not result:
+            return {}
+        return {'integrity': result['status'], 'integrity_note': result['note'], 'checksum': result['digest']}
@@ -0,0 +1,150 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# googlevideo ve benzeri CDN'ler imzalı URL'lerin son kullanma zamanını
+# ?expire=1712345678 ya da /expire/1712345678/ şeklinde taşır
+EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d{9,11})')
+
+_extractor_classes = None
+_extractor_lock = threading.Lock()
+
+
+def _get_extractor_classes():
+    global _extractor_classes
+    if _extractor_classes is None:
+        with _extractor_lock:
+            if _extractor_classes is None:
+                from yt_dlp.extractor import gen_extractor_classes
+                _extractor_classes = [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+    return _extractor_classes
+
+
+def canonical_key(url):
+    # Aynı videoya giden farklı URL'ler (youtu.be, m.youtube.com, &t=..) tek anahtarda buluşsun
+    url = (url or '').strip()
+    for ie in _get_extractor_classes():
+        try:
+            if ie.suitable(url):
+                video_id = ie.get_temp_id(url)
+                if video_id:
+                    return f"{ie.ie_key()}:{video_id}"
+                break
+        except Exception:
+            continue
+    return f"url:{url}"
+
+
+def _iter_urls(info):
+    for key in ('url', 'manifest_url', 'fragment_base_url'):
+        if info.get(key):
+            yield info[key]
+    for f in info.get('formats') or []:
+        for key in ('url', 'manifest_url', 'fragment_base_url'):
+            if f.get(key):
+                yield f[key]
+    for f in info.get('requested_formats') or []:
+        if f.get('url'):
+            yield f['url']
+
+
+def signed_url_expiry(info):
+    # Bilgi sözlüğündeki imzalı URL'lerin en erken bitiş zamanı (unix), yoksa None
+    earliest = None
+    for url in _iter_urls(info):
+        match = EXPIRE_RE.search(url)
+        if match:
+            expire = int(match.group(1))
+            if earliest is None or expire < earliest:
+                earliest = expire
+    return earliest
+
+
+class ExtractCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, default_ttl=1800, expire_margin=300):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.expire_margin = expire_margin
+        self._entries = OrderedDict()  # anahtar -> (bitiş zamanı, json bayt)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key_for(self, url):
+        return canonical_key(url)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # JSON olarak saklandığı için her çağıran kendi kopyasını alır
+        return json.loads(payload)
+
+    def put(self, key, info):
+        if not info:
+            return False
+        now = time.time()
+        expires_at = now + self.default_ttl
+        signed_expiry = signed_url_expiry(info)
+        if signed_expiry is not None:
+            expires_at = min(expires_at, signed_expiry - self.expire_margin)
+        if expires_at <= now:
+            return False
+
+        payload = json.dumps(info, ensure_ascii=False, default=str).encode('utf-8')
+        if len(payload) > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, payload)
+            self._size += len(payload)
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._size -= len(payload)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,457 @@
+import asyncio
+import itertools
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from fair_queue import FairQueue, ClientQuotaExceeded, HostThrottled, host_key, throttle_hint
+
+# Bekleyen iş, zaman aşımı ve iptal bu aralıkla kontrol edilir (saniye)
+POLL_INTERVAL = 0.25
+
+
+class ExtractError(Exception):
+    pass
+
+
+class ExtractTimeout(ExtractError):
+    pass
+
+
+class ExtractCancelled(ExtractError):
+    pass
+
+
+class _Ticket:
+    # Boş süreç bekleyen bir çıkarım; sırası gelince worker (ya da yeni süreç hakkı) verilir
+    __slots__ = ('client', 'host', 'worker', 'granted')
+
+    def __init__(self, client, host):
+        self.client = client
+        self.host = host
+        self.worker = None
+        self.granted = False
+
+
+class _Worker:
+    # Tek bir çıkarım süreci. İstekler stdin'den, sonuçlar stdout'tan pickle
+    # olarak gider; sonuçları okuyan iş parçacığı bunları kuyruğa koyar ki
+    # bekleyen taraf zaman aşımı ve iptali kendisi kontrol edebilsin.
+    def __init__(self, variants):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        self.results = queue.Queue()
+        # Async bekleyen varsa sonuç geldiğinde olay döngüsü uyandırılır
+        self.waker = None
+        self.ticket = None
+        self.jobs = 0
+        self.started_at = time.monotonic()
+        self.send(variants)
+        threading.Thread(target=self._read, name=f'extract-reader-{self.process.pid}', daemon=True).start()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def send(self, message):
+        pickle.dump(message, self.process.stdin)
+        self.process.stdin.flush()
+
+    def _read(self):
+        try:
+            while True:
+                self._deliver(pickle.load(self.process.stdout))
+        except Exception:
+            # Süreç kapandı (geri dönüşüm, öldürme ya da çökme)
+            self._deliver(None)
+        finally:
+            self.process.wait()
+
+    def _deliver(self, reply):
+        self.results.put(reply)
+        waker = self.waker
+        if waker:
+            waker()
+
+    def retire(self):
+        # stdin kapanınca süreç elindeki işi bitirip kendiliğinden çıkar
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+        self.retire()
+
+
+class ExtractPool:
+    # extract_info çağrıları uzun ömürlü alt süreçlerde çalışır: her süreç
+    # YoutubeDL örneklerini (ve okunmuş çerezleri) işler arasında korur, web
+    # iş parçacıkları yalnızca sonucu bekler. Süresi dolan ya da iptal edilen
+    # işin süreci öldürülüp yerine yenisi açılır; max_jobs iş yapan süreç
+    # bellek büyümesini sınırlamak için yenilenir. Süreçler ilk ihtiyaçta açılır.
+    # Boş süreç bekleyenler istemci başına sıraya girer ve süreçler istemciler
+    # arasında sırayla (client_weights ağırlıklarıyla) verilir; hosts
+    # (HostLimiter) verilirse sitenin eşzamanlı çıkarım sınırı da gözetilir,
+    # 429 alan site geri çekilme bitene kadar HostThrottled ile hemen reddedilir.
+    def __init__(self, variants, workers=2, max_jobs=200, timeout=60, client_weights=None, hosts=None):
+        self.variants = variants
+        self.size = max(1, workers)
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.hosts = hosts
+        self._idle = []
+        self._alive = 0
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._waiting = FairQueue(client_weights)
+        self._clients = {}
+        self.jobs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def extract(self, url, variant='full', timeout=None, should_cancel=None, client=None, client_limit=None):
+        # client_limit: istemcinin bekleyen + süren çıkarım sınırı; aşılırsa ClientQuotaExceeded
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        ticket = self._enter(url, client, client_limit)
+        worker = self._acquire(ticket, deadline, should_cancel)
+        self._send(worker, url, variant)
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Takılan çıkarıcı süreçle birlikte sonlandırılır
+                self._discard(worker, 'timeouts', kill=True)
+                raise ExtractTimeout(f"Video bilgileri {timeout} saniyede alınamadı")
+            if should_cancel and should_cancel():
+                self._discard(worker, 'cancelled', kill=True)
+                raise ExtractCancelled('İstemci bağlantıyı kapattı')
+            try:
+                reply = worker.results.get(timeout=min(remaining, POLL_INTERVAL))
+                break
+            except queue.Empty:
+                continue
+        return self._finish(worker, reply)
+
+    async def extract_async(self, url, variant='full', timeout=None, client=None, client_limit=None):
+        # Olay döngüsünü bloklamadan bekler; görev iptal edilirse (istemci gitti)
+        # süreç öldürülür
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        ticket = self._enter(url, client, client_limit)
+        try:
+            while True:
+                worker = self._claim(ticket)
+                if worker:
+                    break
+                if time.monotonic() >= deadline:
+                    self._abandon(ticket, 'timeouts')
+                    raise ExtractTimeout('Boş çıkarım süreci beklenirken zaman aşımı')
+                await asyncio.sleep(POLL_INTERVAL)
+        except asyncio.CancelledError:
+            self._abandon(ticket, 'cancelled')
+            raise
+
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        worker.waker = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            self._send(worker, url, variant)
+            while True:
+                # Olay önce temizlenir ki arada gelen sonuç kaçmasın
+                ready.clear()
+                try:
+                    reply = worker.results.get_nowait()
+                    break
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._discard(worker, 'timeouts', kill=True)
+                    raise ExtractTimeout(f"Video bilgileri {timeout} saniyede alınamadı")
+                try:
+                    await asyncio.wait_for(ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            self._discard(worker, 'cancelled', kill=True)
+            raise
+        finally:
+            worker.waker = None
+        return self._finish(worker, reply)
+
+    def _send(self, worker, url, variant):
+        try:
+            worker.send((next(self._ids), variant, url))
+        except (OSError, ValueError):
+            self._discard(worker, 'crashed')
+            raise ExtractError('Çıkarım süreci yanıt vermiyor')
+
+    def _finish(self, worker, reply):
+        if reply is None:
+            self._discard(worker, 'crashed')
+            raise ExtractError('Çıkarım süreci beklenmedik şekilde sonlandı')
+        status, _, payload = reply
+        host = worker.ticket.host
+        worker.jobs += 1
+        self._release(worker)
+        if status == 'error':
+            with self._cond:
+                self.errors += 1
+            throttled, retry_after = throttle_hint(payload)
+            if throttled and self.hosts is not None:
+                # Site yeni çıkarım almaz; bu istek de bekleme süresiyle döner
+                raise HostThrottled(host, self.hosts.throttled(host, retry_after))
+            raise ExtractError(payload)
+        return payload
+
+    def _enter(self, url, client, client_limit):
+        host = host_key(url)
+        with self._cond:
+            retry_after = self.hosts.retry_after(host) if self.hosts is not None else 0
+            if retry_after:
+                self.throttled += 1
+                raise HostThrottled(host, retry_after)
+            if client_limit and self._clients.get(client, 0) >= client_limit:
+                self.rejected += 1
+                raise ClientQuotaExceeded('Aynı anda çok fazla video bilgisi isteği, lütfen biraz sonra tekrar deneyin')
+            ticket = _Ticket(client, host)
+            self._clients[client] = self._clients.get(client, 0) + 1
+            self._waiting.push(client, ticket)
+            self._dispatch()
+        return ticket
+
+    def _host_ready(self, ticket):
+        return self.hosts is None or self.hosts.try_acquire(ticket.host)
+
+    def _dispatch(self):
+        # Kilit tutulurken çağrılır: boş süreçler (ya da açılabilecek yeni süreç
+        # hakları) sırası gelen bekleyenlere verilir
+        while len(self._waiting) and (self._idle or self._alive < self.size):
+            ticket = self._waiting.pop(self._host_ready)
+            if ticket is None:
+                return
+            if self._idle:
+                ticket.worker = self._idle.pop()
+            else:
+                self._alive += 1
+            ticket.granted = True
+            self._cond.notify_all()
+
+    def _claim(self, ticket):
+        # Sırası geldiyse süreci döndürür (hak verilmişse yeni süreç açılır), gelmediyse None
+        with self._cond:
+            if not ticket.granted:
+                # Sunucu sınırı/geri çekilme ile atlanmış bekleyenler için yeniden denenir
+                self._dispatch()
+                if not ticket.granted:
+                    return None
+            worker = ticket.worker
+        if worker is None:
+            try:
+                worker = _Worker(self.variants)
+            except Exception:
+                with self._cond:
+                    self._alive -= 1
+                    self._leave(ticket)
+                    self._dispatch()
+                raise
+        worker.ticket = ticket
+        return worker
+
+    def _leave(self, ticket):
+        # Kilit tutulurken: istemci sayacı ve site hakkı bırakılır
+        count = self._clients.get(ticket.client, 0) - 1
+        if count > 0:
+            self._clients[ticket.client] = count
+        else:
+            self._clients.pop(ticket.client, None)
+        if ticket.granted and self.hosts is not None:
+            self.hosts.release(ticket.host)
+
+    def _abandon(self, ticket, reason):
+        # Bekleyen vazgeçti (zaman aşımı ya da iptal); hak verilmişse geri alınır
+        with self._cond:
+            setattr(self, reason, getattr(self, reason) + 1)
+            if ticket.granted:
+                if ticket.worker is not None:
+                    self._idle.append(ticket.worker)
+                else:
+                    self._alive -= 1
+            else:
+                self._waiting.remove(ticket.client, ticket)
+            self._leave(ticket)
+            self._dispatch()
+
+    def _acquire(self, ticket, deadline, should_cancel):
+        while True:
+            worker = self._claim(ticket)
+            if worker:
+                return worker
+            if time.monotonic() >= deadline:
+                self._abandon(ticket, 'timeouts')
+                raise ExtractTimeout('Boş çıkarım süreci beklenirken zaman aşımı')
+            if should_cancel and should_cancel():
+                self._abandon(ticket, 'cancelled')
+                raise ExtractCancelled('İstemci bağlantıyı kapattı')
+            with self._cond:
+                if not ticket.granted:
+                    self._cond.wait(min(deadline - time.monotonic(), POLL_INTERVAL))
+
+    def _release(self, worker):
+        with self._cond:
+            self.jobs += 1
+            if worker.jobs >= self.max_jobs:
+                self.recycled += 1
+                self._alive -= 1
+                worker.retire()
+            else:
+                self._idle.append(worker)
+            self._finish_ticket(worker)
+
+    def _discard(self, worker, reason, kill=False):
+        if kill:
+            worker.kill()
+        else:
+            worker.retire()
+        with self._cond:
+            setattr(self, reason, getattr(self, reason) + 1)
+            self._alive -= 1
+            self._finish_ticket(worker)
+
+    def _finish_ticket(self, worker):
+        ticket, worker.ticket = worker.ticket, None
+        if ticket is not None:
+            self._leave(ticket)
+        self._dispatch()
+        self._cond.notify_all()
+
+    def start(self):
+        # Süreçleri ilk isteği beklemeden açar (ön yükleme)
+        while True:
+            with self._cond:
+                if self._alive >= self.size:
+                    return
+                self._alive += 1
+            try:
+                worker = _Worker(self.variants)
+            except Exception:
+                with self._cond:
+                    self._alive -= 1
+                raise
+            with self._cond:
+                self._idle.append(worker)
+                self._dispatch()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._alive -= len(idle)
+        for worker in idle:
+            worker.retire()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self._alive,
+                'idle': len(self._idle),
+                'busy': self._alive - len(self._idle),
+                'max_workers': self.size,
+                'waiting': len(self._waiting),
+                'clients': len(self._clients),
+                'jobs': self.jobs,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'cancelled': self.cancelled,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'rejected': self.rejected,
+                'throttled': self.throttled,
+            }
+
+
+class _ErrorLog:
+    # ignoreerrors açıkken yt-dlp hatayı yükseltmez, yalnızca yazar; son hata
+    # buradan okunur (429'lar havuza bildirilir). Hatalar yine stderr'e yazılır;
+    # günlükçü verilince yt-dlp no_warnings'e bakmadığı için uyarılar atılır
+    def __init__(self):
+        self.last = None
+
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        self.last = msg
+        print(msg, file=sys.stderr)
+
+
+def worker_main():
+    # Sonuç kanalı stdout'un kopyasıdır; yt-dlp'nin ekrana yazdıkları stderr'e gider
+    requests = sys.stdin.buffer
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    from shared_session import YdlProfiles
+
+    variants = pickle.load(requests)
+    # YoutubeDL örnekleri ilk işten önce kurulur; çeşitler çerez kavanozunu ve
+    # bağlantı havuzunu paylaşır (çerezler bir kez okunur)
+    profiles = YdlProfiles(variants)
+    log = _ErrorLog()
+    instances = {name: profiles.create(name, logger=log) for name in variants}
+    while True:
+        try:
+            message = pickle.load(requests)
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_id, variant, url = message
+        ydl = instances[variant]
+        if ydl.cookie_store is not None:
+            # Başka bir süreç çerezleri yazdıysa onlar kullanılır
+            ydl.cookie_store.refresh()
+        log.last = None
+        try:
+            info = ydl.extract_info(url, download=False)
+            if info:
+                info = ydl.sanitize_info(info, remove_private_keys=True)
+            reply = ('ok', job_id, info)
+            if info is None and log.last and throttle_hint(log.last)[0]:
+                # Site istekleri sınırladı: boş sonuç yerine hata döner ki havuz geri çekilsin
+                reply = ('error', job_id, log.last)
+        except Exception as e:
+            reply = ('error', job_id, str(e))
+        if ydl.cookie_store is not None:
+            # Değişen çerezler hemen yazılır; süreç öldürülse de kaybolmaz
+            ydl.cookie_store.save()
+        pickle.dump(reply, replies)
+        replies.flush()
+
+    for ydl in instances.values():
+        ydl.close()
+    profiles.close()
+
+
+if __name__ == '__main__':
+    worker_main()
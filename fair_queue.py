@@ -0,0 +1,238 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Çok kullanıcılı web uygulamasında kapasitenin (indirme işçileri, çıkarım
+# süreçleri) istemciler ve üst sunucular arasında adil paylaştırılması
+
+# İki etiketli kamu son ekleri (ör. co.uk); bunlarda alan adı üç etiketle alınır
+SECOND_LEVEL = ('co', 'com', 'net', 'org', 'gov', 'edu', 'ac', 'gen', 'web')
+THROTTLE_MARKERS = ('HTTP Error 429', 'Too Many Requests')
+
+
+class ClientQuotaExceeded(Exception):
+    pass
+
+
+class HostThrottled(Exception):
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} istekleri sınırladı, {int(retry_after) + 1} saniye sonra tekrar deneyin")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def host_key(url_or_host):
+    # Aynı sitenin CDN sunucuları (rr3---sn-x.googlevideo.com) tek anahtarda toplanır
+    host = url_or_host or ''
+    if '//' in host:
+        host = host.split('//', 1)[1]
+    host = host.split('/', 1)[0].rsplit('@', 1)[-1]
+    if host.startswith('['):
+        return host[1:].split(']', 1)[0]
+    host = host.split(':', 1)[0].lower().rstrip('.')
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split('.')
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def throttle_hint(error):
+    # (429 mu, Retry-After saniyesi ya da None); requests ve yt-dlp hataları
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    if status != 429 and not any(marker in str(error) for marker in THROTTLE_MARKERS):
+        return False, None
+    value = getattr(response, 'headers', None) and response.headers.get('Retry-After')
+    try:
+        return True, float(value) if value else None
+    except (TypeError, ValueError):
+        # Tarih biçimindeki Retry-After yok sayılır; bekleme süresi geri çekilmeden gelir
+        return True, None
+
+
+class FairQueue:
+    # İstemci başına ayrı FIFO kuyrukları; sıra açığa dayalı döngüyle (deficit
+    # round robin) verilir: sırası gelen istemcinin açığına ağırlığı eklenir ve
+    # açık 1'in altına inene kadar işleri alınır. Ağırlık 2 olan istemci turda
+    # iki, 0.5 olan iki turda bir iş alır. ready(iş) False dönen istemci (ör.
+    # sunucusu dolu) o çağrıda atlanır, sırasını ve açığını korur.
+    # İş parçacığı güvenli değildir; kilidi çağıran tutar.
+    def __init__(self, weights=None, default_weight=1):
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._queues = OrderedDict()
+        self._deficit = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def weight(self, client):
+        return max(float(self.weights.get(client, self.default_weight)), 0.05)
+
+    def push(self, client, item):
+        items = self._queues.get(client)
+        if items is None:
+            items = self._queues[client] = deque()
+            self._deficit[client] = 0.0
+        items.append(item)
+        self._size += 1
+
+    def pop(self, ready=None):
+        blocked = set()
+        while len(blocked) < len(self._queues):
+            client, items = next(iter(self._queues.items()))
+            if client in blocked:
+                self._queues.move_to_end(client)
+                continue
+            if self._deficit[client] < 1:
+                # Yeni tur: açık yetmiyorsa sıra bir sonrakine geçer
+                self._deficit[client] += self.weight(client)
+                if self._deficit[client] < 1:
+                    self._queues.move_to_end(client)
+                    continue
+            if ready is not None and not ready(items[0]):
+                blocked.add(client)
+                self._queues.move_to_end(client)
+                continue
+            item = items.popleft()
+            self._size -= 1
+            self._deficit[client] -= 1
+            if not items:
+                self._drop(client)
+            elif self._deficit[client] < 1:
+                self._queues.move_to_end(client)
+            return item
+        return None
+
+    def remove(self, client, item):
+        items = self._queues.get(client)
+        if items is None or item not in items:
+            return False
+        items.remove(item)
+        self._size -= 1
+        if not items:
+            self._drop(client)
+        return True
+
+    def _drop(self, client):
+        # Kuyruğu boşalan istemcinin açığı saklanmaz (boşta biriktirilemez)
+        del self._queues[client]
+        del self._deficit[client]
+
+
+class HostLimiter:
+    # Üst sunucu (host_key) başına eşzamanlı iş sınırı. 429 alınan sunucu
+    # geri çekilme süresince yeni iş almaz (art arda 429'larda süre ikiye
+    # katlanır, Retry-After daha uzunsa o kullanılır) ve sınırı yarıya iner;
+    # geri çekilme bittikten sonra biten her işle sınır birer artar.
+    def __init__(self, max_concurrent=2, backoff=30, max_backoff=600):
+        self.max_concurrent = max_concurrent
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.throttles = 0
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {'active': 0, 'limit': self.max_concurrent, 'blocked_until': 0.0, 'strikes': 0}
+        return state
+
+    def try_acquire(self, host):
+        with self._lock:
+            state = self._state(host)
+            if state['blocked_until'] > time.monotonic():
+                return False
+            if state['limit'] and state['active'] >= state['limit']:
+                return False
+            state['active'] += 1
+            return True
+
+    def release(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                return
+            state['active'] = max(state['active'] - 1, 0)
+            if state['blocked_until'] <= time.monotonic():
+                if state['limit'] and state['limit'] < self.max_concurrent:
+                    state['limit'] += 1
+                if not state['limit'] or state['limit'] >= self.max_concurrent:
+                    state['strikes'] = 0
+            if not state['active'] and not state['strikes']:
+                del self._hosts[host]
+
+    def throttled(self, host, retry_after=None):
+        # Dönüş: sunucunun yeni iş almayacağı süre (saniye)
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if state['blocked_until'] <= now:
+                # Aynı geri çekilme içinde gelen 429'lar (paralel işler) bir kez sayılır
+                state['strikes'] += 1
+                self.throttles += 1
+                if state['limit']:
+                    state['limit'] = max(1, state['limit'] // 2)
+            delay = min(self.backoff * 2 ** (state['strikes'] - 1), self.max_backoff)
+            delay = max(delay, min(retry_after or 0, self.max_backoff))
+            state['blocked_until'] = max(state['blocked_until'], now + delay)
+            return state['blocked_until'] - now
+
+    def retry_after(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                return 0
+            return max(state['blocked_until'] - time.monotonic(), 0)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'throttles': self.throttles,
+                'hosts': {
+                    host: {
+                        'active': state['active'],
+                        'limit': state['limit'],
+                        'backoff_seconds': round(max(state['blocked_until'] - now, 0), 1),
+                    }
+                    for host, state in self._hosts.items()
+                },
+            }
+
+
+class ClientSlots:
+    # İstemci başına eşzamanlı iş sayacı (ör. açık toplu istekler)
+    def __init__(self, limit):
+        self.limit = limit
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def enter(self, client):
+        with self._lock:
+            count = self._counts.get(client, 0)
+            if self.limit and count >= self.limit:
+                return False
+            self._counts[client] = count + 1
+            return True
+
+    def leave(self, client):
+        with self._lock:
+            count = self._counts.get(client, 0) - 1
+            if count > 0:
+                self._counts[client] = count
+            else:
+                self._counts.pop(client, None)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._counts), 'active': sum(self._counts.values())}
@@ -0,0 +1,87 @@
+import os
+import re
+import time
+import mimetypes
+from urllib.parse import quote
+from segment_journal import SegmentJournal, JOURNAL_SUFFIX
+
+PARTIAL_SUFFIX = '.part'
+# Parçalı indiricinin (segmented.py) önceden ayrılmış, sırasız yazılan dosyası
+SEGMENTED_SUFFIX = '.partial'
+# Paralel DASH parçaları ana .part dosyasının yanında <ad>.part-FragN.part olarak durur
+FRAGMENT_PART = re.compile(r'-Frag\d+\.part$')
+
+
+def content_disposition(filename):
+    # Türkçe karakterli dosya adları için RFC 5987 biçimi
+    fallback = filename.encode('ascii', 'replace').decode('ascii').replace('"', '')
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def find_partial_file(directory):
+    # yt-dlp tek formatlı indirmelerde dosyayı <ad>.part olarak büyütür, parçalı
+    # indirici <ad>.partial yazar; birden fazla yarım dosya varsa (ses+görüntü
+    # ayrı) henüz birleşik bir dosya yoktur
+    try:
+        names = [n for n in os.listdir(directory)
+                 if n.endswith((PARTIAL_SUFFIX, SEGMENTED_SUFFIX)) and not FRAGMENT_PART.search(n)]
+    except OSError:
+        return None
+    if len(names) != 1:
+        return None
+    return os.path.join(directory, names[0])
+
+
+def written_prefix(path):
+    # .partial dosyası önceden ayrıldığı için boşlukları sıfırla doludur; günlükteki
+    # aralıklara göre baştan kesintisiz yazılmış bayt sayısı (günlük yoksa None).
+    # Günlük yalnızca diske ulaşmış baytları gösterir, gerçeğin birkaç saniye gerisindedir
+    state = SegmentJournal(path + JOURNAL_SUFFIX).load()
+    if state is None:
+        return None
+    missing = [pos for start, end, pos in state.get('segments') or () if pos <= end]
+    return min(missing) if missing else state.get('total')
+
+
+def stream_growing_file(path, is_active, chunk_size=256 * 1024, poll_interval=0.25, idle_timeout=60,
+                        readable=None):
+    # Dosya yazılırken okunur; sona gelince iş sürüyorsa yeni veri beklenir.
+    # yt-dlp bitince .part dosyasını yeniden adlandırır, açık tanıtıcı aynı
+    # dosyayı okumaya devam eder. readable() verilirse dosyanın yalnızca o
+    # kadarı okunur (None: bilinmiyor; iş sürüyorsa beklenir, bittiyse dosya tamdır)
+    with open(path, 'rb') as f:
+        idle_since = None
+        limit = None
+        while True:
+            # Sınır yalnızca ona ulaşılınca yeniden sorulur (günlük okuması ucuz değil)
+            if readable and (limit is None or f.tell() >= limit):
+                limit = readable()
+            if readable and limit is None:
+                chunk = b''
+            else:
+                chunk = f.read(chunk_size if limit is None else min(chunk_size, limit - f.tell()))
+            if chunk:
+                idle_since = None
+                yield chunk
+                continue
+
+            if not is_active():
+                # Son yazılanları da gönder
+                limit = readable() if readable else None
+                while limit is None or f.tell() < limit:
+                    chunk = f.read(chunk_size if limit is None else min(chunk_size, limit - f.tell()))
+                    if not chunk:
+                        break
+                    yield chunk
+                return
+
+            now = time.monotonic()
+            if idle_since is None:
+                idle_since = now
+            elif now - idle_since > idle_timeout:
+                return
+            time.sleep(poll_interval)
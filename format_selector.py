@@ -0,0 +1,149 @@
+QUALITY_LABELS = {
+    1440: "2K",
+    2160: "4K",
+    4320: "8K",
+}
+
+# Aynı kapsayıcıya stream copy ile birleştirilebilen ses uzantıları
+COMPATIBLE_AUDIO = {
+    'mp4': ('m4a', 'mp4'),
+    'webm': ('webm',),
+}
+
+
+def quality_label(height):
+    return QUALITY_LABELS.get(height, f"{height}p")
+
+
+def _same_content(a, b):
+    # Aynı yükseklik, kapsayıcı ve codec'ler; boyut ikisinde de biliniyorsa eşit olmalı
+    for key in ('height', 'ext', 'vcodec', 'acodec', 'fps'):
+        if a.get(key) != b.get(key):
+            return False
+    size_a, size_b = a.get('filesize'), b.get('filesize')
+    return not (size_a and size_b and size_a != size_b)
+
+
+def equivalent_formats(formats, fmt):
+    # Aynı içeriği başka bir URL'den (CDN, sunucu) veren formatlar; indirici
+    # takılan ya da düşen bağlantıyı bunlara aktarır. Gerçekten aynı dosya mı
+    # olduğu indirme sırasında boyut ve doğrulayıcılarla ayrıca kontrol edilir.
+    # Seçilmiş format video düzeyindeki alanlarla (fps vb.) birleşmiş olabilir;
+    # karşılaştırma listedeki özgün kaydıyla yapılır.
+    formats = formats or ()
+    base = next((f for f in formats if f.get('format_id') == fmt.get('format_id')), fmt)
+    return [
+        f for f in formats
+        if f.get('url') and f is not fmt and f.get('format_id') != fmt.get('format_id')
+        and f.get('url') != fmt.get('url') and f.get('protocol', 'https') == fmt.get('protocol', 'https')
+        and _same_content(f, base)
+    ]
+
+
+def _codec_rank(vcodec, prefer_vcodecs):
+    if not prefer_vcodecs:
+        return 0
+    for i, prefix in enumerate(prefer_vcodecs):
+        if vcodec and vcodec.startswith(prefix):
+            return len(prefer_vcodecs) - i
+    return 0
+
+
+def select_qualities(formats, prefer_vcodecs=None, avoid_reencode=False):
+    # Biçim listesi tek geçişte taranır: en iyi ses (genel ve kapsayıcıya göre),
+    # her yükseklik için en iyi yalnız-görüntü ve birleşik format. Ardından
+    # yükseklik başına bir seçenek, yüksekten düşüğe sıralı döner.
+    best_audio = None
+    best_audio_tbr = -1
+    best_audio_by_ext = {}
+    best_video = {}      # yükseklik -> (sıralama anahtarı, format, aynı içerikteki formatlar)
+    best_combined = {}
+    # (yükseklik, kapsayıcı, codec'ler, fps, protokol) -> aynı içerikteki görüntü
+    # formatları; yedek kaynaklar (equivalent_formats) listeyi yeniden taramadan buradan çıkar
+    same_content = {}
+
+    for f in formats or ():
+        get = f.get
+        vcodec = get('vcodec', 'none')
+        acodec = get('acodec', 'none')
+        has_audio = acodec is not None and acodec != 'none'
+        if vcodec is None or vcodec == 'none':
+            if has_audio:
+                tbr = get('tbr') or 0
+                if tbr > best_audio_tbr:
+                    best_audio, best_audio_tbr = f, tbr
+                ext = get('ext')
+                current = best_audio_by_ext.get(ext)
+                if current is None or tbr > (current.get('tbr') or 0):
+                    best_audio_by_ext[ext] = f
+            continue
+
+        height = get('height') or 0
+        if height <= 0:
+            continue
+        # Aynı yükseklikte tercih edilen codec, sonra büyük dosya kazanır (ilk gelen eşitlikte kalır)
+        size = get('filesize') or get('filesize_approx') or 0
+        key = (_codec_rank(vcodec, prefer_vcodecs), size) if prefer_vcodecs else size
+        group = (height, get('ext'), vcodec, get('acodec'), get('fps'), get('protocol', 'https'))
+        same = same_content.get(group)
+        if same is None:
+            same = same_content[group] = [f]
+        else:
+            same.append(f)
+        current = best_video.get(height)
+        if current is None or key > current[0]:
+            best_video[height] = (key, f, same)
+        if has_audio:
+            current = best_combined.get(height)
+            if current is None or key > current[0]:
+                best_combined[height] = (key, f, same)
+
+    # Seçenekler yüksekten düşüğe kurulur (sonradan sözlükleri sıralamak gerekmez)
+    qualities = []
+    if best_audio is not None:
+        for height in sorted(best_video, reverse=True):
+            _, vf, same = best_video[height]
+            audio = best_audio
+            if avoid_reencode:
+                for ext in COMPATIBLE_AUDIO.get(vf.get('ext'), ()):
+                    if ext in best_audio_by_ext:
+                        audio = best_audio_by_ext[ext]
+                        break
+            qualities.append(_option(height, vf, audio, same))
+
+    if not qualities:
+        # Ayrı ses akışı yoksa birleşik (ses+görüntü) formatlara düş
+        for height in sorted(best_combined, reverse=True):
+            _, f, same = best_combined[height]
+            qualities.append(_option(height, f, None, same))
+    return qualities
+
+
+def _alternates(video, candidates):
+    # equivalent_formats ile aynı koşullar; adaylar yalnızca aynı içerik grubundakiler
+    format_id, url, size = video['format_id'], video.get('url'), video.get('filesize')
+    return [
+        f['format_id'] for f in candidates
+        if f.get('url') and f.get('format_id') != format_id and f.get('url') != url
+        and not (size and f.get('filesize') and f.get('filesize') != size)
+    ]
+
+
+def _option(height, video, audio, same):
+    get = video.get
+    video_id = video['format_id']
+    return {
+        'quality': quality_label(height),
+        'format_id': f"{video_id}+{audio['format_id']}" if audio else video_id,
+        'video_format_id': video_id,
+        'audio_format_id': audio['format_id'] if audio else None,
+        'filesize': get('filesize') or get('filesize_approx') or 0,
+        'height': height,
+        'vcodec': get('vcodec', ''),
+        'acodec': audio.get('acodec', '') if audio else get('acodec', ''),
+        'ext': get('ext', 'mp4'),
+        'fps': get('fps') or 0,
+        'tbr': get('tbr') or 0,
+        # Aynı içeriği veren diğer görüntü formatları (yükseklik başına tek seçenek kalır)
+        'alternates': _alternates(video, same) if len(same) > 1 else []
+    }
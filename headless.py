@@ -0,0 +1,437 @@
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from bandwidth import BandwidthScheduler, DEFAULT_CATEGORY
+from format_selector import select_qualities
+from history_store import HistoryStore, DEFAULT_DB_PATH
+from download_task import (DownloadTask, ydl_profiles, load_bandwidth_settings, format_size,
+                           STATUS_DOWNLOADING, STATUS_PAUSED, STATUS_COMPLETED, STATUS_ERROR)
+
+# Pencere olmadan toplu indirme (python download_manager.py batch|daemon ...).
+# Girdi satırları düz URL ya da JSON nesnesidir:
+#   {"url": "...", "format_id": "137+140", "quality": "720p", "category": "Video", "id": "..."}
+# (requests.jsonl gibi request_id de kimlik olarak kabul edilir); downloads.json
+# biçimindeki ({"downloads": [...]}) ya da liste hâlindeki tek bir JSON belgesi de okunur.
+# stdout'a her olay için bir JSON satırı yazılır; diğer çıktılar stderr'e gider.
+
+QUALITY_RE = re.compile(r'^(\d+)p?$')
+SPOOL_SUFFIXES = ('.jsonl', '.json', '.txt')
+
+
+def check_quality_rule(rule):
+    rule = (rule or 'best').lower()
+    if rule not in ('best', 'worst') and not QUALITY_RE.match(rule):
+        raise ValueError(f"Geçersiz kalite kuralı: {rule} (best, worst ya da ör. 720p)")
+    return rule
+
+
+def choose_quality(formats, rule='best', prefer_vcodecs=None):
+    # Diyalogdaki seçeneklerden biri kurala göre seçilir; 720p: 720p ya da altındaki en yüksek
+    qualities = select_qualities(formats, prefer_vcodecs=prefer_vcodecs, avoid_reencode=True)
+    if not qualities:
+        return None
+    rule = check_quality_rule(rule)
+    if rule == 'best':
+        return qualities[0]
+    if rule == 'worst':
+        return qualities[-1]
+    limit = int(QUALITY_RE.match(rule)[1])
+    fitting = [q for q in qualities if q['height'] <= limit]
+    return fitting[0] if fitting else qualities[-1]
+
+
+def _document_items(document):
+    if isinstance(document, dict) and isinstance(document.get('downloads'), list):
+        document = document['downloads']
+    if isinstance(document, list):
+        for number, item in enumerate(document, 1):
+            yield number, item
+    else:
+        yield 1, document
+
+
+def read_entries(stream):
+    # (satır no, değer) üretir. Satırlar geldikçe işlenir (stdin'e sürekli yazılabilir);
+    # tek satıra sığmayan JSON belgesi sonuna kadar okunup bir kerede çözülür
+    buffered = []
+    for number, line in enumerate(stream, 1):
+        text = line.strip()
+        if buffered:
+            buffered.append(line)
+            continue
+        if not text or text.startswith('#'):
+            continue
+        if text[0] in '[{':
+            try:
+                value = json.loads(text)
+            except ValueError:
+                buffered.append(line)
+                continue
+            if isinstance(value, list) or (isinstance(value, dict) and 'downloads' in value):
+                yield from _document_items(value)
+            else:
+                yield number, value
+            continue
+        yield number, text
+    if buffered:
+        yield from _document_items(json.loads(''.join(buffered)))
+
+
+class EventWriter:
+    # Makinece okunur ilerleme: her olay tek satır JSON
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class HeadlessRunner:
+    # İşler `jobs` iş parçacığında çalışır; okuma, çalışan işlerin iki katından fazla
+    # iş beklemeyecek şekilde yavaşlatılır (binlerce satırlık girdi belleğe dolmaz).
+    # Geçmiş masaüstüyle aynı depoya yazılır: durum ve ilerleme değişiklikleri
+    # saniyede bir, tüm işler için tek bir işlemde. Durdurulan işler duraklatılmış
+    # kalır; aynı girdi yeniden verilince (ya da pencerede) günlükten devam eder.
+    def __init__(self, store, events, jobs=4, connections=8, quality='best', prefer_vcodecs=None,
+                 category=DEFAULT_CATEGORY, output_dir=None, progress_interval=1.0):
+        self.store = store
+        self.events = events
+        self.connections = connections
+        self.quality = check_quality_rule(quality)
+        self.prefer_vcodecs = prefer_vcodecs
+        self.category = category
+        self.output_dir = output_dir
+        self.progress_interval = progress_interval
+        self.bandwidth = BandwidthScheduler(**load_bandwidth_settings())
+        self.executor = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix='headless')
+        self.stopping = threading.Event()
+        self.counts = {'completed': 0, 'failed': 0, 'paused': 0, 'skipped': 0}
+        self._slots = threading.Semaphore(max(1, jobs) * 2)
+        self._tasks = {}
+        self._entries = {}      # kaydedilmemiş ya da çalışan işlerin satırları
+        self._dirty = set()
+        self._finished = set()
+        self._last_progress = {}
+        self._lock = threading.Lock()
+        self._flushed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='headless-history', daemon=True)
+        self._flusher.start()
+        self.started_at = time.monotonic()
+
+    def entry_id(self, value, source=None, number=None):
+        # Aynı girdi yeniden verildiğinde aynı kimlik: biten atlanır, yarım kalan devam eder
+        ref = value.get('id') or value.get('request_id')
+        if ref:
+            return uuid.uuid5(uuid.NAMESPACE_URL, f"headless|{ref}").hex
+        if source:
+            return uuid.uuid5(uuid.NAMESPACE_URL, f"headless|{source}|{number}|{value['url']}").hex
+        return uuid.uuid4().hex
+
+    def submit(self, value, source=None, number=None):
+        if isinstance(value, str):
+            value = {'url': value}
+        if not isinstance(value, dict) or not value.get('url'):
+            self.events.emit('invalid', source=source, line=number)
+            return None
+        job_id = self.entry_id(value, source, number)
+        ref = value.get('id') or value.get('request_id')
+        existing = self.store.entries_by_job_id([job_id]).get(job_id)
+        if value.get('status') == STATUS_COMPLETED or (existing and existing.get('status') == STATUS_COMPLETED):
+            self._count('skipped')
+            self.events.emit('skipped', id=job_id, ref=ref, url=value['url'])
+            return None
+        while not self._slots.acquire(timeout=0.5):
+            if self.stopping.is_set():
+                return None
+        if self.stopping.is_set():
+            self._slots.release()
+            return None
+        entry = existing or {
+            'id': job_id,
+            'file_name': "Hazırlanıyor...",
+            'url': value['url'],
+            'save_path': None,
+            'progress': 0,
+            'category': value.get('category') or self.category,
+            'speed': "-"
+        }
+        entry['format_id'] = value.get('format_id') or entry.get('format_id')
+        self.events.emit('queued', id=job_id, ref=ref, url=value['url'])
+        return self.executor.submit(self._run, entry, value, ref)
+
+    def _run(self, entry, value, ref):
+        job_id = entry['id']
+        task = None
+        try:
+            if self.stopping.is_set():
+                return
+            self._update(entry, status=STATUS_DOWNLOADING, speed='-')
+            self.events.emit('started', id=job_id, ref=ref, url=entry['url'])
+            info = None
+            if not entry.get('format_id'):
+                info = self._extract(entry['url'])
+                quality = choose_quality(info.get('formats'), value.get('quality') or self.quality,
+                                         self.prefer_vcodecs)
+                if quality is None:
+                    raise Exception("Uygun video formatı bulunamadı")
+                self._update(entry, format_id=quality['format_id'])
+                self.events.emit('selected', id=job_id, quality=quality['quality'], format_id=quality['format_id'])
+            task = DownloadTask(job_id, entry['url'], entry['format_id'], connections=self.connections,
+                                progress_sink=self._progress, info=info, scheduler=self.bandwidth,
+                                category=entry.get('category'), info_sink=self._info,
+                                output_dir=self.output_dir)
+            with self._lock:
+                self._tasks[job_id] = task
+            if self.stopping.is_set():
+                task.running = False
+            if task.run():
+                self._update(entry, status=STATUS_COMPLETED, progress=100, speed='-',
+                             save_path=task.save_path, **task.integrity_fields())
+                self._count('completed')
+                self.events.emit('finished', id=job_id, ref=ref, url=entry['url'], path=task.save_path,
+                                 integrity=entry.get('integrity'), checksum=entry.get('checksum'))
+            else:
+                self._paused(entry, task, ref)
+        except Exception as e:
+            if task is not None and not task.running:
+                self._paused(entry, task, ref)
+            else:
+                fields = task.integrity_fields() if task else {}
+                self._update(entry, status=f"{STATUS_ERROR}: {str(e)}", speed='-', **fields)
+                self._count('failed')
+                self.events.emit('error', id=job_id, ref=ref, url=entry['url'], error=str(e))
+        finally:
+            with self._lock:
+                self._tasks.pop(job_id, None)
+                self._last_progress.pop(job_id, None)
+                self._finished.add(job_id)
+            self._slots.release()
+
+    def _extract(self, url):
+        with ydl_profiles.create('probe') as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                raise Exception("Video bilgileri alınamadı")
+            return ydl.sanitize_info(info, remove_private_keys=True)
+
+    def _paused(self, entry, task, ref):
+        self._update(entry, status=STATUS_PAUSED, speed='-', save_path=task.save_path or entry.get('save_path'))
+        self._count('paused')
+        self.events.emit('paused', id=entry['id'], ref=ref, url=entry['url'])
+
+    def _info(self, job_id, filename, size_str):
+        with self._lock:
+            entry = self._entries.get(job_id)
+            task = self._tasks.get(job_id)
+        if entry is None:
+            return
+        self._update(entry, file_name=filename, file_size=size_str, save_path=task.save_path if task else None)
+        self.events.emit('info', id=job_id, file_name=filename, file_size=size_str)
+
+    def _progress(self, job_id, progress, speed):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return
+            entry['progress'] = progress
+            entry['speed'] = f"{format_size(speed)}/s" if speed else "-"
+            self._dirty.add(job_id)
+            if now - self._last_progress.get(job_id, 0) < self.progress_interval:
+                return
+            self._last_progress[job_id] = now
+        self.events.emit('progress', id=job_id, progress=round(progress, 1), speed=round(speed or 0))
+
+    def _update(self, entry, **fields):
+        with self._lock:
+            entry.update(fields)
+            self._entries[entry['id']] = entry
+            self._dirty.add(entry['id'])
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [dict(self._entries[job_id]) for job_id in dirty if job_id in self._entries]
+            # Biten işlerin son durumu bu yazmada; satırları artık tutulmaz
+            for job_id in self._finished:
+                self._entries.pop(job_id, None)
+            self._finished = set()
+        try:
+            self.store.save_entries(rows)
+        except Exception as e:
+            print(f"Geçmiş kaydedilirken hata: {str(e)}")
+
+    def _flush_loop(self):
+        while not self._flushed.wait(1.0):
+            self.flush()
+
+    def stop(self):
+        # Yeni iş alınmaz; çalışanlar bir sonraki parçada durup günlüklerini yazar
+        self.stopping.set()
+        with self._lock:
+            tasks = list(self._tasks.values())
+        for task in tasks:
+            task.running = False
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self._flushed.set()
+        self._flusher.join()
+        self.flush()
+        ydl_profiles.close()
+        self.events.emit('summary', elapsed=round(time.monotonic() - self.started_at, 3), **self.counts)
+
+
+def run_batch(runner, inputs):
+    for name in inputs or ['-']:
+        if runner.stopping.is_set():
+            break
+        source = None if name == '-' else os.path.abspath(name)
+        stream = sys.stdin if name == '-' else open(name, 'r', encoding='utf-8')
+        try:
+            for number, value in read_entries(stream):
+                runner.submit(value, source, number)
+                if runner.stopping.is_set():
+                    break
+        except ValueError as e:
+            runner.events.emit('invalid', source=source, error=str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def _move_unique(path, directory):
+    target = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(target):
+        base, ext = os.path.splitext(target)
+        target = f"{base}.{int(time.time())}{ext}"
+    os.replace(path, target)
+    return target
+
+
+def run_daemon(runner, spool, interval=2.0):
+    # Biriktirme dizinine bırakılan .jsonl/.json/.txt dosyaları (yazan taraf geçici
+    # adla yazıp yeniden adlandırmalı) processing/ altına taşınarak sahiplenilir,
+    # işleri bitince done/ altına taşınır. Kapanışta processing/'de kalanlar bir
+    # sonraki açılışta yeniden okunur; biten satırlar kimlikleriyle atlanır.
+    processing = os.path.join(spool, 'processing')
+    done = os.path.join(spool, 'done')
+    os.makedirs(processing, exist_ok=True)
+    os.makedirs(done, exist_ok=True)
+    claimed = [os.path.join(processing, name) for name in sorted(os.listdir(processing))]
+    open_files = []     # (yol, işlerin future'ları)
+
+    def finish_files():
+        for item in list(open_files):
+            path, futures = item
+            if all(future.done() for future in futures) and not runner.stopping.is_set():
+                open_files.remove(item)
+                _move_unique(path, done)
+                runner.events.emit('spool_done', file=os.path.basename(path), entries=len(futures))
+
+    runner.events.emit('daemon_started', spool=os.path.abspath(spool))
+    while not runner.stopping.is_set():
+        candidates = []
+        for name in os.listdir(spool):
+            path = os.path.join(spool, name)
+            if name.startswith('.') or not name.endswith(SPOOL_SUFFIXES) or not os.path.isfile(path):
+                continue
+            candidates.append((os.path.getmtime(path), path))
+        for _, path in sorted(candidates):
+            target = os.path.join(processing, os.path.basename(path))
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                continue        # başka bir süreç sahiplendi
+            claimed.append(target)
+        while claimed and not runner.stopping.is_set():
+            path = claimed.pop(0)
+            futures = []
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for number, value in read_entries(f):
+                        future = runner.submit(value, path.replace(processing, spool, 1), number)
+                        if future is not None:
+                            futures.append(future)
+                        if runner.stopping.is_set():
+                            break
+                        finish_files()
+            except (OSError, ValueError) as e:
+                runner.events.emit('invalid', source=path, error=str(e))
+            open_files.append((path, futures))
+            finish_files()
+        finish_files()
+        runner.stopping.wait(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='download_manager.py', description="Pencere olmadan toplu indirme")
+    commands = parser.add_subparsers(dest='command', required=True)
+    batch = commands.add_parser('batch', help="dosyalardaki (ya da stdin'deki) URL'leri indir")
+    batch.add_argument('inputs', nargs='*', help="JSONL/URL listesi; '-' ya da boş: stdin")
+    daemon = commands.add_parser('daemon', help="biriktirme dizinini izle")
+    daemon.add_argument('spool', help="iş dosyalarının bırakılacağı dizin")
+    daemon.add_argument('--interval', type=float, default=2.0, help="dizin tarama aralığı (sn)")
+    for command in (batch, daemon):
+        command.add_argument('--jobs', type=int, default=4, help="aynı anda çalışan indirme sayısı")
+        command.add_argument('--connections', type=int, default=8, help="iş başına bağlantı")
+        command.add_argument('--quality', default='best', help="best, worst ya da üst sınır (ör. 720p)")
+        command.add_argument('--prefer-vcodecs', help="virgülle ayrılmış codec tercihi (ör. avc1,vp9)")
+        command.add_argument('--category', default=DEFAULT_CATEGORY)
+        command.add_argument('--output-dir', help="indirme dizini (varsayılan: çalışma dizini)")
+        command.add_argument('--db', default=DEFAULT_DB_PATH, help="geçmiş veritabanı")
+        command.add_argument('--progress-interval', type=float, default=1.0,
+                             help="iş başına ilerleme satırı aralığı (sn)")
+    args = parser.parse_args(argv)
+    try:
+        check_quality_rule(args.quality)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Olaylar stdout'a; kütüphanelerin print çıktıları satırları bozmasın diye stderr'e
+    events = EventWriter(sys.stdout)
+    sys.stdout = sys.stderr
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    runner = HeadlessRunner(
+        HistoryStore(args.db),
+        events,
+        jobs=args.jobs,
+        connections=args.connections,
+        quality=args.quality,
+        prefer_vcodecs=args.prefer_vcodecs.split(',') if args.prefer_vcodecs else None,
+        category=args.category,
+        output_dir=args.output_dir,
+        progress_interval=args.progress_interval
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: runner.stop())
+    try:
+        if args.command == 'daemon':
+            run_daemon(runner, args.spool, args.interval)
+        else:
+            run_batch(runner, args.inputs)
+    finally:
+        runner.close()
+    if args.command == 'daemon':
+        return 0
+    return 1 if runner.counts['failed'] or runner.stopping.is_set() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
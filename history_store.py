@@ -0,0 +1,358 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+TABLE = 'download'
+ACTIVE_STATUSES = ('Bekliyor', 'İndiriliyor')
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'downloads.db')
+# SQLAlchemy'nin SQLite DATETIME biçimi; iki taraf aynı sıralamayı kullanır
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Web (Download modeli) ve masaüstü aynı tabloyu kullanır; masaüstüne ait
+# sütunlar eski veritabanlarına ensure_schema ile eklenir
+COLUMNS = {
+    'id': 'INTEGER NOT NULL PRIMARY KEY',
+    'url': 'VARCHAR(500) NOT NULL',
+    'filename': 'VARCHAR(500)',
+    'format_id': 'VARCHAR(50)',
+    'status': 'VARCHAR(50)',
+    'progress': 'FLOAT',
+    'file_size': 'VARCHAR(50)',
+    'created_at': 'DATETIME',
+    'source': "VARCHAR(20) DEFAULT 'web'",
+    'job_id': 'VARCHAR(32)',
+    'save_path': 'VARCHAR(1000)',
+    'category': 'VARCHAR(50)',
+    'start_at': 'FLOAT',
+    'content_hash': 'VARCHAR(64)',
+    'integrity': 'VARCHAR(20)',
+    'integrity_note': 'VARCHAR(500)',
+    'checksum': 'VARCHAR(64)',
+}
+
+INDEXES = {
+    # (created_at, id) sıralı sayfalama; status ve url süzme/tekrar kontrolü için
+    'ix_download_created_at': 'CREATE INDEX IF NOT EXISTS ix_download_created_at ON download (created_at, id)',
+    'ix_download_status': 'CREATE INDEX IF NOT EXISTS ix_download_status ON download (status, source, created_at)',
+    'ix_download_url': 'CREATE INDEX IF NOT EXISTS ix_download_url ON download (url)',
+    'ix_download_source': 'CREATE INDEX IF NOT EXISTS ix_download_source ON download (source, created_at)',
+    'ux_download_job_id': 'CREATE UNIQUE INDEX IF NOT EXISTS ux_download_job_id ON download (job_id)',
+}
+
+DESKTOP_FIELDS = ('job_id', 'url', 'filename', 'format_id', 'status', 'progress',
+                  'file_size', 'save_path', 'category', 'start_at', 'created_at',
+                  'integrity', 'integrity_note', 'checksum')
+
+
+def timestamp(value=None):
+    return (value or datetime.utcnow()).strftime(TIMESTAMP_FORMAT)
+
+
+def apply_pragmas(conn):
+    conn.execute('PRAGMA journal_mode=WAL')
+    # WAL ile NORMAL: işlem başına fsync yok, çökmede yalnızca son işlemler kaybolabilir
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=5000')
+
+
+def ensure_schema(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+        + ', '.join(f"{name} {ddl}" for name, ddl in COLUMNS.items())
+        + ')'
+    )
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})")}
+    for name, ddl in COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN {name} {ddl.replace('NOT NULL', '')}")
+    for ddl in INDEXES.values():
+        conn.execute(ddl)
+    conn.commit()
+
+
+def encode_cursor(created_at, row_id):
+    return f"{created_at}|{row_id}"
+
+
+def decode_cursor(cursor):
+    # (created_at, id); çözülemeyen imleç için None
+    try:
+        created_at, _, row_id = cursor.rpartition('|')
+        return datetime.strptime(created_at, TIMESTAMP_FORMAT), int(row_id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    # İndirme geçmişinin tek deposu (instance/downloads.db). Bağlantı iş
+    # parçacığı başınadır; yazmalar tek kilit altında, okumalar WAL sayesinde
+    # yazmaları beklemez. Dosya ve şema ilk kullanımda hazırlanır, nesneyi
+    # kurmak veritabanına dokunmaz.
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._prepared = False
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=15, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            apply_pragmas(conn)
+            self._local.conn = conn
+            self.prepare(conn)
+        return conn
+
+    def prepare(self, conn=None):
+        # Şema süreç başına bir kez denetlenir; aynı dosyayı açan başka bir
+        # bağlantı (ör. SQLAlchemy) kendi bağlantısını verebilir
+        if self._prepared:
+            return
+        conn = conn or self.connection()
+        with self._schema_lock:
+            if not self._prepared:
+                ensure_schema(conn)
+                self._prepared = True
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def page(self, status=None, source=None, cursor=None, limit=50):
+        # Anahtar kümesiyle sayfalama: OFFSET yok, her sayfa dizinden doğrudan okunur
+        clauses, params = [], []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if source:
+            clauses.append('source = ?')
+            params.append(source)
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            clauses.append('(created_at, id) < (?, ?)')
+            params.extend((timestamp(position[0]), position[1]))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.connection().execute(
+            f"SELECT * FROM {TABLE} {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        rows = [dict(row) for row in rows]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def update_progress_many(self, updates):
+        # updates: [(id, progress, file_size)]; tamamlanmış işin durumu ezilmesin diye
+        # yalnızca bekleyen/inen satırlar güncellenir
+        if not updates:
+            return 0
+        with self._write_lock:
+            conn = self.connection()
+            with conn:
+                conn.executemany(
+                    f"UPDATE {TABLE} SET progress = ?, file_size = COALESCE(?, file_size) "
+                    f"WHERE id = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+                    [(progress, file_size, row_id) + ACTIVE_STATUSES for row_id, progress, file_size in updates]
+                )
+        return len(updates)
+
+    def load_entries(self, source='desktop', limit=1000, keep_statuses=()):
+        # Son `limit` kayıt ile (ne kadar eski olursa olsun) yarım kalmış işler
+        conn = self.connection()
+        rows = conn.execute(
+            f"SELECT * FROM {TABLE} WHERE source = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+            (source, limit)
+        ).fetchall()
+        seen = {row['id'] for row in rows}
+        if keep_statuses:
+            marks = ', '.join('?' * len(keep_statuses))
+            for row in conn.execute(
+                    f"SELECT * FROM {TABLE} WHERE source = ? AND status IN ({marks})",
+                    (source,) + tuple(keep_statuses)):
+                if row['id'] not in seen:
+                    rows.append(row)
+        rows.sort(key=lambda row: (row['created_at'] or '', row['id']))
+        return [entry_from_row(row) for row in rows]
+
+    def entries_by_job_id(self, job_ids, source='desktop'):
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        marks = ', '.join('?' * len(job_ids))
+        rows = self.connection().execute(
+            f"SELECT * FROM {TABLE} WHERE source = ? AND job_id IN ({marks})",
+            [source] + job_ids
+        ).fetchall()
+        return {row['job_id']: entry_from_row(row) for row in rows}
+
+    def save_entries(self, entries, source='desktop'):
+        rows = [entry_to_row(entry) for entry in entries]
+        if not rows:
+            return 0
+        columns = ', '.join(DESKTOP_FIELDS + ('source',))
+        marks = ', '.join('?' * (len(DESKTOP_FIELDS) + 1))
+        updates = ', '.join(f"{name} = excluded.{name}" for name in DESKTOP_FIELDS if name not in ('job_id', 'created_at'))
+        with self._write_lock:
+            conn = self.connection()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO {TABLE} ({columns}) VALUES ({marks}) "
+                    f"ON CONFLICT(job_id) DO UPDATE SET {updates}",
+                    [tuple(row[name] for name in DESKTOP_FIELDS) + (source,) for row in rows]
+                )
+        return len(rows)
+
+    def import_json(self, path):
+        # downloads.json'dan tek seferlik aktarım; aynı iş id'si ikinci kez eklenmez
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('downloads', [])
+        base = time.time() - len(entries)
+        rows = []
+        for i, entry in enumerate(entries):
+            entry = dict(entry)
+            # Kimliği olmayan eski kayıtlara içerikten türetilen sabit kimlik verilir ki
+            # aktarım tekrar çalıştırılırsa aynı kayıt çoğalmasın
+            entry.setdefault('id', uuid.uuid5(uuid.NAMESPACE_URL, f"{i}|{entry.get('url')}|{entry.get('save_path')}").hex)
+            # Eski kayıtlarda tarih yok; sıra korunacak şekilde artan zaman verilir
+            entry.setdefault('created_at', timestamp(datetime.utcfromtimestamp(base + i)))
+            rows.append(entry_to_row(entry))
+        columns = ', '.join(DESKTOP_FIELDS + ('source',))
+        marks = ', '.join('?' * (len(DESKTOP_FIELDS) + 1))
+        with self._write_lock:
+            conn = self.connection()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {TABLE} ({columns}) VALUES ({marks})",
+                    [tuple(row[name] for name in DESKTOP_FIELDS) + ('desktop',) for row in rows]
+                )
+                return conn.total_changes - before
+
+
+def entry_to_row(entry):
+    return {
+        'job_id': entry['id'],
+        'url': entry.get('url') or '',
+        'filename': entry.get('file_name'),
+        'format_id': entry.get('format_id'),
+        'status': entry.get('status'),
+        'progress': entry.get('progress') or 0,
+        'file_size': entry.get('file_size'),
+        'save_path': entry.get('save_path'),
+        'category': entry.get('category'),
+        'start_at': entry.get('start_at'),
+        'created_at': entry.get('created_at') or timestamp(),
+        'integrity': entry.get('integrity'),
+        'integrity_note': entry.get('integrity_note'),
+        'checksum': entry.get('checksum'),
+    }
+
+
+def entry_from_row(row):
+    entry = {
+        'id': row['job_id'] or uuid.uuid4().hex,
+        'file_name': row['filename'],
+        'url': row['url'],
+        'format_id': row['format_id'],
+        'save_path': row['save_path'],
+        'progress': row['progress'] or 0,
+        'status': row['status'],
+        'category': row['category'],
+        'file_size': row['file_size'],
+        'created_at': row['created_at'],
+        'speed': '-',
+    }
+    if row['start_at']:
+        entry['start_at'] = row['start_at']
+    for name in ('integrity', 'integrity_note', 'checksum'):
+        if row[name]:
+            entry[name] = row[name]
+    return entry
+
+
+class ProgressWriter:
+    # İlerleme her parçada veritabanına yazılmaz: iş başına son değer tutulur ve
+    # flush_interval'da bir, tüm işler için tek bir işlemde yazılır.
+    def __init__(self, store, flush_interval=1.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.updates = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+                self._thread.start()
+
+    def update(self, download_id, progress, file_size=None):
+        # Yazıcı iş parçacığı ilk ilerlemeyle başlar (içe aktarmada iş parçacığı açılmaz)
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self.updates += 1
+            self._pending[download_id] = (download_id, progress, file_size)
+
+    def discard(self, download_id):
+        # İş bitti; kuyruktaki eski ilerleme son durumun üzerine yazılmasın
+        with self._lock:
+            self._pending.pop(download_id, None)
+
+    def flush(self):
+        with self._lock:
+            updates = list(self._pending.values())
+            self._pending.clear()
+        if not updates:
+            return 0
+        try:
+            written = self.store.update_progress_many(updates)
+        except sqlite3.Error as e:
+            print(f"İlerleme yazılamadı: {e}")
+            return 0
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'updates': self.updates,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+        }
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] != 'import':
+        print("Kullanım: python history_store.py import [downloads.json] [veritabanı]")
+        return 2
+    source = argv[1] if len(argv) > 1 else 'downloads.json'
+    store = HistoryStore(argv[2] if len(argv) > 2 else DEFAULT_DB_PATH)
+    count = store.import_json(source)
+    print(f"{count} kayıt aktarıldı: {store.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
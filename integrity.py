@@ -0,0 +1,281 @@
+import hashlib
+import os
+import struct
+import threading
+
+# Dosya özeti: BLOCK_SIZE'lık hizalı blokların sha256 özetlerinin art arda
+# eklenmesiyle elde edilen dizinin sha256'sı. Bloklar yazılırken (paralel
+# bağlantılarda da) ayrı ayrı özetlenebildiği için indirme bitince dosya
+# yeniden okunmaz; yalnızca özeti tutmayan bloklar yeniden indirilir.
+BLOCK_SIZE = 1024 * 1024
+
+INTEGRITY_OK = 'Doğrulandı'
+INTEGRITY_WARNING = 'Uyarı'
+INTEGRITY_FAILED = 'Bozuk'
+
+MP4_EXTS = ('mp4', 'm4a', 'm4v', 'mov', '3gp')
+MATROSKA_EXTS = ('webm', 'mkv', 'mka', 'weba')
+HTML_PREFIXES = (b'<!doctype', b'<html', b'<head', b'<?xml')
+
+EBML_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+CLUSTER_ID = 0x1F43B675
+CUES_ID = 0x1C53BB6B
+# Kutu/öğe yürüyüşünün üst sınırı; parçalı MP4'lerde her parça iki kutudur
+MAX_ELEMENTS = 200000
+
+
+class IntegrityError(Exception):
+    def __init__(self, result):
+        super().__init__(f"Bütünlük denetimi başarısız: {result['note']}")
+        self.result = result
+
+
+def combine(digests):
+    return hashlib.sha256(b''.join(bytes.fromhex(d) for d in digests)).hexdigest()
+
+
+def file_digest(path, block_size=BLOCK_SIZE):
+    # Yazma sırasında özetlenemeyen dosyalar (yt-dlp/ffmpeg çıktısı) için aynı özet okunarak
+    digests = []
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digests.append(hashlib.sha256(block).hexdigest())
+    return combine(digests)
+
+
+class BlockHashes:
+    # Yazılan baytları hizalı bloklara göre özetler. Bir blok baştan sona sırayla
+    # yazılırsa özeti kesinleşir; sırasız, örtüşen ya da eksik yazılan blok
+    # "özetsiz" kalır ve incomplete() ile yeniden indirilecek aralık olarak döner.
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.digests = {}
+        self._open = {}         # blok -> [sha256, sonraki konum, kullanımda mı]
+        self._bad = set()
+        self._lock = threading.Lock()
+
+    def update(self, offset, data):
+        view = memoryview(data)
+        while len(view):
+            index, within = divmod(offset, self.block_size)
+            part = view[:self.block_size - within]
+            with self._lock:
+                state = self._open.get(index)
+                if state is None and within == 0 and index not in self.digests and index not in self._bad:
+                    state = self._open[index] = [hashlib.sha256(), offset, False]
+                if state is None or state[1] != offset or state[2]:
+                    # Blok sırasız ya da aynı anda iki yerden yazılıyor
+                    self._mark_bad(index)
+                    state = None
+                else:
+                    state[2] = True
+            if state is not None:
+                state[0].update(part)
+                with self._lock:
+                    state[1] += len(part)
+                    state[2] = False
+                    if state[1] == (index + 1) * self.block_size:
+                        self.digests[index] = state[0].hexdigest()
+                        del self._open[index]
+            offset += len(part)
+            view = view[len(part):]
+
+    def _mark_bad(self, index):
+        self._open.pop(index, None)
+        self.digests.pop(index, None)
+        self._bad.add(index)
+
+    def reset(self, index):
+        with self._lock:
+            self._open.pop(index, None)
+            self.digests.pop(index, None)
+            self._bad.discard(index)
+
+    def restore(self, digests):
+        with self._lock:
+            self.digests.update({int(index): digest for index, digest in digests.items()})
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.digests)
+
+    def _finish(self, total):
+        # Son blok kısa olabilir; sonuna kadar yazıldıysa özeti burada kesinleşir
+        last = (total - 1) // self.block_size
+        state = self._open.get(last)
+        if state is not None and not state[2] and state[1] == total:
+            self.digests[last] = state[0].hexdigest()
+            del self._open[last]
+
+    def incomplete(self, total):
+        # Özeti olmayan blokların (başlangıç, bitiş dahil) aralıkları
+        with self._lock:
+            if total:
+                self._finish(total)
+            ranges = []
+            for index in range((total + self.block_size - 1) // self.block_size if total else 0):
+                if index not in self.digests:
+                    start = index * self.block_size
+                    ranges.append((start, min(start + self.block_size, total) - 1))
+            return ranges
+
+    def digest(self, total):
+        if self.incomplete(total):
+            return None
+        with self._lock:
+            return combine(self.digests[i] for i in range(len(self.digests)))
+
+
+def _read_at(f, offset, length):
+    f.seek(offset)
+    return f.read(length)
+
+
+def _check_mp4(f, size, problems, warnings):
+    # Üst düzey kutular dosyayı tam olarak kaplamalı; ftyp başta, moov bir yerde olmalı
+    offset = 0
+    types = []
+    while offset < size and len(types) < MAX_ELEMENTS:
+        header = _read_at(f, offset, 16)
+        if len(header) < 8:
+            problems.append(f"{offset}. baytta yarım kutu başlığı")
+            return
+        box_size, box_type = struct.unpack('>I4s', header[:8])
+        if box_size == 1:
+            if len(header) < 16:
+                problems.append(f"{offset}. baytta yarım kutu başlığı")
+                return
+            box_size = struct.unpack('>Q', header[8:16])[0]
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < 8:
+            problems.append(f"{offset}. baytta geçersiz kutu boyutu")
+            return
+        if not all(32 <= c < 127 for c in box_type):
+            problems.append(f"{offset}. baytta geçersiz kutu")
+            return
+        types.append(box_type)
+        if offset + box_size > size:
+            problems.append(f"dosya kesik: '{box_type.decode('latin-1')}' kutusu {offset + box_size - size} bayt eksik")
+            return
+        offset += box_size
+    if not types or types[0] not in (b'ftyp', b'styp'):
+        problems.append("MP4 ftyp kutusu başta değil")
+    if b'moov' not in types:
+        problems.append("moov kutusu yok (oynatılamaz)")
+    if offset < size:
+        warnings.append("kutu sayısı sınırı aşıldı, dosyanın tamamı denetlenmedi")
+
+
+def _read_vint(f, offset, keep_marker):
+    first = _read_at(f, offset, 1)
+    if not first:
+        return None, 0
+    length = 1
+    while length <= 8 and not first[0] & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        return None, 0
+    data = first + _read_at(f, offset + 1, length - 1)
+    if len(data) < length:
+        return None, 0
+    value = int.from_bytes(data, 'big')
+    if not keep_marker:
+        value &= (1 << (7 * length)) - 1
+        if value == (1 << (7 * length)) - 1:
+            value = -1      # bilinmeyen boyut (canlı yayın kayıtları)
+    return value, length
+
+
+def _read_element(f, offset):
+    element_id, id_length = _read_vint(f, offset, True)
+    if element_id is None:
+        return None
+    element_size, size_length = _read_vint(f, offset + id_length, False)
+    if element_size is None:
+        return None
+    return element_id, offset + id_length + size_length, element_size
+
+
+def _check_matroska(f, size, problems, warnings):
+    # EBML başlığı, ardından Segment; Segment'in çocukları sonuna kadar yürünüp Cues aranır
+    element = _read_element(f, 0)
+    if not element or element[0] != EBML_ID or element[2] < 0:
+        problems.append("EBML başlığı yok")
+        return
+    element = _read_element(f, element[1] + element[2])
+    if not element or element[0] != SEGMENT_ID:
+        problems.append("Matroska Segment öğesi yok")
+        return
+    _, offset, segment_size = element
+    end = size if segment_size < 0 else offset + segment_size
+    if end > size:
+        problems.append(f"dosya kesik: Segment {end - size} bayt eksik")
+        return
+    seen = set()
+    count = 0
+    while offset < end and count < MAX_ELEMENTS:
+        element = _read_element(f, offset)
+        if not element:
+            problems.append(f"{offset}. baytta yarım öğe başlığı")
+            return
+        element_id, data_start, element_size = element
+        seen.add(element_id)
+        count += 1
+        if element_size < 0:
+            # Boyutu bilinmeyen küme: sonrası yürünemez, Cues aranamaz
+            warnings.append("boyutu bilinmeyen küme, dizin denetlenemedi")
+            return
+        if data_start + element_size > end:
+            problems.append(f"dosya kesik: öğe {data_start + element_size - end} bayt eksik")
+            return
+        offset = data_start + element_size
+    if CLUSTER_ID not in seen:
+        problems.append("hiç küme (Cluster) yok")
+    if CUES_ID not in seen:
+        warnings.append("Cues dizini yok, ileri sarma yavaş olabilir")
+
+
+def verify_file(path, expected_size=None, digest=None):
+    # Dosyanın başlığına ve kutu/öğe başlıklarına bakılır (veri okunmaz).
+    # Dönüş: {'status', 'container', 'size', 'digest', 'note'}
+    problems = []
+    warnings = []
+    container = None
+    size = os.path.getsize(path)
+    if expected_size and size != expected_size:
+        problems.append(f"boyut uyuşmuyor: {size}/{expected_size} bayt")
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, 'rb') as f:
+        head = f.read(189)
+        if not head:
+            problems.append("dosya boş")
+        elif head.lstrip().lower().startswith(HTML_PREFIXES):
+            problems.append("medya yerine HTML sayfası kaydedilmiş")
+        elif head[4:8] in (b'ftyp', b'styp'):
+            container = 'mp4'
+            _check_mp4(f, size, problems, warnings)
+        elif head[:4] == EBML_ID.to_bytes(4, 'big'):
+            container = 'matroska'
+            _check_matroska(f, size, problems, warnings)
+        elif head[:1] == b'\x47' and head[188:189] in (b'', b'\x47'):
+            # ffmpeg yokken HLS çıktısı .mp4 adıyla MPEG-TS kalabilir; oynatılır ama kapsayıcı yanlış
+            container = 'mpegts'
+            if ext in MP4_EXTS:
+                warnings.append("MPEG-TS içerik mp4 uzantılı")
+        elif ext in MP4_EXTS or ext in MATROSKA_EXTS:
+            problems.append(f"{ext} uzantılı dosyada kapsayıcı başlığı yok")
+    if problems:
+        status = INTEGRITY_FAILED
+    elif warnings:
+        status = INTEGRITY_WARNING
+    else:
+        status = INTEGRITY_OK
+    return {
+        'status': status,
+        'container': container,
+        'size': size,
+        'digest': digest,
+        'note': '; '.join(problems + warnings) or None,
+    }
@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from segmented import SegmentedDownloader, direct_download_target, DownloadCancelled
+from format_selector import equivalent_formats
+
+# Kopyalama ile birleştirme başarısız olursa sesin yeniden kodlanacağı codec
+FALLBACK_AUDIO_CODECS = {
+    'mp4': 'aac',
+    'm4a': 'aac',
+    'webm': 'libopus',
+}
+
+
+def _youtube_dl(opts):
+    import yt_dlp
+    return yt_dlp.YoutubeDL(opts)
+
+
+def merge_available(ydl):
+    from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+    return FFmpegPostProcessor(ydl).available
+
+
+class MergedDownloader:
+    # Ayrı görüntü ve ses akışlarını (requested_formats) aynı anda indirir:
+    # tek dosyalık akışlar parçalı indiriciyle, DASH/HLS akışları yt-dlp ile
+    # (parçalar concurrent_fragment_downloads kadar paralel). İkisi de bitince
+    # ffmpeg ile yeniden kodlamadan (stream copy) birleştirilir. formats verilirse
+    # tek dosyalık bileşenler takıldığında eşdeğer formatların URL'lerine geçilir.
+    def __init__(self, ydl_opts, selected, filepath, connections=8, session=None,
+                 progress_hook=None, fragment_hooks=(), throttle=None, should_stop=None,
+                 formats=None, resolve=None, max_connections=None, stall_timeout=10, ydl_factory=None):
+        self.ydl_opts = ydl_opts
+        self.selected = selected
+        self.formats = selected['requested_formats']
+        self.filepath = filepath
+        self.connections = max(1, connections)
+        self.session = session
+        self.progress_hook = progress_hook
+        self.fragment_hooks = list(fragment_hooks)
+        self.throttle = throttle
+        self.should_stop = should_stop or (lambda: False)
+        self.all_formats = formats or ()
+        self.resolve = resolve
+        self.max_connections = max_connections
+        self.stall_timeout = stall_timeout
+        # Paylaşılan profillerden örnek kuran fabrika (bkz. shared_session.YdlProfiles)
+        self.ydl_factory = ydl_factory or _youtube_dl
+        self.timings = {}
+        self.stats = {'stalls': 0, 'failovers': 0, 'resolves': 0, 'repaired_blocks': 0}
+        self._lock = threading.Lock()
+        self._progress = [{} for _ in self.formats]
+        self._failed = threading.Event()
+        self._started_at = None
+
+    def component_path(self, fmt):
+        base, _ = os.path.splitext(self.filepath)
+        return f"{base}.f{fmt['format_id']}.{fmt.get('ext', 'tmp')}"
+
+    def _stopped(self):
+        return self._failed.is_set() or self.should_stop()
+
+    def download(self):
+        self._started_at = time.monotonic()
+        paths = [self.component_path(fmt) for fmt in self.formats]
+        with ThreadPoolExecutor(max_workers=len(self.formats)) as pool:
+            futures = [pool.submit(self._fetch_component, i, fmt, path)
+                       for i, (fmt, path) in enumerate(zip(self.formats, paths))]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    # Biri başarısız olunca diğerinin boşuna sürmemesi için durdurulur
+                    self._failed.set()
+                    errors.append(e)
+        if self.should_stop():
+            raise DownloadCancelled("İndirme iptal edildi")
+        if errors:
+            raise errors[0]
+
+        self.timings['transfer'] = time.monotonic() - self._started_at
+        self._emit('finished')
+        start = time.monotonic()
+        self._merge(paths)
+        self.timings['merge'] = time.monotonic() - start
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return self.filepath
+
+    def _fetch_component(self, index, fmt, path):
+        if os.path.exists(path) and not os.path.exists(path + '.partial'):
+            # Önceki denemede tamamlanmış bileşen yeniden indirilmez
+            size = os.path.getsize(path)
+            self._update(index, {'downloaded_bytes': size, 'total_bytes': size, 'speed': 0})
+            return
+        direct = direct_download_target(fmt)
+        if direct:
+            # Bağlantılar bileşenler arasında paylaştırılır
+            share = len(self.formats)
+            downloader = SegmentedDownloader(
+                direct['url'],
+                path,
+                connections=max(1, self.connections // share),
+                max_connections=max(1, self.max_connections // share) if self.max_connections else None,
+                headers=direct.get('http_headers'),
+                session=self.session,
+                progress_hook=lambda d: self._update(index, d),
+                should_stop=self._stopped,
+                throttle=self.throttle,
+                alternates=equivalent_formats(self.all_formats, direct),
+                resolve=(lambda: self.resolve(direct)) if self.resolve else None,
+                stall_timeout=self.stall_timeout
+            )
+            try:
+                downloader.download()
+            finally:
+                with self._lock:
+                    for event in self.stats:
+                        self.stats[event] += downloader.stats[event]
+            if 'first_byte' in downloader.timings:
+                self._record_first_byte(downloader.timings['first_byte'])
+            return
+
+        def hook(d):
+            if self._stopped():
+                raise DownloadCancelled("İndirme iptal edildi")
+            self._update(index, d)
+            for fragment_hook in self.fragment_hooks:
+                fragment_hook(d)
+
+        opts = dict(self.ydl_opts)
+        opts['progress_hooks'] = [hook]
+        with self.ydl_factory(opts) as ydl:
+            if not ydl.dl(path, dict(fmt)):
+                raise Exception(f"Akış indirilemedi: {fmt.get('format_id')}")
+
+    def _record_first_byte(self, elapsed):
+        with self._lock:
+            if 'first_byte' not in self.timings or elapsed < self.timings['first_byte']:
+                self.timings['first_byte'] = elapsed
+
+    def _update(self, index, d):
+        if d.get('status') == 'finished':
+            return
+        with self._lock:
+            state = self._progress[index]
+            state['downloaded_bytes'] = d.get('downloaded_bytes') or 0
+            state['total_bytes'] = d.get('total_bytes') or d.get('total_bytes_estimate')
+            state['speed'] = d.get('speed') or 0
+        if d.get('downloaded_bytes') and 'first_byte' not in self.timings:
+            self._record_first_byte(time.monotonic() - self._started_at)
+        self._emit('downloading')
+
+    def _emit(self, status):
+        if not self.progress_hook:
+            return
+        with self._lock:
+            downloaded = sum(p.get('downloaded_bytes') or 0 for p in self._progress)
+            totals = [p.get('total_bytes') or f.get('filesize') or f.get('filesize_approx')
+                      for p, f in zip(self._progress, self.formats)]
+            speed = sum(p.get('speed') or 0 for p in self._progress)
+        # İki bileşenin toplamı tek bir indirme gibi bildirilir
+        self.progress_hook({
+            'status': status,
+            'filename': self.filepath,
+            'downloaded_bytes': downloaded,
+            'total_bytes': sum(totals) if all(totals) else None,
+            'total_bytes_estimate': sum(t or 0 for t in totals) or None,
+            'speed': speed,
+            'elapsed': time.monotonic() - self._started_at,
+        })
+
+    def _merge(self, paths):
+        # yt-dlp'nin FFmpegMergerPP'si ile aynı eşleme; önce yalnızca kopyalama denenir
+        maps = []
+        audio_streams = 0
+        for i, fmt in enumerate(self.formats):
+            if fmt.get('acodec') != 'none':
+                maps.extend(['-map', f'{i}:a:0'])
+                if fmt.get('protocol', '').startswith('m3u8') and (fmt.get('acodec') or '').startswith('mp4a'):
+                    maps.extend([f'-bsf:a:{audio_streams}', 'aac_adtstoasc'])
+                audio_streams += 1
+            if fmt.get('vcodec') != 'none':
+                maps.extend(['-map', f'{i}:v:0'])
+
+        from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegPostProcessorError
+        base, ext = os.path.splitext(self.filepath)
+        temp_path = f"{base}.temp{ext}"
+        with self.ydl_factory(dict(self.ydl_opts, progress_hooks=[])) as ydl:
+            ffmpeg = FFmpegPostProcessor(ydl)
+            try:
+                ffmpeg.run_ffmpeg_multiple_files(paths, temp_path, ['-c', 'copy'] + maps)
+            except FFmpegPostProcessorError:
+                # Ses codec'i kapsayıcıya kopyalanamıyor; görüntü kopyalanır, ses yeniden kodlanır
+                audio_codec = FALLBACK_AUDIO_CODECS.get(ext.lstrip('.'), 'aac')
+                ffmpeg.run_ffmpeg_multiple_files(paths, temp_path, ['-c:v', 'copy', '-c:a', audio_codec] + maps)
+        os.replace(temp_path, self.filepath)
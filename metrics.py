@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Saniye cinsinden süreler ve bayt/sn cinsinden hızlar için kova sınırları
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+THROUGHPUT_BUCKETS = tuple(2 ** i * 64 * 1024 for i in range(12))  # 64 KB/sn - 128 MB/sn
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # etiketler -> [kova sayıları, toplam, adet]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackGauge:
+    # Değeri okuma anında hesaplanan gösterge; fn sayı ya da [(etiketler, değer)] döndürür.
+    # Başka bir bileşenin tuttuğu birikimli sayaçlar metric_type='counter' ile verilir.
+    def __init__(self, name, help_text, fn, labelnames=(), metric_type='gauge'):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metrik okunamadı ({self.name}): {e}")
+            return lines
+        if not isinstance(values, (list, tuple)):
+            values = [({}, values)]
+        for labels, value in values:
+            if value is None:
+                continue
+            key = _label_key(self.labelnames, labels)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self, span_buffer=200):
+        self._metrics = []
+        self.recent_spans = deque(maxlen=span_buffer)
+        self.phase_seconds = self.histogram(
+            'ytdl_phase_seconds', 'İndirme aşamalarının süresi', ('phase', 'extractor'))
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=(), metric_type='gauge'):
+        return self._add(CallbackGauge(name, help_text, fn, labelnames, metric_type))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def record_span(self, phase, duration, extractor='', **fields):
+        self.phase_seconds.observe(duration, phase=phase, extractor=extractor or '')
+        record = {'phase': phase, 'duration': round(duration, 4), 'extractor': extractor or '', 'at': time.time()}
+        record.update(fields)
+        self.recent_spans.append(record)
+        return record
+
+    @contextmanager
+    def span(self, phase, extractor='', **fields):
+        # with registry.span('extract') as s: ... s['extractor'] = '...' ile etiket sonradan da verilebilir
+        context = dict(fields, extractor=extractor)
+        start = time.perf_counter()
+        try:
+            yield context
+        finally:
+            self.record_span(phase, time.perf_counter() - start, **context)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
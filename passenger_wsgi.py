@@ -8,4 +8,9 @@ if sys.executable != INTERP:
 
 sys.path.append(os.getcwd())
 
-from app import app as application 
\ No newline at end of file
+from app import app as application, warm_up_on_first_request
+
+# İlk istekte yt-dlp, veritabanı ve çıkarım süreçleri arka planda hazırlanır
+# (kapatmak için YTDL_WARMUP=0)
+if os.environ.get('YTDL_WARMUP', '1') != '0':
+    application = warm_up_on_first_request(application) 
\ No newline at end of file
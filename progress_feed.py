@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class ProgressFeed:
+    # İndirme işlerinin ilerleme değişikliklerini sıra numaralı olaylar olarak
+    # tutar. Aynı iş için ilerleme olayları en fazla min_interval'da bir üretilir,
+    # arada gelenler birleştirilir; durum değişiklikleri beklemeden yayınlanır.
+    def __init__(self, min_interval=0.5, buffer_size=2000):
+        self.min_interval = min_interval
+        self._events = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._last_sent = {}
+        self._pending = {}
+        # wait_async ile bekleyen olay döngüleri: [(döngü, asyncio.Future)]
+        self._async_waiters = []
+        self.published = 0
+        self.coalesced = 0
+
+    @property
+    def last_event_id(self):
+        with self._cond:
+            return self._seq
+
+    def publish(self, job_id, **fields):
+        now = time.monotonic()
+        with self._cond:
+            self.published += 1
+            merged = self._pending.pop(job_id, {})
+            merged.update(fields)
+            if 'status' in fields or now - self._last_sent.get(job_id, 0) >= self.min_interval:
+                self._append(job_id, merged, now)
+            else:
+                self.coalesced += 1
+                self._pending[job_id] = merged
+
+    def _append(self, job_id, fields, now):
+        self._seq += 1
+        event = dict(fields)
+        event['id'] = job_id
+        self._events.append((self._seq, event))
+        self._last_sent[job_id] = now
+        if fields.get('status') in ('Tamamlandı', 'Hata'):
+            self._last_sent.pop(job_id, None)
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _flush_due(self, now):
+        for job_id, fields in list(self._pending.items()):
+            if now - self._last_sent.get(job_id, 0) >= self.min_interval:
+                del self._pending[job_id]
+                self._append(job_id, fields, now)
+
+    def _since(self, last_id):
+        if last_id is None or last_id >= self._seq:
+            return [], False
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if last_id < oldest - 1:
+            # İstemcinin kaçırdığı olaylar tampondan düştü, tam liste yeniden alınmalı
+            return [], True
+        return [(seq, event) for seq, event in self._events if seq > last_id], False
+
+    def wait(self, last_id, timeout):
+        # last_id'den sonraki olayları döndürür; yoksa timeout kadar bekler.
+        # Dönüş: (olaylar, reset)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if last_id is None:
+                last_id = self._seq
+            while True:
+                self._flush_due(time.monotonic())
+                events, reset = self._since(last_id)
+                if events or reset:
+                    return events, reset
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], False
+                # Birleştirilmiş bekleyen olaylar varsa zamanı gelince yayınlanmaları için kısa bekle
+                self._cond.wait(min(remaining, self.min_interval) if self._pending else remaining)
+
+    async def wait_async(self, last_id, timeout):
+        # wait ile aynı; iş parçacığı yerine olay döngüsünde bekler (ASGI)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if last_id is None:
+                    last_id = self._seq
+                self._flush_due(time.monotonic())
+                events, reset = self._since(last_id)
+                if events or reset:
+                    return events, reset
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], False
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+                delay = min(remaining, self.min_interval) if self._pending else remaining
+            try:
+                await asyncio.wait_for(waiter, delay)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'last_event_id': self._seq,
+                'buffered': len(self._events),
+                'pending': len(self._pending),
+                'published': self.published,
+                'coalesced': self.coalesced,
+                'async_waiters': len(self._async_waiters),
+            }
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,57 @@
+import json
+import os
+import time
+
+JOURNAL_SUFFIX = '.json'
+JOURNAL_VERSION = 1
+
+
+class SegmentJournal:
+    # Parçalı indirmenin hangi aralıklarının diske yazıldığını ve sunucu
+    # doğrulayıcılarını (ETag, Last-Modified, boyut) tutar. Dosyaya en fazla
+    # fsync_interval saniyede bir yazılır, geçici dosya + os.replace ile atomik.
+    def __init__(self, path, fsync_interval=2.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._last_save = 0.0
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != JOURNAL_VERSION:
+            return None
+        return state
+
+    def due(self):
+        return time.monotonic() - self._last_save >= self.fsync_interval
+
+    def save(self, state):
+        state = dict(state, version=JOURNAL_VERSION, saved_at=time.time())
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+    def remove(self):
+        for path in (self.path, self.path + '.tmp'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def matches(state, total, etag, last_modified):
+        # Sunucudaki dosya değiştiyse eski aralıklar kullanılamaz
+        if not state or state.get('total') != total:
+            return False
+        if etag and state.get('etag') and state['etag'] != etag:
+            return False
+        if last_modified and state.get('last_modified') and state['last_modified'] != last_modified:
+            return False
+        return True
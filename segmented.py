@@ -0,0 +1,712 @@
+import os
+import socket
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from segment_journal import SegmentJournal, JOURNAL_SUFFIX
+from integrity import BlockHashes, BLOCK_SIZE
+
+TEMP_SUFFIX = '.partial'
+DIRECT_PROTOCOLS = ('http', 'https')
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class SegmentError(Exception):
+    pass
+
+
+class StallDetected(SegmentError):
+    pass
+
+
+class InvalidContent(SegmentError):
+    pass
+
+
+def direct_download_target(info):
+    # Tek parça, doğrudan HTTP ile alınabilen format mı? (ses+görüntü birleştirme,
+    # DASH/HLS parçaları yt-dlp'ye kalır)
+    if not info or info.get('requested_formats'):
+        return None
+    if info.get('protocol', 'https') not in DIRECT_PROTOCOLS:
+        return None
+    if not info.get('url'):
+        return None
+    return info
+
+
+def check_content_type(resp):
+    # Süresi dolmuş imzalı URL'ler çoğu zaman 200 ile bir HTML hata sayfası döndürür
+    content_type = resp.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type in ('text/html', 'application/xhtml+xml'):
+        raise InvalidContent(f"Sunucu medya yerine HTML sayfası döndürdü ({resp.url})")
+
+
+def create_session(connections=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(connections, 10))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class Segment:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end          # dahil
+        self.pos = start        # yazılacak bir sonraki bayt
+        self.active = False
+        self.started_at = None
+        self.received = 0
+        self.source = 0         # self.sources içindeki kaynak
+        self.response = None    # yanıt başlıkları alındı, veri okunuyor
+        self.last_data_at = None
+        self.window_bytes = 0   # son ölçüm penceresinde alınan bayt
+        self.rate = 0.0
+        self.slow_since = None
+        self.stalled = False
+        self.throttled = False  # bant genişliği zamanlayıcısında bekliyor
+
+    @property
+    def remaining(self):
+        return max(self.end - self.pos + 1, 0)
+
+    @property
+    def done(self):
+        return self.pos > self.end
+
+    def speed(self, now):
+        if not self.started_at or now <= self.started_at:
+            return 0.0
+        return self.received / (now - self.started_at)
+
+
+class SegmentedDownloader:
+    # Dosyayı N bayt aralığına böler, aralıkları ortak bir Session üzerinden
+    # paralel indirir ve önceden ayrılmış dosyaya doğrudan konumuna yazar.
+    # Erken biten bağlantı en yavaş aralığın kalanını ikiye bölüp devralır.
+    # Bağlantı sayısı toplam hıza göre connections..max_connections arasında
+    # ayarlanır; takılan bağlantı kesilip aralığı eşdeğer bir kaynaktan
+    # (alternates: aynı boyut ve doğrulayıcılara sahip diğer format URL'leri,
+    # ya da resolve ile yeniden çözülen URL'ler) yazılan yerden sürdürülür.
+    # Aralıklar BLOCK_SIZE'a hizalanır ve bloklar yazılırken özetlenir; bitince
+    # özeti tutmayan (sırasız ya da eksik yazılmış) bloklar yeniden indirilir.
+    def __init__(self, url, path, connections=8, headers=None, session=None,
+                 progress_hook=None, should_stop=None, min_split_size=1024 * 1024,
+                 chunk_size=64 * 1024, timeout=30, retries=3, progress_interval=0.2,
+                 fsync_interval=2.0, throttle=None, max_connections=None, alternates=(),
+                 resolve=None, stall_timeout=10, stall_ratio=0.1, adapt_interval=2.0):
+        self.url = url
+        self.path = path
+        self.connections = max(1, connections)
+        self.max_connections = max(self.connections, max_connections or self.connections * 2)
+        self.headers = dict(headers or {})
+        self.session = session or create_session(self.max_connections)
+        self.progress_hook = progress_hook
+        self.should_stop = should_stop or (lambda: False)
+        self.min_split_size = min_split_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.progress_interval = progress_interval
+        # Bant genişliği zamanlayıcısı: yazılan her parça için çağrılır, gerekirse bekletir
+        self.throttle = throttle
+        # İlk kaynak asıl URL; diğerleri ilk kullanımda yoklanıp doğrulanır
+        self.sources = [{'url': url, 'http_headers': {}, 'valid': True}]
+        self._add_sources(alternates)
+        self.resolve = resolve
+        self.max_resolves = 2
+        self.stall_timeout = stall_timeout
+        self.stall_ratio = stall_ratio
+        self.adapt_interval = adapt_interval
+        self.journal = SegmentJournal(self.temp_path + JOURNAL_SUFFIX, fsync_interval)
+        self.hashes = BlockHashes()
+        self.digest = None
+        self.max_repairs = 2
+
+        self.total = None
+        self.accept_ranges = False
+        self.etag = None
+        self.last_modified = None
+        self.segments = []
+        self.downloaded = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._fd = None
+        self._errors = []
+        self._started_at = None
+        self._resumed_bytes = 0
+        self._workers = []
+        self._target = self.connections
+        self._retiring = 0
+        self._preferred = 0
+        self._resolve_lock = threading.Lock()
+        self._window_started = None
+        self._window_bytes = 0
+        self._rates_at = None
+        self._reference_rate = 0.0
+        self._last_rate = None
+        self._last_change = 0
+        self._cooldown = 0
+        # Aşama süreleri (saniye): connect = ilk aralık isteğinin yanıtı, first_byte = ilk veri
+        self.timings = {}
+        self.stats = {'stalls': 0, 'failovers': 0, 'resolves': 0, 'peak_connections': 0, 'repaired_blocks': 0}
+
+    @property
+    def temp_path(self):
+        return self.path + TEMP_SUFFIX
+
+    def probe(self):
+        start = time.perf_counter()
+        self.total, self.accept_ranges, self.etag, self.last_modified = self._probe_url(self.url, self.headers)
+        self.timings['connect'] = time.perf_counter() - start
+
+    def _probe_url(self, url, headers):
+        headers = dict(headers)
+        headers['Range'] = 'bytes=0-0'
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+            resp.raise_for_status()
+            check_content_type(resp)
+            total = None
+            accept_ranges = False
+            if resp.status_code == 206:
+                content_range = resp.headers.get('Content-Range', '')
+                size = content_range.rpartition('/')[2]
+                if size.isdigit():
+                    total = int(size)
+                    accept_ranges = True
+            elif resp.headers.get('Content-Length', '').isdigit():
+                total = int(resp.headers['Content-Length'])
+            return total, accept_ranges, resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+
+    def plan(self):
+        count = self.connections
+        if not self.accept_ranges or not self.total:
+            count = 1
+        else:
+            count = max(1, min(count, self.total // self.min_split_size or 1))
+        if not self.total:
+            return [Segment(0, float('inf'))]
+        size = self.total // count
+        if size > BLOCK_SIZE:
+            # Her blok tek bir aralığa düşsün ki yazılırken sırayla özetlenebilsin
+            size -= size % BLOCK_SIZE
+        segments = []
+        for i in range(count):
+            start = i * size
+            end = self.total - 1 if i == count - 1 else start + size - 1
+            segments.append(Segment(start, end))
+        return segments
+
+    def download(self):
+        if self.total is None:
+            self.probe()
+        if not self.segments:
+            self.segments = self._restore() or self.plan()
+        self.downloaded = sum(s.pos - s.start for s in self.segments)
+        self._resumed_bytes = self.downloaded
+        self._started_at = time.monotonic()
+
+        self._open_output()
+        try:
+            try:
+                self._transfer()
+            except Exception as e:
+                # İlerleme kancası iptal için hata yükseltebilir (yt-dlp'deki gibi);
+                # bağlantılar durdurulup günlük yazılır ki kalan aralıklardan devam edilsin
+                with self._lock:
+                    self._errors.append(e)
+                    workers = list(self._workers)
+                for worker in workers:
+                    worker.join()
+                self._checkpoint()
+                raise
+            complete = self.total is not None and self.downloaded >= self.total
+            repairs = 0
+            while complete and not self._errors and not self.should_stop():
+                bad = self.hashes.incomplete(self.total)
+                if not bad or not self.accept_ranges or repairs >= self.max_repairs:
+                    break
+                # Yalnızca özeti tutmayan bloklar yeniden indirilir
+                repairs += 1
+                self._refetch(bad)
+                self._transfer()
+                complete = self.downloaded >= self.total
+            if not complete:
+                # Duraklatma, hata ya da iptal: kalan aralıklardan devam edilebilsin
+                self._checkpoint()
+        finally:
+            self._close_output()
+
+        if self.should_stop():
+            raise DownloadCancelled("İndirme iptal edildi")
+        if self._errors:
+            raise self._errors[0]
+        if self.total is not None and self.downloaded < self.total:
+            raise SegmentError(f"Eksik indirme: {self.downloaded}/{self.total} bayt")
+        self.digest = self.hashes.digest(self.total)
+        if self.digest is None:
+            raise SegmentError(f"Bloklar doğrulanamadı: {len(self.hashes.incomplete(self.total))} blok")
+
+        os.replace(self.temp_path, self.path)
+        self.journal.remove()
+        self._emit('finished')
+        return self.path
+
+    def _transfer(self):
+        self._target = min(self.connections, len(self.segments))
+        for _ in range(self._target):
+            self._spawn_worker()
+        # İlerleme bildirimleri yt-dlp'de olduğu gibi çağıranın iş parçacığından yapılır;
+        # bağlantı hızları, takılmalar ve bağlantı sayısı da burada izlenir
+        while True:
+            with self._lock:
+                alive = [worker for worker in self._workers if worker.is_alive()]
+                orphaned = not self._errors and not self.should_stop() and any(
+                    not s.active and not s.done for s in self.segments)
+            if not alive:
+                if orphaned:
+                    # Bağlantı azaltılırken son bağlantılar da bittiyse yarım aralık sahipsiz kalır
+                    self._spawn_worker()
+                    continue
+                break
+            alive[0].join(self.progress_interval)
+            self._emit('downloading')
+            self._monitor()
+            if self.journal.due():
+                self._checkpoint()
+
+    def _refetch(self, ranges):
+        with self._lock:
+            self.segments = []
+            self._workers = []
+            self._retiring = 0
+            for start, end in ranges:
+                self.hashes.reset(start // self.hashes.block_size)
+                self.segments.append(Segment(start, end))
+                self.downloaded -= end - start + 1
+            self.stats['repaired_blocks'] += len(ranges)
+        self._checkpoint()
+
+    def _restore(self):
+        # Önceki çalıştırmadan kalan günlük ve .partial dosyası sunucudaki
+        # dosyayla eşleşiyorsa yalnızca eksik aralıklar indirilir
+        state = self.journal.load()
+        if state is None:
+            return None
+        try:
+            size = os.path.getsize(self.temp_path)
+        except OSError:
+            size = None
+        if (not self.accept_ranges or size != self.total or
+                not SegmentJournal.matches(state, self.total, self.etag, self.last_modified)):
+            self.journal.remove()
+            return None
+
+        # Özetleri günlükte olan bloklar korunur; yarım kalan blok baştan indirilir
+        self.hashes.restore(state.get('blocks') or {})
+        block_size = self.hashes.block_size
+        segments = []
+        for start, end, pos in state.get('segments', []):
+            segment = Segment(start, end)
+            while segment.pos < pos:
+                index = segment.pos // block_size
+                block_end = min((index + 1) * block_size, self.total)
+                if block_end > pos or index not in self.hashes.digests:
+                    break
+                segment.pos = block_end
+            # Kalan bloklar yeniden yazılacak; eski özetleri geçersiz
+            for index in range(segment.pos // block_size, end // block_size + 1):
+                self.hashes.reset(index)
+            segments.append(segment)
+        return segments or None
+
+    def _checkpoint(self):
+        if not self.accept_ranges or not self.total or self._fd is None:
+            return
+        with self._lock:
+            segments = [[s.start, s.end, s.pos] for s in self.segments]
+        # Günlük yalnızca diske ulaşmış baytları göstermeli: önce veri, sonra günlük
+        os.fsync(self._fd)
+        self.journal.save({
+            'url': self.url,
+            'total': self.total,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'segments': segments,
+            'blocks': self.hashes.snapshot(),
+        })
+
+    def _open_output(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        self._fd = os.open(self.temp_path, flags, 0o644)
+        if self.total:
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(self._fd, 0, self.total)
+                except OSError:
+                    os.ftruncate(self._fd, self.total)
+            else:
+                os.ftruncate(self._fd, self.total)
+
+    def _close_output(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _write_at(self, data, offset):
+        if hasattr(os, 'pwrite'):
+            os.pwrite(self._fd, data, offset)
+        else:
+            # Windows'ta pwrite yok, konumlandırma ile yazma tek kilit altında
+            with self._write_lock:
+                os.lseek(self._fd, offset, os.SEEK_SET)
+                os.write(self._fd, data)
+
+    def _next_segment(self):
+        with self._lock:
+            if self._errors or self.should_stop():
+                return None
+            for segment in self.segments:
+                if not segment.active and not segment.done:
+                    segment.active = True
+                    return segment
+            return self._split_slowest()
+
+    def _split_slowest(self):
+        # Kalan süresi en uzun aralığı bul ve kalanının ikinci yarısını yeni aralık yap
+        if not self.accept_ranges:
+            return None
+        now = time.monotonic()
+        slowest = None
+        slowest_eta = 0
+        for segment in self.segments:
+            if not segment.active or segment.remaining < 2 * self.min_split_size:
+                continue
+            speed = segment.speed(now)
+            eta = segment.remaining / speed if speed > 0 else float('inf')
+            if slowest is None or eta > slowest_eta:
+                slowest, slowest_eta = segment, eta
+        if slowest is None:
+            return None
+        middle = slowest.pos + slowest.remaining // 2
+        # Bölme noktası blok sınırına çekilir; yazılmakta olan parçaya çok yakınsa bir sonrakine
+        aligned = middle - middle % BLOCK_SIZE
+        if aligned - slowest.pos < self.chunk_size:
+            aligned += BLOCK_SIZE
+        if aligned <= slowest.end:
+            middle = aligned
+        new_segment = Segment(middle, slowest.end)
+        slowest.end = middle - 1
+        new_segment.active = True
+        self.segments.append(new_segment)
+        return new_segment
+
+    def _spawn_worker(self):
+        worker = threading.Thread(target=self._worker, daemon=True)
+        with self._lock:
+            self._workers.append(worker)
+        worker.start()
+
+    def _worker(self):
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                return
+            try:
+                self._fetch_with_retries(segment)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+                return
+            finally:
+                with self._lock:
+                    segment.active = False
+                    segment.response = None
+            with self._lock:
+                if self._retiring > 0:
+                    # Bağlantı sayısı düşürüldü; yarım kalan aralığı diğerleri devralır
+                    self._retiring -= 1
+                    return
+
+    def _fetch_with_retries(self, segment):
+        attempt = 0
+        failovers = 0
+        while True:
+            with self._lock:
+                if segment.done:
+                    # Beklerken aralık bölünüp kalanı başka bağlantıya geçmiş olabilir
+                    return
+            pos = segment.pos
+            try:
+                self._fetch(segment)
+                return
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    requests.HTTPError, StallDetected, InvalidContent) as e:
+                if not self.accept_ranges:
+                    raise
+                if segment.pos > pos:
+                    # İlerleme olduysa hak sayaçları sıfırlanır
+                    attempt = failovers = 0
+                # Kalan kısım eşdeğer bir kaynaktan, yazılmış baytlar korunarak sürdürülür
+                if failovers < len(self.sources) and self._failover(segment):
+                    failovers += 1
+                    continue
+                if isinstance(e, (requests.HTTPError, InvalidContent)):
+                    raise
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                if not isinstance(e, StallDetected):
+                    # Takılan bağlantı hemen yenilenir; ağ hatalarında beklenir
+                    time.sleep(min(2 ** attempt, 10))
+
+    def _fetch(self, segment):
+        source = self.sources[segment.source]
+        headers = dict(self.headers, **source['http_headers'])
+        if self.accept_ranges:
+            headers['Range'] = f"bytes={segment.pos}-{segment.end}"
+        now = time.monotonic()
+        segment.started_at = segment.last_data_at = now
+        segment.received = 0
+        segment.stalled = False
+        segment.slow_since = None
+
+        # Okuma zaman aşımı takılma süresidir: veri gelmeyen bağlantı beklenmeden kesilir
+        timeout = (self.timeout, min(self.timeout, self.stall_timeout))
+        with self.session.get(source['url'], headers=headers, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            if self.accept_ranges and resp.status_code != 206:
+                raise SegmentError(f"Sunucu aralık isteğini desteklemiyor (HTTP {resp.status_code})")
+            check_content_type(resp)
+            with self._lock:
+                segment.response = resp
+
+            try:
+                for chunk in resp.iter_content(self.chunk_size):
+                    if self._errors or self.should_stop():
+                        return
+                    if segment.stalled:
+                        # İzleyici bu bağlantıyı diğerlerine göre çok yavaş buldu
+                        raise self._stall(segment)
+                    with self._lock:
+                        limit = segment.end - segment.pos + 1
+                        retire = self._retiring > 0
+                    if limit <= 0 or retire:
+                        # Aralık bölündü ya da bağlantı azaltılıyor; kalanı başka bağlantı indirir
+                        return
+                    data = memoryview(chunk)[:limit] if len(chunk) > limit else chunk
+                    self._write_at(data, segment.pos)
+                    self.hashes.update(segment.pos, data)
+                    with self._lock:
+                        if 'first_byte' not in self.timings:
+                            self.timings['first_byte'] = time.monotonic() - self._started_at
+                        segment.pos += len(data)
+                        segment.received += len(data)
+                        segment.window_bytes += len(data)
+                        segment.last_data_at = time.monotonic()
+                        self.downloaded += len(data)
+                    if self.throttle:
+                        segment.throttled = True
+                        try:
+                            self.throttle(len(data))
+                        finally:
+                            segment.throttled = False
+                            segment.last_data_at = time.monotonic()
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if segment.stalled or time.monotonic() - segment.last_data_at >= self.stall_timeout:
+                    raise self._stall(segment)
+                raise
+            if segment.stalled and not segment.done:
+                raise self._stall(segment)
+
+        if self.total is None:
+            with self._lock:
+                segment.end = segment.pos - 1
+                self.total = self.downloaded
+
+    def _add_sources(self, targets):
+        # targets: yt-dlp format sözlükleri ya da URL'ler; aynı URL iki kez eklenmez
+        known = {source['url'] for source in self.sources}
+        added = 0
+        for target in targets or ():
+            if isinstance(target, str):
+                target = {'url': target}
+            url = target.get('url')
+            if not url or url in known:
+                continue
+            known.add(url)
+            self.sources.append({'url': url, 'http_headers': dict(target.get('http_headers') or {}), 'valid': None})
+            added += 1
+        return added
+
+    def _validate(self, index):
+        # Yedek kaynak aynı dosyayı mı veriyor? Boyut ve (varsa) ETag/Last-Modified aynı olmalı
+        source = self.sources[index]
+        if source['valid'] is None:
+            try:
+                total, accept_ranges, etag, last_modified = self._probe_url(
+                    source['url'], dict(self.headers, **source['http_headers']))
+                source['valid'] = accept_ranges and SegmentJournal.matches(
+                    {'total': self.total, 'etag': self.etag, 'last_modified': self.last_modified},
+                    total, etag, last_modified)
+            except (requests.RequestException, InvalidContent):
+                source['valid'] = False
+        return source['valid']
+
+    def _failover(self, segment):
+        # Aralığı sıradaki geçerli kaynağa taşır; hepsi tükenirse URL'ler yeniden çözülür
+        failed = segment.source
+        with self._lock:
+            if self._preferred != failed:
+                # Başka bağlantı zaten geçiş yaptı; onun seçtiği kaynak denenir
+                segment.source = self._preferred
+                self.stats['failovers'] += 1
+                return True
+        for _ in range(2):
+            known = len(self.sources)
+            for index in range(known):
+                if index != failed and self._validate(index):
+                    with self._lock:
+                        segment.source = self._preferred = index
+                        self.stats['failovers'] += 1
+                    return True
+            if not self._resolve(known):
+                break
+        return False
+
+    def _resolve(self, known):
+        if not self.resolve:
+            return False
+        with self._resolve_lock:
+            if len(self.sources) > known:
+                # Başka bir bağlantı beklerken zaten yeniden çözdü
+                return True
+            if self.stats['resolves'] >= self.max_resolves:
+                return False
+            self.stats['resolves'] += 1
+            try:
+                targets = self.resolve() or ()
+            except Exception as e:
+                print(f"Kaynak yeniden çözülemedi: {e}")
+                return False
+            return self._add_sources(targets) > 0
+
+    def _monitor(self):
+        if not self.accept_ranges or not self.total:
+            return
+        now = time.monotonic()
+        if self._window_started is None:
+            self._window_started = self._rates_at = now
+            self._window_bytes = self.downloaded
+            return
+        with self._lock:
+            active = [s for s in self.segments if s.active and s.response is not None]
+            self.stats['peak_connections'] = max(self.stats['peak_connections'], len(active))
+            if now - self._rates_at >= 1.0:
+                # Bağlantı başına hız saniyelik pencerelerle ölçülür
+                for segment in active:
+                    segment.rate = segment.window_bytes / (now - self._rates_at)
+                    segment.window_bytes = 0
+                self._rates_at = now
+                rates = sorted(s.rate for s in active)
+                median = rates[len(rates) // 2] if rates else 0
+                # Bağlantı başına olağan hız; yavaş yavaş unutulur
+                self._reference_rate = max(self._reference_rate * 0.9, median)
+
+        # Olağan bağlantı hızı: son ölçümler ya da (bağlantılar çabuk bittiyse) indirmenin ortalaması
+        average = (self.downloaded - self._resumed_bytes) / max(now - self._started_at, 1e-3)
+        reference = max(self._reference_rate, average / max(1, self.stats['peak_connections']))
+        # Parçalar chunk_size'lık bloklarla okunduğu için yavaş indirmede sessizlik payı uzar
+        idle_limit = max(2.0, 3 * self.chunk_size / reference) if reference > 0 else None
+        for segment in active:
+            if segment.throttled:
+                segment.slow_since = None
+                continue
+            # Diğer bağlantılar veri alırken sessiz kalan ya da olağan hızın çok altında
+            # süren bağlantı işaretlenir; sıradaki parçada bırakılır. Hiç veri gelmezse
+            # okuma zaman aşımı (stall_timeout) zaten keser.
+            if idle_limit and now - segment.last_data_at >= idle_limit:
+                self._interrupt(segment)
+                continue
+            if self._reference_rate > 0 and segment.rate < self._reference_rate * self.stall_ratio:
+                segment.slow_since = segment.slow_since or now
+                if now - segment.slow_since >= self.stall_timeout / 2:
+                    segment.stalled = True
+            else:
+                segment.slow_since = None
+
+        elapsed = now - self._window_started
+        if elapsed >= self.adapt_interval:
+            rate = (self.downloaded - self._window_bytes) / elapsed
+            self._adapt(rate)
+            self._window_started = now
+            self._window_bytes = self.downloaded
+            self._last_rate = rate
+
+    def _interrupt(self, segment):
+        # Bekleyen okuma başka iş parçacığından ancak soket kapatılarak kesilir
+        segment.stalled = True
+        try:
+            sock = segment.response.raw.connection.sock
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            pass
+
+    def _stall(self, segment):
+        with self._lock:
+            self.stats['stalls'] += 1
+        return StallDetected(f"Bağlantı takıldı ({segment.pos}/{segment.end})")
+
+    def _adapt(self, rate):
+        # Tepe tırmanma: eklenen bağlantı hızı %5'ten az artırdıysa geri alınır ve bir süre
+        # yeniden denenmez; hız belirgin düşerse (ör. sunucu kısıtlıyor) bir bağlantı bırakılır
+        if self._last_rate is None:
+            return
+        gain = (rate - self._last_rate) / self._last_rate if self._last_rate > 0 else 0
+        remaining = self.total - self.downloaded
+        if self._last_change > 0 and gain < 0.05:
+            self._set_target(self._target - 1)
+            self._cooldown = 5
+        elif self._last_change == 0 and gain < -0.2 and self._target > 1:
+            self._set_target(self._target - 1)
+            self._cooldown = 2
+        elif self._cooldown > 0:
+            self._cooldown -= 1
+            self._last_change = 0
+        elif self._target < self.max_connections and remaining > 2 * self.min_split_size * (self._target + 1):
+            self._set_target(self._target + 1)
+        else:
+            self._last_change = 0
+
+    def _set_target(self, target):
+        target = max(1, min(self.max_connections, target))
+        self._last_change = target - self._target
+        if self._last_change > 0:
+            self._target = target
+            self._spawn_worker()
+        elif self._last_change < 0:
+            with self._lock:
+                self._target = target
+                self._retiring += 1
+
+    def _emit(self, status):
+        if not self.progress_hook:
+            return
+        now = time.monotonic()
+        elapsed = now - (self._started_at or now)
+        self.progress_hook({
+            'status': status,
+            'filename': self.path,
+            'downloaded_bytes': self.downloaded,
+            'total_bytes': self.total,
+            'speed': (self.downloaded - self._resumed_bytes) / elapsed if elapsed > 0 else None,
+            'elapsed': elapsed,
+            'connections': sum(1 for s in self.segments if s.active),
+        })
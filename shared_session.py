@@ -0,0 +1,278 @@
+import os
+import socket
+import threading
+import time
+
+# YoutubeDL'in istek yöneticisini (bağlantı havuzu, SSL bağlamı) belirleyen seçenekler;
+# bunları aynı olan örnekler tek bir yöneticiyi paylaşır
+NETWORK_OPTIONS = ('http_headers', 'proxy', 'nocheckcertificate', 'socket_timeout', 'source_address',
+                   'legacyserverconnect', 'client_certificate', 'client_certificate_key',
+                   'client_certificate_password', 'compat_opts', 'debug_printtraffic', 'enable_file_urls')
+
+_dns_cache = None
+_shared_class = None
+
+
+class DnsCache:
+    # socket.getaddrinfo sonuçları ttl saniye saklanır (süreç geneli); hatalar saklanmaz
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._resolve = socket.getaddrinfo
+        self.hits = 0
+        self.misses = 0
+
+    def getaddrinfo(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+        result = self._resolve(*args, **kwargs)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) < self.max_entries:
+                self._entries[key] = (now + self.ttl, tuple(result))
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def install_dns_cache(ttl):
+    # urllib3 ve yt-dlp adları socket.getaddrinfo ile çözer; bir kez sarılır
+    global _dns_cache
+    if _dns_cache is None and ttl:
+        _dns_cache = DnsCache(ttl)
+        socket.getaddrinfo = _dns_cache.getaddrinfo
+    return _dns_cache
+
+
+class SharedCookieJar:
+    # cookies.txt süreçte bir kez okunur ve tüm YoutubeDL örnekleriyle indiricilere
+    # aynı kavanoz verilir. Dosya başka bir süreçte ya da elle değiştirilirse
+    # yeniden okunur. Yalnızca çerezler değiştiyse geçici dosya + os.replace ile
+    # yazılır; eşzamanlı yazan süreçler yarım dosya bırakamaz (son yazan kazanır).
+    def __init__(self, path):
+        from yt_dlp.cookies import YoutubeDLCookieJar
+        self.path = path
+        self.jar = YoutubeDLCookieJar(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._fingerprint = frozenset()
+        self.loads = 0
+        self.saves = 0
+        self.refresh()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current(self):
+        return frozenset((c.domain, c.path, c.name, c.value, c.expires) for c in self.jar)
+
+    def refresh(self):
+        import http.cookiejar
+        from yt_dlp.cookies import YoutubeDLCookieJar
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            fresh = YoutubeDLCookieJar(self.path)
+            if stamp is not None:
+                try:
+                    fresh.load()
+                except (OSError, http.cookiejar.LoadError) as e:
+                    print(f"Çerez dosyası okunamadı ({self.path}): {e}")
+                    self._stamp = stamp
+                    return False
+            # Kullanımdaki kavanoz yerinde güncellenir; oturumlar aynı nesneyi tutar
+            with self.jar._cookies_lock:
+                self.jar._cookies = fresh._cookies
+            self._stamp = stamp
+            self._fingerprint = self._current()
+            self.loads += 1
+            return True
+
+    def save(self):
+        with self._lock:
+            fingerprint = self._current()
+            if fingerprint == self._fingerprint:
+                return False
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                self.jar.save(tmp_path)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Çerezler kaydedilemedi ({self.path}): {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return False
+            self._stamp = self._file_stamp()
+            self._fingerprint = fingerprint
+            self.saves += 1
+            return True
+
+
+def _youtube_dl_class():
+    global _shared_class
+    if _shared_class is None:
+        import yt_dlp
+
+        class SharedYoutubeDL(yt_dlp.YoutubeDL):
+            # İstek yöneticisi ve çerez kavanozu profillerle paylaşılır: kapatırken
+            # yönetici kapatılmaz, çerezler (değiştiyse) ortak kavanozdan yazılır
+            profiles = None
+            cookie_store = None
+
+            def _forceprint(self, key, info_dict):
+                # yt-dlp her ön işlemde (yazdırılacak şablon olmasa da) format, küçük resim ve
+                # altyazı tablolarını oluşturur; format başına onlarca alanla iş başına ~30 ms.
+                # 'video' dışındaki anahtarlarda dönüş kullanılmaz, şablon yoksa atlanır
+                if (key != 'video' and not self.params['forceprint'].get(key)
+                        and not self.params['print_to_file'].get(key)):
+                    return None
+                return super()._forceprint(key, info_dict)
+
+            def close(self):
+                self.__dict__.pop('_request_director', None)
+                super().close()
+                if self.cookie_store is not None:
+                    self.cookie_store.save()
+
+        _shared_class = SharedYoutubeDL
+    return _shared_class
+
+
+class YdlProfiles:
+    # Seçenek profilleri (ör. çıkarım, indirme) bir kez kurulur. Her profil için
+    # çıkarıcı listesi bir kez yüklenir (YoutubeDL başına ~90 ms), ağ ayarları aynı
+    # olan örnekler tek bir istek yöneticisini (keep-alive havuzu, SSL bağlamı)
+    # ve cookies.txt'nin tek kopyasını paylaşır. yt-dlp ilk create()'te yüklenir.
+    def __init__(self, profiles, dns_ttl=None):
+        self.profiles = {name: dict(opts) for name, opts in profiles.items()}
+        self.dns_ttl = dns_ttl
+        self._templates = {}
+        self._directors = {}
+        self._jars = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def options(self, name, **overrides):
+        opts = dict(self.profiles[name])
+        opts.update(overrides)
+        return opts
+
+    def cookie_store(self, name):
+        path = self.profiles[name].get('cookiefile')
+        if not path:
+            return None
+        path = os.path.abspath(path)
+        with self._lock:
+            store = self._jars.get(path)
+            if store is None:
+                store = self._jars[path] = SharedCookieJar(path)
+        return store
+
+    def cookie_jar(self, name):
+        store = self.cookie_store(name)
+        return store.jar if store else None
+
+    def create(self, name, **overrides):
+        install_dns_cache(self.dns_ttl)
+        cls = _youtube_dl_class()
+        opts = self.options(name, **overrides)
+        opts.pop('cookiefile', None)
+        store = self.cookie_store(name)
+        if store is not None:
+            store.refresh()
+        ydl = cls(opts, auto_init=False)
+        ydl._ies = dict(self._template(name)._ies)
+        ydl.profiles = self
+        ydl.cookie_store = store
+        owner = self._director_owner(ydl.params, store)
+        ydl.cookiejar = owner.cookiejar
+        ydl._request_director = owner._request_director
+        with self._lock:
+            self.created += 1
+        return ydl
+
+    def _template(self, name):
+        # Profilin izin verilen çıkarıcıları yüklenmiş örnek; yalnızca listesi kopyalanır
+        with self._lock:
+            template = self._templates.get(name)
+        if template is None:
+            opts = self.options(name)
+            opts.pop('cookiefile', None)
+            template = _youtube_dl_class()(
+                {key: opts[key] for key in ('quiet', 'no_warnings', 'allowed_extractors') if key in opts})
+            with self._lock:
+                template = self._templates.setdefault(name, template)
+        return template
+
+    def _network_key(self, params, store):
+        values = []
+        for key in NETWORK_OPTIONS:
+            value = params.get(key)
+            if isinstance(value, (dict, set)):
+                value = sorted(value.items()) if isinstance(value, dict) else sorted(value)
+            values.append((key, repr(value)))
+        return tuple(values), store.path if store else None
+
+    def _director_owner(self, params, store):
+        # Yöneticiyi kuran, yalnızca ağ seçeneklerine sahip örnek; iş örneklerinin
+        # kancaları yöneticinin günlükçüsüne bağlanıp bellekte kalmasın
+        key = self._network_key(params, store)
+        with self._lock:
+            owner = self._directors.get(key)
+        if owner is None:
+            opts = {name: params[name] for name in NETWORK_OPTIONS if name in params}
+            opts.update(quiet=True, no_warnings=True)
+            owner = _youtube_dl_class()(opts, auto_init=False)
+            if store is not None:
+                owner.cookiejar = store.jar
+            owner._request_director
+            with self._lock:
+                owner = self._directors.setdefault(key, owner)
+        return owner
+
+    def warm_up(self):
+        # Çıkarıcı listeleri, çerezler ve istek yöneticileri ilk istekten önce hazırlanır
+        for name in self.profiles:
+            self.create(name).close()
+
+    def close(self):
+        with self._lock:
+            owners = list(self._directors.values())
+            stores = list(self._jars.values())
+            self._directors.clear()
+        for owner in owners:
+            owner._request_director.close()
+        for store in stores:
+            store.save()
+
+    def stats(self):
+        with self._lock:
+            stores = list(self._jars.values())
+            result = {
+                'created': self.created,
+                'profiles': len(self._templates),
+                'connection_pools': len(self._directors),
+                'cookie_loads': sum(store.loads for store in stores),
+                'cookie_saves': sum(store.saves for store in stores),
+            }
+        if _dns_cache is not None:
+            result['dns'] = _dns_cache.stats()
+        return result
@@ -0,0 +1,77 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Aynı anahtar için eşzamanlı çağrılar tek bir çalıştırmayı bekler ve
+    # onun sonucunu (ya da hatasını) paylaşır
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"Devam eden işlem zaman aşımına uğradı: {key}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def waiting(self, key):
+        # Süren çağrıyı bekleyen (lider dışındaki) çağıran sayısı
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+            }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modüller depo kökünde düz duruyor; kıyaslama betikleri de benchmarks/ altında
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
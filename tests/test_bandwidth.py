@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from bandwidth import TimeWindow
+
+# 2024-01-01 bir pazartesi
+MONDAY = datetime(2024, 1, 1)
+
+
+def at(day_offset, hour, minute=0):
+    return MONDAY.replace(day=1 + day_offset, hour=hour, minute=minute)
+
+
+def test_daytime_window():
+    window = TimeWindow('09:00', '18:00', 100)
+    assert window.contains(at(0, 9))
+    assert window.contains(at(0, 17, 59))
+    assert not window.contains(at(0, 18))
+    assert not window.contains(at(0, 8, 59))
+
+
+def test_window_across_midnight_counts_for_start_day():
+    window = TimeWindow('22:00', '07:00', 100, days=[4])
+    assert window.contains(at(4, 23))
+    assert window.contains(at(5, 6, 59))
+    assert not window.contains(at(5, 23))
+    assert not window.contains(at(4, 6))
+
+
+def test_equal_start_and_end_is_all_day():
+    window = TimeWindow('00:00', '00:00', 100, days=[5, 6])
+    assert window.contains(at(5, 0))
+    assert window.contains(at(6, 23, 59))
+    assert not window.contains(at(0, 12))
+    assert TimeWindow.from_dict({'start': '08:30', 'end': '08:30', 'rate': 1}).contains(at(2, 3))
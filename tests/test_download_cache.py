@@ -0,0 +1,61 @@
+import os
+import time
+
+from download_cache import DownloadCache
+
+
+def make_file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def exists(cache, content_hash):
+    return os.path.exists(cache.path_for(content_hash))
+
+
+def test_least_recently_used_object_is_evicted(tmp_path):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=150)
+    first, _ = cache.store('a', make_file(tmp_path, 'a', 60), 'a')
+    time.sleep(0.01)
+    second, _ = cache.store('b', make_file(tmp_path, 'b', 60), 'b')
+    time.sleep(0.01)
+    assert cache.lookup('a') is not None
+    time.sleep(0.01)
+    third, _ = cache.store('c', make_file(tmp_path, 'c', 60), 'c')
+    assert exists(cache, first) and exists(cache, third)
+    assert not exists(cache, second)
+    assert cache.lookup('b') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_pinned_objects_survive_eviction(tmp_path):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=100)
+    first, _ = cache.store('a', make_file(tmp_path, 'a', 60), 'a', pin=True)
+    second, _ = cache.store('b', make_file(tmp_path, 'b', 60), 'b')
+    # Kota aşıldı ama ilk nesne bağlı, ikincisi de yeni saklanan (keep)
+    assert exists(cache, first) and exists(cache, second)
+    assert cache.stats()['pinned'] == 1
+
+    cache.unpin(first)
+    assert cache.lookup('b', pin=True)[0] == second
+    cache.reserve('job', 30)
+    assert not exists(cache, first)
+    assert exists(cache, second)
+
+    cache.unpin(second)
+    cache.release('job')
+    assert cache.stats()['pinned'] == 0
+
+
+def test_store_of_existing_content_reuses_object(tmp_path):
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=1000)
+    data = os.urandom(50)
+    (tmp_path / 'x').write_bytes(data)
+    (tmp_path / 'y').write_bytes(data)
+    first, size = cache.store('x', str(tmp_path / 'x'), 'x')
+    second, _ = cache.store('y', str(tmp_path / 'y'), 'y')
+    assert first == second and size == 50
+    assert not (tmp_path / 'y').exists()
+    stats = cache.stats()
+    assert stats['objects'] == 1 and stats['entries'] == 2
@@ -0,0 +1,67 @@
+import copy
+
+import pytest
+
+from bench_format_selector import load_fixtures, legacy_select
+from format_selector import select_qualities, equivalent_formats
+
+FIXTURES = load_fixtures()
+
+# Kayıtlı fikstürler için beklenen seçim: (kalite, format_id)
+EXPECTED = {
+    'generic_direct': [],
+    'twitch_vod': [
+        ('1080p', '1080p60+Audio_Only'), ('720p', '720p60+Audio_Only'), ('480p', '480p30+Audio_Only'),
+        ('360p', '360p30+Audio_Only'), ('160p', '160p30+Audio_Only'),
+    ],
+    'vimeo_progressive': [
+        ('1080p', 'http-1080p'), ('720p', 'http-720p'), ('540p', 'http-540p'),
+        ('360p', 'http-360p'), ('240p', 'http-240p'),
+    ],
+    'youtube_regular': [
+        ('1080p', '137+251'), ('720p', '247+251'), ('480p', '244+251'),
+        ('360p', '18+251'), ('240p', '242+251'), ('144p', '278+251'),
+    ],
+}
+
+
+def pairs(qualities):
+    return [(q['quality'], q['format_id']) for q in qualities]
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_selection_matches_recorded_fixtures(name):
+    assert pairs(select_qualities(FIXTURES[name]['formats'])) == EXPECTED[name]
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_selection_matches_legacy_selector(name):
+    formats = FIXTURES[name]['formats']
+    assert pairs(select_qualities(formats)) == legacy_select(formats)
+
+
+def test_avoid_reencode_picks_audio_in_same_container():
+    formats = FIXTURES['youtube_regular']['formats']
+    ids = [q['format_id'] for q in select_qualities(formats, avoid_reencode=True)]
+    assert ids == ['137+140', '247+251', '244+251', '18+140', '242+251', '278+251']
+
+
+def test_preferred_codec_wins_at_same_height():
+    formats = FIXTURES['youtube_regular']['formats']
+    ids = [q['format_id'] for q in select_qualities(formats, prefer_vcodecs=('vp9',))]
+    assert ids == ['248+251', '247+251', '244+251', '243+251', '242+251', '278+251']
+
+
+def test_alternates_match_equivalent_formats():
+    formats = copy.deepcopy(FIXTURES['youtube_regular']['formats'])
+    for f in list(formats):
+        if f.get('vcodec', 'none') != 'none':
+            mirror = dict(f, format_id=f"{f['format_id']}-mirror", url=f"{f.get('url')}&mirror=1")
+            formats.append(mirror)
+    by_id = {f['format_id']: f for f in formats}
+    qualities = select_qualities(formats)
+    assert qualities
+    for q in qualities:
+        video = by_id[q['video_format_id']]
+        assert q['alternates'] == [f['format_id'] for f in equivalent_formats(formats, video)]
+        assert q['alternates'] == [f"{q['video_format_id']}-mirror"]
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from history_store import HistoryStore, decode_cursor, encode_cursor, timestamp
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(timestamp(created_at), 42)) == (created_at, 42)
+
+
+def test_unparseable_cursor_is_none():
+    for cursor in ('abc|5', '2024-03-01 12:30:05.123456|x', '|', '', None, 'no-separator'):
+        assert decode_cursor(cursor) is None
+
+
+def test_store_does_not_touch_disk_until_used(tmp_path):
+    path = tmp_path / 'db' / 'downloads.db'
+    store = HistoryStore(str(path))
+    assert not path.exists()
+    assert store.page() == ([], None)
+    assert path.exists()
+
+
+def test_page_follows_cursor(tmp_path):
+    store = HistoryStore(str(tmp_path / 'downloads.db'))
+    store.save_entries([
+        {'id': f"job{i}", 'url': f"https://example.com/{i}", 'status': 'Tamamlandı',
+         'created_at': timestamp(datetime(2024, 1, 1, 0, 0, i))}
+        for i in range(5)
+    ])
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.page(source='desktop', cursor=cursor, limit=2)
+        seen += [row['job_id'] for row in rows]
+        if not cursor:
+            break
+    assert seen == ['job4', 'job3', 'job2', 'job1', 'job0']